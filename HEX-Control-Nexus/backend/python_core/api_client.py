@@ -5,102 +5,844 @@ Handles API requests with retry logic and circuit breaker
 
 import aiohttp
 import asyncio
+import codecs
+import hashlib
 import logging
 import json
+import os
+import random
+import re
+import sqlite3
+import threading
 import time
-from typing import Dict, Any, Optional
-from dataclasses import dataclass
-from urllib.parse import urljoin
+from collections import OrderedDict, deque
+from typing import (Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterable,
+                    List, Optional, Tuple, Union)
+from dataclasses import dataclass, field
+from urllib.parse import urlencode, urljoin, urlparse
+
+try:
+    import yaml
+except ImportError:  # endpoints.yaml support is optional
+    yaml = None
+
+from metrics import BREAKER_STATE, BREAKER_STATES
+from ratelimit import (BACKOFF_STATUSES, HostRateLimiter, get_rate_limiter, host_of,
+                       parse_retry_after)
+from transport import acquire_async_session, release_async_session
 
 logger = logging.getLogger(__name__)
 
+# Path segments that identify a resource rather than an endpoint
+ID_SEGMENT_RE = re.compile(r'^(\d+|[0-9a-fA-F-]{32,36})$')
+# Request headers that change what a GET returns, so cached responses vary by them
+VARY_HEADERS = ('authorization', 'proxy-authorization', 'cookie', 'x-api-key',
+                'api-key', 'accept', 'accept-language')
+
 @dataclass
 class CircuitBreaker:
+    """Breaker for one host/endpoint.
+
+    It opens after ``failure_threshold`` consecutive failures, or when the
+    failure rate or slow-call rate over the last ``window_size`` calls reaches
+    its threshold (once ``min_calls`` calls have been seen). After ``timeout``
+    seconds it goes HALF_OPEN and lets ``half_open_max_calls`` probes through
+    at a time; that many successes close it, any failure reopens it.
+    """
     failure_threshold: int = 5
     timeout: int = 60
     failure_count: int = 0
     last_failure_time: float = 0
     state: str = "CLOSED"  # CLOSED, OPEN, HALF_OPEN
+    window_size: int = 20
+    min_calls: int = 10
+    failure_rate_threshold: float = 0.5
+    slow_call_seconds: float = 5.0
+    slow_call_rate_threshold: float = 0.8
+    half_open_max_calls: int = 1
+    half_open_calls: int = 0
+    half_open_successes: int = 0
+    window: Deque[Tuple[bool, bool]] = field(default_factory=deque)  # (failed, slow)
     
     def is_open(self) -> bool:
         """Check if circuit breaker is open"""
         if self.state == "OPEN":
             if time.time() - self.last_failure_time > self.timeout:
                 self.state = "HALF_OPEN"
+                self.half_open_calls = 0
+                self.half_open_successes = 0
             else:
                 return True
         return False
+
+    def allow_request(self) -> bool:
+        """Admit a request, counting it against the half-open probe limit"""
+        if self.is_open():
+            return False
+        if self.state == "HALF_OPEN":
+            if self.half_open_calls >= self.half_open_max_calls:
+                return False
+            self.half_open_calls += 1
+        return True
+
+    def release(self):
+        """Give back an admitted request that ended without an outcome"""
+        if self.state == "HALF_OPEN":
+            self.half_open_calls = max(0, self.half_open_calls - 1)
+
+    def record_call(self, success: bool, duration: float = 0.0):
+        """Record the outcome of one request (not one attempt)"""
+        if self.state == "HALF_OPEN":
+            self.release()
+            if not success:
+                self.trip()
+                return
+            self.half_open_successes += 1
+            if self.half_open_successes >= self.half_open_max_calls:
+                self.state = "CLOSED"
+                self.failure_count = 0
+                self.window.clear()
+            return
+
+        self.window.append((not success, duration >= self.slow_call_seconds))
+        while len(self.window) > self.window_size:
+            self.window.popleft()
+        if success:
+            self.failure_count = 0
+        else:
+            self.failure_count += 1
+            self.last_failure_time = time.time()
+        if self.state == "CLOSED" and self.should_trip():
+            self.trip()
+
+    def should_trip(self) -> bool:
+        if self.failure_count >= self.failure_threshold:
+            return True
+        if len(self.window) < self.min_calls:
+            return False
+        failures = sum(1 for failed, _ in self.window if failed)
+        slow = sum(1 for _, is_slow in self.window if is_slow)
+        return (failures / len(self.window) >= self.failure_rate_threshold
+                or slow / len(self.window) >= self.slow_call_rate_threshold)
+
+    def trip(self):
+        self.state = "OPEN"
+        self.last_failure_time = time.time()
+        logger.warning(
+            f"Circuit breaker opened ({self.failure_count} consecutive failures)"
+        )
         
     def record_success(self):
         """Record a successful request"""
-        self.failure_count = 0
-        self.state = "CLOSED"
+        self.record_call(True)
         
     def record_failure(self):
         """Record a failed request"""
-        self.failure_count += 1
-        self.last_failure_time = time.time()
-        if self.failure_count >= self.failure_threshold:
-            self.state = "OPEN"
+        self.record_call(False)
+
+
+def breaker_key(url: str) -> str:
+    """Group URLs into endpoints for circuit breaking (ids collapse to ':id')"""
+    parsed = urlparse(url)
+    segments = [':id' if ID_SEGMENT_RE.match(part) else part
+                for part in parsed.path.split('/') if part]
+    return parsed.netloc + '/' + '/'.join(segments)
+
+
+def backoff_delay(attempt: int, backoff_factor: float,
+                  retry_after: Optional[float] = None,
+                  max_delay: float = 300.0) -> float:
+    """Full-jitter exponential backoff, never shorter than Retry-After"""
+    delay = random.uniform(0, backoff_factor * (2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return min(delay, max_delay)
+
+
+def load_endpoints(path: str = "config/endpoints.yaml") -> Dict[str, Dict]:
+    """Read the endpoints declared in endpoints.yaml, keyed by name"""
+    if yaml is None:
+        logger.warning(f"PyYAML is not installed, cannot read {path}")
+        return {}
+    try:
+        with open(path, 'r') as f:
+            data = yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        logger.warning(f"Endpoints file not found: {path}")
+        return {}
+    return {endpoint['name']: endpoint for endpoint in data.get('endpoints') or []}
+
+
+def load_retry_policy(path: str = "config/endpoints.yaml") -> Dict[str, Any]:
+    """Request retry settings from endpoints.yaml's ``scheduling.retry_policy``.
+
+    ``max_attempts`` counts the first try, so it maps to ``retries`` one lower.
+    """
+    if yaml is None:
+        return {}
+    try:
+        with open(path, 'r') as f:
+            data = yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        return {}
+    return retry_options((data.get('scheduling') or {}).get('retry_policy'))
+
+
+def retry_options(policy: Optional[Dict]) -> Dict[str, Any]:
+    """Turn a ``retry_policy`` block into _request_with_retry keyword arguments"""
+    options = {}
+    if not policy:
+        return options
+    if 'max_attempts' in policy:
+        options['retries'] = max(0, int(policy['max_attempts']) - 1)
+    if 'backoff_factor' in policy:
+        options['backoff_factor'] = float(policy['backoff_factor'])
+    return options
+
+
+def endpoint_rate_limiter(rate_limit: Optional[float],
+                          burst: int = 1) -> Optional[HostRateLimiter]:
+    """Shared limiter for an endpoint's ``rate_limit`` (requests per hour)"""
+    if not rate_limit:
+        return None
+    return get_rate_limiter({'rate_limit': {
+        'delay_seconds': 3600.0 / rate_limit, 'burst': burst, 'jitter': False
+    }})
+
+
+def cache_key(url: str, params: Optional[Dict] = None,
+              headers: Optional[Dict[str, str]] = None) -> str:
+    """Key a GET by its URL, query parameters and credentials.
+
+    The ``VARY_HEADERS`` sent with it go in as a hash after a ``#``, so
+    callers with different API keys don't share responses and the key
+    holds no secrets.
+    """
+    if params:
+        url = f"{url}{'&' if '?' in url else '?'}{urlencode(sorted(params.items()))}"
+    vary = sorted(
+        (name.lower(), str(value)) for name, value in (headers or {}).items()
+        if name.lower() in VARY_HEADERS
+    )
+    if vary:
+        url = f"{url}#{hashlib.sha256(json.dumps(vary).encode()).hexdigest()[:32]}"
+    return url
+
+
+class ResponseCache:
+    """Memoizes decoded GET responses.
+
+    Entries live ``ttl`` seconds (or per path prefix, from ``ttls``) in an
+    in-memory LRU bounded by ``max_entries``. With ``path`` set, they are also
+    written to a SQLite file, so later runs start warm; those writes are
+    batched and made off the event loop. Concurrent misses for the same key
+    share one in-flight request. Cached values are shared between callers and
+    must not be mutated.
+    """
+
+    def __init__(self, ttl: float = 300, max_entries: int = 1024,
+                 path: Optional[str] = None,
+                 ttls: Optional[Dict[str, float]] = None):
+        self.ttl = ttl
+        self.ttls = sorted((ttls or {}).items(), key=lambda item: -len(item[0]))
+        self.max_entries = max(1, max_entries)
+        self.entries: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.disk_hits = 0
+        self.conn = None
+        self.pending: Dict[str, Tuple[float, Any]] = {}  # not yet on disk
+        self.flush_scheduled = False
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value TEXT NOT NULL)"
+            )
+            self.conn.execute(
+                "DELETE FROM responses WHERE expires_at < ?", (time.time(),)
+            )
+            self.conn.commit()
+
+    def ttl_for(self, key: str) -> float:
+        """TTL of the longest ``ttls`` prefix matching the key's path"""
+        path = urlparse(key).path
+        for prefix, ttl in self.ttls:
+            if path.startswith(prefix):
+                return ttl
+        return self.ttl
+
+    def lookup(self, key: str) -> Tuple[bool, Any]:
+        """Return (found, value), checking memory then disk"""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self.entries.move_to_end(key)
+                    return True, entry[1]
+                del self.entries[key]
+            if self.conn is None:
+                return False, None
+            row = self.conn.execute(
+                "SELECT expires_at, value FROM responses "
+                "WHERE key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+        if row is None:
+            return False, None
+        value = json.loads(row[1])
+        self.remember(key, value, row[0])
+        self.disk_hits += 1
+        return True, value
+
+    def remember(self, key: str, value: Any, expires_at: float):
+        with self.lock:
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def store(self, key: str, value: Any, ttl: Optional[float] = None):
+        """Cache a value for ``ttl`` seconds (the key's configured TTL by default).
+
+        On an event loop the disk write happens later, in an executor,
+        together with any other values stored meanwhile.
+        """
+        expires_at = time.time() + (self.ttl_for(key) if ttl is None else ttl)
+        self.remember(key, value, expires_at)
+        if self.conn is None:
+            return
+        with self.lock:
+            self.pending[key] = (expires_at, value)
+            if self.flush_scheduled:
+                return
+            self.flush_scheduled = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        loop.run_in_executor(None, self.flush)
+
+    def flush(self):
+        """Write the values stored since the last flush to disk"""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.flush_scheduled = False
+            self.write(pending)
+
+    def write(self, entries: Dict[str, Tuple[float, Any]]):
+        # Called with the lock held
+        if self.conn is None or not entries:
+            return
+        try:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                    [(key, expires_at, json.dumps(value))
+                     for key, (expires_at, value) in entries.items()]
+                )
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.warning(f"Could not write {len(entries)} cached responses: {e}")
+
+    async def fetch(self, key: str, loader: Callable[[], Awaitable[Any]],
+                    ttl: Optional[float] = None) -> Any:
+        """Return the cached value for ``key``, calling ``loader`` once on a miss.
+
+        None (a failed request) is returned but not cached.
+        """
+        found, value = self.lookup(key)
+        if found:
+            self.hits += 1
+            return value
+
+        future = self.inflight.get(key)
+        if future is not None and future.get_loop() is asyncio.get_running_loop():
+            self.coalesced += 1
+            await asyncio.wait({future})
+            if future.cancelled():  # the request we joined was abandoned
+                return await self.fetch(key, loader, ttl)
+            return future.result()
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            value = await loader()
+            if value is not None:
+                self.store(key, value, ttl)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # waiters get it; don't warn if there are none
+            raise
+        finally:
+            if self.inflight.get(key) is future:
+                del self.inflight[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced,
+                'disk_hits': self.disk_hits, 'entries': len(self.entries)}
+
+    def close(self):
+        if self.conn is not None:
+            with self.lock:
+                pending, self.pending = self.pending, {}
+                self.write(pending)
+                self.conn.close()
+                self.conn = None
+
+
+_response_caches: Dict[tuple, ResponseCache] = {}
+_response_caches_lock = threading.Lock()
+
+
+def get_response_cache(settings: Optional[Dict]) -> Optional[ResponseCache]:
+    """Shared cache for a ``cache`` settings block, or None if not enabled"""
+    if not settings or not settings.get('enabled', True):
+        return None
+    key = json.dumps(settings, sort_keys=True)
+    with _response_caches_lock:
+        if key not in _response_caches:
+            _response_caches[key] = ResponseCache(
+                ttl=settings.get('ttl', 300),
+                max_entries=settings.get('max_entries', 1024),
+                path=settings.get('path'),
+                ttls=settings.get('ttls'),
+            )
+        return _response_caches[key]
+
+
+# A gather_many request: a path to GET, or a dict with method/url and request kwargs
+RequestSpec = Union[str, Dict[str, Any]]
+
+JSON_CHUNK_SIZE = 64 * 1024
+JSON_WHITESPACE = ' \t\n\r'
+JSON_STRING_SPECIAL = re.compile(r'["\\]')
+JSON_STRUCTURAL = re.compile(r'[\[\]{}"]')
+JSON_SCALAR_END = re.compile(r'[^0-9A-Za-z+\-.]')
+
+_decoder = json.JSONDecoder()
+
+
+def get_path(data: Any, path: Optional[str]) -> Any:
+    """Look up a dotted path (``meta.next_cursor``) in decoded JSON"""
+    if not path:
+        return data
+    for key in path.split('.'):
+        if isinstance(data, dict):
+            data = data.get(key)
+        elif isinstance(data, list) and key.isdigit() and int(key) < len(data):
+            data = data[int(key)]
+        else:
+            return None
+    return data
+
+
+class _ValueScanner:
+    """Finds where one JSON value ends in text fed piece by piece.
+
+    Each character is looked at once: the scan picks up where the last
+    piece left off, and the value is decoded a single time once complete.
+    """
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.kind = None  # 'container', 'string' or 'scalar'
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False  # a piece ended on a backslash in a string
+        self.complete = False
+
+    def feed(self, text: str, pos: int) -> int:
+        """Scan ``text`` from ``pos``; returns where the value ended (or len(text))"""
+        start = pos
+        if self.kind is None:
+            first = text[pos]
+            if first in '[{':
+                self.kind, self.depth = 'container', 1
+                pos += 1
+            elif first == '"':
+                self.kind, self.in_string = 'string', True
+                pos += 1
+            else:
+                self.kind = 'scalar'
+        while pos < len(text):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                    pos += 1
+                    continue
+                match = JSON_STRING_SPECIAL.search(text, pos)
+                if match is None:
+                    pos = len(text)
+                    break
+                pos = match.end()
+                if match.group() == '\\':
+                    self.escaped = True
+                    continue
+                self.in_string = False
+                if self.kind == 'string':
+                    self.complete = True
+                    break
+            elif self.kind == 'scalar':
+                # Only ends at the next delimiter: "-1.5e3" split after "-1"
+                # would otherwise decode early
+                match = JSON_SCALAR_END.search(text, pos)
+                if match is None:
+                    pos = len(text)
+                    break
+                pos = match.start()
+                self.complete = True
+                break
+            else:
+                match = JSON_STRUCTURAL.search(text, pos)
+                if match is None:
+                    pos = len(text)
+                    break
+                pos = match.end()
+                char = match.group()
+                if char == '"':
+                    self.in_string = True
+                elif char in '[{':
+                    self.depth += 1
+                else:
+                    self.depth -= 1
+                    if self.depth == 0:
+                        self.complete = True
+                        break
+        self.parts.append(text[start:pos])
+        return pos
+
+    def value(self) -> Any:
+        return json.loads(''.join(self.parts))
+
+
+class JSONItemStream:
+    """Incremental decoder for the items of a JSON array, fed text as it arrives.
+
+    The array is the top-level value, or the one at ``items_key`` (a dotted
+    path of object keys) in an envelope object. Only the element being
+    decoded is buffered. The rest of the envelope (say, a next-page cursor)
+    is decoded into ``envelope``, with the array itself left empty. A
+    top-level value that is not an array is returned as the only item.
+
+    Values that end within the piece they start in are decoded directly;
+    only one cut off by the end of a piece goes through ``_ValueScanner``.
+    """
+
+    def __init__(self, items_key: Optional[str] = None):
+        self.items_key = items_key
+        self.path = items_key.split('.') if items_key else []
+        self.envelope: Any = None
+        self.streamed = False  # the items array was found and streamed
+        self.frames: List[Dict] = []  # envelope objects along the path
+        self.state = 'start'
+        self.scanner: Optional[_ValueScanner] = None
+        self.target = None  # what the scanned value is: 'key', 'field', 'item', 'top'
+        self.key = None
+        self.ready: List[Any] = []  # items completed by the current piece
+
+    def feed(self, text: str) -> List[Any]:
+        """Consume a piece of text; returns the items it completed"""
+        pos = 0
+        while pos < len(text):
+            if self.scanner is not None:
+                pos = self.scanner.feed(text, pos)
+                if self.scanner.complete:
+                    self.finish_value(self.scanner.value())
+                continue
+            char = text[pos]
+            if char in JSON_WHITESPACE or char == '\ufeff':
+                pos += 1
+                continue
+            pos = self.step(text, char, pos)
+        items, self.ready = self.ready, []
+        return items
+
+    def step(self, text: str, char: str, pos: int) -> int:
+        """Handle a structural character outside any value being scanned"""
+        state = self.state
+        if state == 'start':
+            if not self.path and char == '[':
+                self.state, self.streamed = 'items', True
+                return pos + 1
+            if self.path and char == '{':
+                self.envelope = {}
+                self.frames.append(self.envelope)
+                self.state = 'key'
+                return pos + 1
+            return self.scan('top', text, pos)
+        if state == 'key':
+            if char == '}':
+                return self.close_object(pos)
+            if char == '"':
+                return self.scan('key', text, pos)
+        elif state == 'colon':
+            if char == ':':
+                self.state = 'value'
+                return pos + 1
+        elif state == 'value':
+            level = len(self.frames)
+            if self.key == self.path[level - 1]:
+                node = self.frames[-1]
+                if level == len(self.path) and char == '[':
+                    node[self.key] = []
+                    self.state, self.streamed = 'items', True
+                    return pos + 1
+                if level < len(self.path) and char == '{':
+                    node[self.key] = {}
+                    self.frames.append(node[self.key])
+                    self.state = 'key'
+                    return pos + 1
+            return self.scan('field', text, pos)
+        elif state == 'after_value':
+            if char == ',':
+                self.state = 'key'
+                return pos + 1
+            if char == '}':
+                return self.close_object(pos)
+        elif state == 'items':
+            if char == ',':
+                return pos + 1
+            if char == ']':
+                self.state = 'after_value' if self.frames else 'end'
+                return pos + 1
+            return self.scan('item', text, pos)
+        raise ValueError(f"Invalid JSON in response near {char!r}")
+
+    def scan(self, target: str, text: str, pos: int) -> int:
+        """Decode the value starting at ``pos``, or start scanning it"""
+        self.target = target
+        try:
+            value, end = _decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            end = None
+        if end is not None:
+            # Only trust it once its delimiter has arrived: "-1.5e3" cut
+            # after "-1" decodes too
+            follow = end
+            while follow < len(text) and text[follow] in JSON_WHITESPACE:
+                follow += 1
+            if follow < len(text) and text[follow] in ',:]}':
+                self.finish_value(value)
+                return end
+        self.scanner = _ValueScanner()
+        return pos
+
+    def close_object(self, pos: int) -> int:
+        self.frames.pop()
+        self.state = 'after_value' if self.frames else 'end'
+        return pos + 1
+
+    def finish_value(self, value: Any):
+        self.scanner = None
+        if self.target == 'key':
+            self.key = value
+            self.state = 'colon'
+        elif self.target == 'field':
+            self.frames[-1][self.key] = value
+            self.state = 'after_value'
+        elif self.target == 'item':
+            self.ready.append(value)
+            self.state = 'items'
+        elif self.path:
+            self.envelope = value
+            self.state = 'end'
+        else:
+            self.ready.append(value)
+            self.state = 'end'
+
+    def close(self) -> List[Any]:
+        """End of input; returns any last items, and raises if it was truncated"""
+        if self.scanner is not None and self.scanner.kind == 'scalar':
+            self.finish_value(self.scanner.value())  # a bare number ends the body
+        items, self.ready = self.ready, []
+        if self.scanner is not None or self.state not in ('start', 'end'):
+            raise ValueError("Invalid or truncated JSON in response")
+        if self.state == 'start':
+            return items  # empty body
+        if self.path and not self.streamed:
+            # Not an array reachable through object keys (an index in the
+            # path, or another type): take whatever the path leads to
+            found = get_path(self.envelope, self.items_key)
+            items.extend(found if isinstance(found, list) else [])
+        return items
+
+
+async def iter_json_items(
+    chunks: AsyncIterator[bytes], stream: Optional[JSONItemStream] = None
+) -> AsyncIterator[Any]:
+    """Decode a JSON array from byte chunks, yielding each element as it completes.
+
+    Only the element being decoded is buffered, so memory stays flat however
+    long the array is. A body that is not an array is yielded whole. Pass a
+    ``JSONItemStream`` to read an array nested in an envelope, which is left
+    in its ``envelope`` afterwards.
+    """
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    if stream is None:
+        stream = JSONItemStream()
+    async for chunk in chunks:
+        for item in stream.feed(text_decoder.decode(chunk)):
+            yield item
+    for item in stream.feed(text_decoder.decode(b'', final=True)) + stream.close():
+        yield item
+
 
 class APIClient:
-    def __init__(self, base_url: str, headers: Dict[str, str] = None):
+    def __init__(self, base_url: str, headers: Dict[str, str] = None,
+                 rate_limit: Optional[float] = None, burst: int = 1,
+                 concurrency: int = 10, circuit_breaker: Optional[Dict] = None,
+                 cache: Union[ResponseCache, Dict, None] = None):
         self.base_url = base_url
         self.headers = headers or {}
         self.session = None
-        self.circuit_breaker = CircuitBreaker()
+        self.breaker_settings = circuit_breaker or {}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        if not isinstance(cache, ResponseCache):
+            cache = get_response_cache(cache)
+        self.cache = cache
+        self.rate_limiter = endpoint_rate_limiter(rate_limit, burst)
+        self.concurrency = concurrency
+
+    @classmethod
+    def from_endpoint(cls, name: str, endpoints_path: str = "config/endpoints.yaml",
+                      **kwargs) -> 'APIClient':
+        """Build a client for an endpoint declared in endpoints.yaml"""
+        endpoints = load_endpoints(endpoints_path)
+        if name not in endpoints:
+            raise KeyError(f"Endpoint '{name}' not found in {endpoints_path}")
+        endpoint = endpoints[name]
+        kwargs.setdefault('rate_limit', endpoint.get('rate_limit'))
+        kwargs.setdefault('burst', endpoint.get('burst', 1))
+        kwargs.setdefault('concurrency', endpoint.get('concurrency', 10))
+        kwargs.setdefault('circuit_breaker', endpoint.get('circuit_breaker'))
+        kwargs.setdefault('cache', endpoint.get('cache'))
+        return cls(endpoint['url'], **kwargs)
+
+    def breaker_for(self, url: str) -> CircuitBreaker:
+        """The circuit breaker for the endpoint a URL belongs to"""
+        key = breaker_key(urljoin(self.base_url, url))
+        if key not in self.breakers:
+            self.breakers[key] = CircuitBreaker(**self.breaker_settings)
+        return self.breakers[key]
+
+    @property
+    def circuit_breaker(self) -> CircuitBreaker:
+        """Breaker for the base URL's endpoint"""
+        return self.breaker_for(self.base_url)
         
     async def __aenter__(self):
         """Async context manager entry"""
-        self.session = aiohttp.ClientSession(headers=self.headers)
+        # Connections are pooled per event loop and shared with other clients
+        self.session = await acquire_async_session()
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit"""
-        if self.session:
-            await self.session.close()
+        self.session = None
+        await release_async_session()
             
     async def _request_with_retry(self, method: str, url: str, 
                                  retries: int = 3, 
                                  backoff_factor: float = 1.0,
                                  **kwargs) -> Optional[aiohttp.ClientResponse]:
-        """Make HTTP request with retry logic"""
-        if self.circuit_breaker.is_open():
-            logger.warning(f"Circuit breaker is OPEN for {self.base_url}")
+        """Make HTTP request with retry logic.
+
+        Retries count as one call to the endpoint's circuit breaker, which
+        only sees the final outcome.
+        """
+        full_url = urljoin(self.base_url, url)
+        host = host_of(full_url)
+        endpoint = breaker_key(full_url)
+        breaker = self.breaker_for(full_url)
+        allowed = breaker.allow_request()
+        BREAKER_STATE.set(BREAKER_STATES[breaker.state], endpoint=endpoint)
+        if not allowed:
+            logger.warning(f"Circuit breaker is {breaker.state} for {endpoint}")
             return None
             
-        last_exception = None
-        
-        for attempt in range(retries + 1):
-            try:
-                full_url = urljoin(self.base_url, url)
-                response = await self.session.request(method, full_url, **kwargs)
-                
-                # Check if response is successful
-                if response.status < 500:
-                    self.circuit_breaker.record_success()
-                    return response
+        last_error = None
+        elapsed = 0.0
+        recorded = False
+        try:
+            for attempt in range(retries + 1):
+                if self.rate_limiter:
+                    await self.rate_limiter.acquire(host)
+                started = time.monotonic()
+                retry_after = None
+                try:
+                    headers = {**self.headers, **(kwargs.get('headers') or {})}
+                    response = await self.session.request(
+                        method, full_url, **{**kwargs, 'headers': headers}
+                    )
+                    elapsed = time.monotonic() - started
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    if self.rate_limiter:
+                        self.rate_limiter.record_response(
+                            host, response.status, elapsed, retry_after
+                        )
+
+                    # Throttling is not a fault; give up on it quietly when out
+                    # of retries
+                    if response.status < 500 and (
+                        response.status not in BACKOFF_STATUSES or attempt == retries
+                    ):
+                        breaker.record_call(True, elapsed)
+                        recorded = True
+                        return response
+
+                    last_error = f"HTTP {response.status}"
+                    logger.warning(f"HTTP {response.status} for {full_url}")
+                    response.release()
+
+                except Exception as e:
+                    elapsed = time.monotonic() - started
+                    last_error = e
+                    if self.rate_limiter:
+                        self.rate_limiter.record_response(host, None, elapsed)
+                    logger.warning(f"Request failed (attempt {attempt + 1}): {e}")
                     
-                # For 5xx errors, record failure and retry
-                self.circuit_breaker.record_failure()
-                logger.warning(f"HTTP {response.status} for {full_url}")
-                
-            except Exception as e:
-                last_exception = e
-                self.circuit_breaker.record_failure()
-                logger.warning(f"Request failed (attempt {attempt + 1}): {e}")
-                
-            if attempt < retries:
-                # Exponential backoff
-                wait_time = backoff_factor * (2 ** attempt)
-                logger.info(f"Waiting {wait_time}s before retry")
-                await asyncio.sleep(wait_time)
-                
-        logger.error(f"All retries failed for {url}: {last_exception}")
-        return None
+                if attempt < retries:
+                    wait_time = backoff_delay(attempt, backoff_factor, retry_after)
+                    logger.info(f"Waiting {wait_time:.1f}s before retry")
+                    await asyncio.sleep(wait_time)
+
+            breaker.record_call(False, elapsed)
+            recorded = True
+            logger.error(f"All retries failed for {url}: {last_error}")
+            return None
+        finally:
+            if not recorded:
+                breaker.release()
+            BREAKER_STATE.set(BREAKER_STATES[breaker.state], endpoint=endpoint)
         
-    async def get(self, url: str, **kwargs) -> Optional[Dict[Any, Any]]:
-        """Make GET request"""
+    async def get(self, url: str, cache_ttl: Optional[float] = None,
+                  **kwargs) -> Optional[Dict[Any, Any]]:
+        """Make GET request, through the response cache if the client has one.
+
+        ``cache_ttl`` overrides the cache's TTL for this call (0 bypasses it).
+        """
+        if self.cache is None or cache_ttl == 0:
+            return await self.fetch_json(url, **kwargs)
+        key = cache_key(urljoin(self.base_url, url), kwargs.get('params'),
+                        {**self.headers, **(kwargs.get('headers') or {})})
+        return await self.cache.fetch(
+            key, lambda: self.fetch_json(url, **kwargs), cache_ttl
+        )
+
+    async def fetch_json(self, url: str, **kwargs) -> Optional[Dict[Any, Any]]:
+        """GET and decode a JSON response, bypassing the cache"""
         response = await self._request_with_retry("GET", url, **kwargs)
         if response and response.status == 200:
             try:
@@ -146,6 +888,152 @@ class APIClient:
         response = await self._request_with_retry("DELETE", url, **kwargs)
         return response is not None and response.status < 300
 
+    async def request(self, spec: RequestSpec) -> Any:
+        """Send one gather_many request spec through get/post/put/delete"""
+        if isinstance(spec, str):
+            return await self.get(spec)
+        kwargs = dict(spec)
+        method = kwargs.pop('method', 'GET').upper()
+        url = kwargs.pop('url')
+        if method == 'GET':
+            return await self.get(url, **kwargs)
+        if method == 'POST':
+            return await self.post(url, **kwargs)
+        if method == 'PUT':
+            return await self.put(url, **kwargs)
+        if method == 'DELETE':
+            return await self.delete(url, **kwargs)
+        raise ValueError(f"Unsupported method: {method}")
+
+    async def gather_many(self, requests: Iterable[RequestSpec],
+                          concurrency: Optional[int] = None
+                          ) -> AsyncIterator[Tuple[RequestSpec, Any]]:
+        """Run many requests, yielding ``(spec, result)`` as each completes.
+
+        At most ``concurrency`` requests are in flight, and specs are pulled
+        from ``requests`` only as slots free up, so it can be a lazy
+        generator. Results are what ``get``/``post``/... return (None on
+        failure); the endpoint's rate limit still applies to every request.
+        """
+        limit = max(1, concurrency or self.concurrency)
+        specs = iter(requests)
+        pending: Dict[asyncio.Future, RequestSpec] = {}
+
+        def fill():
+            while len(pending) < limit:
+                spec = next(specs, None)
+                if spec is None:
+                    return
+                pending[asyncio.ensure_future(self.request(spec))] = spec
+
+        fill()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    spec = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        logger.error(f"Request {spec} failed: {e}")
+                        result = None
+                    yield spec, result
+                fill()
+        finally:
+            # The consumer stopped early: don't leave requests running
+            for task in pending:
+                task.cancel()
+
+    async def paginate(self, url: str, params: Dict[str, Any] = None,
+                       pagination: Dict[str, Any] = None, items_key: str = None,
+                       max_pages: Optional[int] = None, **kwargs) -> AsyncIterator[Any]:
+        """Yield every item of a paginated list endpoint, one page after another.
+
+        ``pagination['type']`` selects how the next page is found:
+
+        - ``link`` (default): the ``rel="next"`` URL of the Link header
+        - ``cursor``: the value at ``cursor_path`` in the body (default
+          ``next_cursor``), sent back as ``cursor_param``; a URL is followed as is
+        - ``offset``: ``offset_param``/``limit_param`` advanced by ``limit``
+          until a short page
+        - ``page``: ``page_param`` counted up from ``start`` until an empty page
+
+        Items are streamed one by one from the array at ``items_key`` (a
+        dotted path) in an envelope object, or from a top-level JSON array,
+        so large pages are never held in memory whole.
+        """
+        settings = dict(pagination or {})
+        style = settings.get('type', 'link')
+        params = dict(params or {})
+        if style == 'offset':
+            offset_param = settings.get('offset_param', 'offset')
+            limit = settings.get('limit', 100)
+            params[settings.get('limit_param', 'limit')] = limit
+            params.setdefault(offset_param, settings.get('start', 0))
+        elif style == 'page':
+            page_param = settings.get('page_param', 'page')
+            params.setdefault(page_param, settings.get('start', 1))
+        elif style not in ('link', 'cursor'):
+            raise ValueError(f"Unknown pagination type: {style}")
+
+        next_url: Optional[str] = url
+        seen = set()
+        pages = 0
+        while next_url and (max_pages is None or pages < max_pages):
+            page_key = (next_url, tuple(sorted(params.items())))
+            if page_key in seen:
+                logger.warning(f"Pagination loop detected at {next_url}")
+                return
+            seen.add(page_key)
+
+            response = await self._request_with_retry(
+                "GET", next_url, params=params or None, **kwargs
+            )
+            if response is None:
+                return
+            pages += 1
+            count = 0
+            body = None
+            try:
+                if response.status != 200:
+                    logger.error(f"HTTP {response.status} while paginating {next_url}")
+                    return
+                stream = JSONItemStream(items_key)
+                chunks = response.content.iter_chunked(JSON_CHUNK_SIZE)
+                async for item in iter_json_items(chunks, stream):
+                    count += 1
+                    yield item
+                body = stream.envelope
+                links = response.links
+                response_url = str(response.url)
+            finally:
+                response.release()
+
+            if style == 'link':
+                link = links.get('next')
+                next_url = urljoin(response_url, str(link['url'])) if link else None
+                params = {}
+            elif count == 0:
+                return
+            elif style == 'cursor':
+                cursor = get_path(body, settings.get('cursor_path', 'next_cursor'))
+                if not cursor:
+                    return
+                if isinstance(cursor, str) and (
+                    cursor.startswith('/') or '://' in cursor
+                ):
+                    next_url, params = urljoin(response_url, cursor), {}
+                else:
+                    params[settings.get('cursor_param', 'cursor')] = cursor
+            elif style == 'offset':
+                if count < limit:
+                    return
+                params[offset_param] += count
+            elif style == 'page':
+                params[page_param] += 1
+
 # Example usage function
 async def fetch_public_api_data():
     """Example function to fetch and normalize public API data"""
@@ -5,35 +5,61 @@ Main entry point for the automation system
 """
 
 import argparse
+import asyncio
 import json
 import logging
 import os
 import signal
+import subprocess
 import sys
-from typing import Dict, List
-import time
-
-from scraper import Scraper
-from api_client import APIClient
-from notifier import Notifier
-
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/app.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set
+
+from metrics import (REGISTRY, RUN_SECONDS, RUNS, SnapshotPublisher, profiled,
+                     start_metrics_server)
+
+if TYPE_CHECKING:
+    from scheduler import Job, Scheduler
+
+# The scraper, API, storage, scheduler and task queue modules pull in
+# aiohttp, requests, parsers and pyarrow; they are imported where they are
+# used so a run only loads what its mode needs
+
 logger = logging.getLogger(__name__)
 
+
+def setup_logging(log_file: str = 'logs/app.log'):
+    """Log to stdout and ``log_file``"""
+    os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(log_file),
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+
 class AutomationEngine:
     def __init__(self, config_path: str = "config/config.json"):
         self.config_path = config_path
         self.config = self.load_config()
+        self.targets = self.index_targets(self.config)
         self.running = False
         self.jobs = {}
+        # Set by the first SIGINT/SIGTERM: crawls finish their in-flight pages
+        # and leave the rest queued for the next run
+        self.stop_event = threading.Event()
+        self.on_stop: Optional[Callable[[], None]] = None
+        # Stop events of daemon job runs, also set on shutdown
+        self.run_stops: Set[threading.Event] = set()
+        self.job_executor: Optional[ThreadPoolExecutor] = None
+        # --profile: 'auto', 'cprofile' or 'sample' profiles each target run
+        self.profile: Optional[str] = None
+        self.profile_dir = 'logs/profiles'
         
         # Setup signal handlers for graceful shutdown
         signal.signal(signal.SIGINT, self.signal_handler)
@@ -48,53 +74,392 @@ class AutomationEngine:
             logger.error(f"Failed to load config: {e}")
             return {}
             
+    def index_targets(self, config: Dict) -> Dict[str, Dict]:
+        """Targets by name, in config order; the first of a repeated name wins"""
+        targets = {}
+        for target in config.get('targets', []):
+            name = target.get('name')
+            if not name:
+                logger.error(f"Ignoring target without a name: {target}")
+            elif name in targets:
+                logger.warning(
+                    f"Target '{name}' is defined more than once, using the first"
+                )
+            else:
+                targets[name] = target
+        return targets
+
+    def reload_config(self) -> bool:
+        """Re-read the config file, keeping the current one if it can't be parsed"""
+        try:
+            with open(self.config_path, 'r') as f:
+                config = json.load(f)
+        except Exception as e:
+            logger.error(f"Not reloading {self.config_path}: {e}")
+            return False
+        self.config = config
+        self.targets = self.index_targets(config)
+        return True
+
     def signal_handler(self, signum, frame):
-        """Handle shutdown signals gracefully"""
+        """Handle shutdown signals gracefully; a second signal exits at once"""
+        if self.stop_event.is_set():
+            logger.warning(f"Received signal {signum} again, exiting immediately")
+            sys.exit(1)
         logger.info(f"Received signal {signum}, shutting down gracefully...")
         self.running = False
-        sys.exit(0)
+        self.stop_event.set()
+        for event in list(self.run_stops):
+            event.set()
+        if self.on_stop is not None:
+            self.on_stop()
         
-    def run_target(self, target_name: str, dry_run: bool = False):
-        """Run a specific target"""
-        target = None
-        for t in self.config.get('targets', []):
-            if t['name'] == target_name:
-                target = t
-                break
-                
+    def find_target(self, target_name: str) -> Optional[Dict]:
+        target = self.targets.get(target_name)
+        if target is not None:
+            return target
+        logger.error(f"Target '{target_name}' not found in config")
+        return None
+
+    def run_target(self, target_name: str, dry_run: bool = False,
+                   stop_event: Optional[threading.Event] = None):
+        """Run a specific target.
+
+        ``stop_event`` stops the run early (the engine's shutdown event by
+        default).
+        """
+        target = self.find_target(target_name)
         if not target:
-            logger.error(f"Target '{target_name}' not found in config")
             return
+        stop_event = stop_event or self.stop_event
             
         logger.info(f"Running target: {target_name}")
         
         if target.get('mode') == 'static':
-            scraper = Scraper(target, self.config)
+            from scraper import Scraper
+            scraper = Scraper(target, self.config, stop_event)
             if not dry_run:
-                scraper.scrape()
+                self.timed_run(target_name, scraper.scrape, stop_event)
             else:
                 logger.info("Dry run mode - would scrape target")
+        elif target.get('mode') == 'api':
+            from apisync import APISync
+            sync = APISync(target, self.config, stop_event, self.endpoints_path())
+            if not dry_run:
+                self.timed_run(target_name, sync.run, stop_event)
+            else:
+                logger.info("Dry run mode - would sync API target")
         else:
             logger.warning(f"Mode '{target.get('mode')}' not implemented yet")
             
+    def timed_run(self, target_name: str, run: Callable[[], object],
+                  stop_event: Optional[threading.Event] = None):
+        """Run a target's crawl, recording its duration and outcome.
+
+        With --profile the run is profiled as well.
+        """
+        stop_event = stop_event or self.stop_event
+        outcome = 'error'
+        if self.profile:
+            profile = profiled(
+                target_name, self.profile_mode(target_name), self.profile_dir
+            )
+        else:
+            profile = nullcontext()
+        try:
+            with RUN_SECONDS.time(target=target_name), profile:
+                run()
+            outcome = 'stopped' if stop_event.is_set() else 'ok'
+        finally:
+            RUNS.inc(target=target_name, outcome=outcome)
+
+    def profile_mode(self, target_name: str) -> str:
+        """The profiler for a target's run.
+
+        cProfile only sees the job's own thread, which only does the work for
+        sync static targets; async crawls and API syncs run on the I/O loop
+        thread, so ``auto`` samples those instead.
+        """
+        target = self.targets.get(target_name) or {}
+        in_thread = (target.get('mode') == 'static'
+                     and target.get('engine') != 'async')
+        if self.profile == 'auto':
+            return 'cprofile' if in_thread else 'sample'
+        if self.profile == 'cprofile' and not in_thread:
+            logger.warning(f"cProfile won't see {target_name}'s work on the I/O "
+                           f"loop thread; use --profile sample")
+        return self.profile
+
+    def child_args(self) -> List[str]:
+        """Flags passed on to the processes this one starts"""
+        args = ['--config', self.config_path]
+        if self.profile:
+            args += ['--profile', self.profile, '--profile-dir', self.profile_dir]
+        return args
+
+    def endpoints_path(self) -> str:
+        """endpoints.yaml, next to the config file unless ``endpoints_path`` is set"""
+        return self.config.get('endpoints_path') or os.path.join(
+            os.path.dirname(self.config_path), 'endpoints.yaml')
+
+    def enabled_targets(self) -> List[Dict]:
+        """Targets not switched off with ``"enabled": false``"""
+        return [t for t in self.targets.values() if t.get('enabled', True)]
+
     def run_all_targets(self, dry_run: bool = False):
         """Run all enabled targets"""
-        for target in self.config.get('targets', []):
-            if not self.running:
+        for target in self.enabled_targets():
+            if self.stop_event.is_set():
                 break
             self.run_target(target['name'], dry_run)
             
+    def queued_targets(self, target_name: str = None) -> List[Dict]:
+        """Static targets whose pages go through the task queue"""
+        from taskqueue import get_task_queue
+        if target_name:
+            targets = [self.find_target(target_name)]
+        else:
+            targets = self.enabled_targets()
+        return [t for t in targets
+                if t and t.get('mode') == 'static' and get_task_queue(self.config, t)]
+
+    def run_coordinator(self, target_name: str = None, workers: int = 0):
+        """Seed the task queue with the targets' crawls for worker processes.
+
+        With ``workers`` set, that many ``--worker`` processes are started on
+        this host and the coordinator waits for them to drain the queue.
+        """
+        targets = self.queued_targets(target_name)
+        if not targets:
+            logger.error("No static targets with task_queue enabled to coordinate")
+            return
+        from scraper import Scraper
+        for target in targets:
+            scraper = Scraper(target, self.config)
+            frontier = scraper.open_frontier(scraper.new_pagination())
+            logger.info(f"Queued {target['name']}: {len(frontier)} pages pending")
+        if workers <= 0:
+            return
+
+        args = [sys.executable, os.path.abspath(__file__), *self.child_args(),
+                '--worker', '--once']
+        if target_name:
+            args += ['--target', target_name]
+        # Workers hand their metrics back through a file when they exit
+        dumps = tempfile.TemporaryDirectory()
+        paths = [os.path.join(dumps.name, f'worker{n}.json') for n in range(workers)]
+        for path in paths:
+            REGISTRY.watch(path)
+        processes = [subprocess.Popen(args + ['--metrics-dump', path])
+                     for path in paths]
+        logger.info(f"Started {workers} workers")
+        try:
+            for process in processes:
+                while process.poll() is None:
+                    if self.stop_event.wait(1.0):
+                        # Workers got the signal too when it came from the
+                        # terminal; make sure they stop either way
+                        process.send_signal(signal.SIGTERM)
+                        process.wait()
+        finally:
+            for process in processes:
+                if process.poll() is None:
+                    process.terminate()
+                    process.wait()
+            for path in paths:
+                REGISTRY.absorb(path)
+            dumps.cleanup()
+        logger.info(f"All {workers} workers finished")
+
+    def run_worker(self, target_name: str = None, once: bool = False,
+                   idle_interval: float = 2.0):
+        """Crawl pages from the shared task queue alongside other workers.
+
+        Requests to a domain are capped at ``concurrency.per_domain`` across
+        all workers sharing the queue. With ``once``, the worker exits when no
+        target has unfinished pages left.
+        """
+        from scraper import Scraper
+        from taskqueue import DomainSlots, get_task_queue
+        self.running = True
+        slots = {}
+        while not self.stop_event.is_set():
+            busy = False
+            for target in self.queued_targets(target_name):
+                if self.stop_event.is_set():
+                    break
+                task_queue = get_task_queue(self.config, target)
+                delay = task_queue.next_available(target['name'])
+                if delay is None:
+                    continue
+                busy = True
+                if delay > 0:
+                    continue
+                if task_queue.path not in slots:
+                    per_domain = self.config.get('concurrency', {}).get('per_domain', 2)
+                    slots[task_queue.path] = DomainSlots(task_queue, per_domain)
+                scraper = Scraper(target, self.config, self.stop_event,
+                                  slots[task_queue.path])
+                self.timed_run(target['name'], lambda: scraper.scrape(seed=False))
+            if once and not busy:
+                break
+            self.stop_event.wait(idle_interval if not busy else 0.2)
+
+    def export_targets(self, export_format: str, target_name: str = None,
+                       export_path: str = None):
+        """Convert stored output of one or all targets to another format"""
+        from storage import export_target
+        if target_name:
+            targets = [self.find_target(target_name)]
+        else:
+            targets = list(self.targets.values())
+        for target in filter(None, targets):
+            try:
+                export_target(target, export_format, export_path)
+            except Exception as e:
+                logger.error(f"Failed to export {target['name']}: {e}")
+
+    def load_jobs(self, schedule_path: str = None):
+        """Build scheduler jobs from schedule.yaml.
+
+        Without any schedules, every target runs every ``daemon_interval``
+        seconds (1 hour by default).
+        """
+        from scheduler import Job, load_schedule
+        if schedule_path is None:
+            schedule_path = self.schedule_path()
+        entries, defaults = load_schedule(schedule_path)
+        if not entries:
+            interval = self.config.get('daemon_interval', 3600)
+            entries = [{'target': t['name'], 'interval': interval}
+                       for t in self.enabled_targets()]
+
+        jobs = []
+        for entry in entries:
+            try:
+                jobs.append(Job.from_config(entry, defaults))
+            except (KeyError, ValueError) as e:
+                logger.error(f"Invalid schedule {entry.get('name', entry)}: {e}")
+        return jobs, defaults
+
+    def schedule_path(self) -> str:
+        """schedule.yaml, next to the config file"""
+        return os.path.join(os.path.dirname(self.config_path), 'schedule.yaml')
+
+    def config_files(self) -> List[str]:
+        """The files the daemon reloads when they change"""
+        return [self.config_path, self.endpoints_path(), self.schedule_path()]
+
+    async def run_job(self, job: 'Job'):
+        """Run a scheduled job's target in this process, on a job thread.
+
+        Runs share the process's HTTP pools, per-host rate limits, robots
+        rules and response caches, also with runs going on at the same time.
+        When the scheduler cancels a run for exceeding ``max_runtime``, the
+        run is told to stop, as on shutdown, and is waited for. Targets with
+        ``"isolate": true`` run in a child process instead.
+        """
+        target = self.find_target(job.target)
+        if target is None:
+            raise KeyError(f"Target '{job.target}' not found")
+        if target.get('isolate'):
+            await self.run_job_process(job)
+            return
+
+        stop = threading.Event()
+        if self.stop_event.is_set():
+            stop.set()
+        self.run_stops.add(stop)
+        run = asyncio.get_running_loop().run_in_executor(
+            self.job_executor, self.run_target, job.target, False, stop
+        )
+        try:
+            await asyncio.shield(run)
+        except asyncio.CancelledError:
+            logger.warning(f"Stopping {job.name}; it will finish its pages in hand")
+            stop.set()
+            await run
+            raise
+        finally:
+            self.run_stops.discard(stop)
+
+    async def run_job_process(self, job: 'Job'):
+        """Run a job's target in a child process, which can be killed.
+
+        The child publishes its metrics while it runs, and they are merged
+        into this process's when it exits. Its HTTP pools, rate-limit state
+        and in-memory caches go with it.
+        """
+        from scheduler import run_command
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dump = os.path.join(tmpdir, 'metrics.json')
+            REGISTRY.watch(dump)
+            try:
+                await run_command([
+                    sys.executable, os.path.abspath(__file__), *self.child_args(),
+                    '--target', job.target, '--once', '--metrics-dump', dump
+                ])
+            finally:
+                REGISTRY.absorb(dump)
+
     def run_daemon(self):
         """Run in daemon mode"""
+        from scheduler import Scheduler
         self.running = True
         logger.info("Starting daemon mode")
-        
-        while self.running:
-            self.run_all_targets()
-            # Sleep for configured interval or 1 hour by default
-            interval = self.config.get('daemon_interval', 3600)
-            logger.info(f"Sleeping for {interval} seconds")
-            time.sleep(interval)
+
+        jobs, defaults = self.load_jobs()
+        max_workers = defaults.get('max_workers', 2)
+        scheduler = Scheduler(jobs, self.run_job, max_workers)
+        self.jobs = scheduler.jobs
+        self.job_executor = ThreadPoolExecutor(max(1, max_workers),
+                                               thread_name_prefix='job')
+        try:
+            asyncio.run(self.run_scheduler(scheduler))
+        finally:
+            self.job_executor.shutdown()
+            self.job_executor = None
+
+    async def run_scheduler(self, scheduler: 'Scheduler'):
+        """Run the scheduler until a shutdown signal stops it"""
+        loop = asyncio.get_running_loop()
+        self.on_stop = lambda: loop.call_soon_threadsafe(scheduler.stop)
+        watcher = asyncio.ensure_future(self.watch_config(scheduler))
+        try:
+            await scheduler.run()
+        finally:
+            watcher.cancel()
+            self.on_stop = None
+
+    async def watch_config(self, scheduler: 'Scheduler'):
+        """Reload the config files into the running daemon when they change.
+
+        Checked every ``reload_interval`` seconds (0 turns it off).
+        """
+        from scheduler import FileWatcher
+        watcher = FileWatcher(self.config_files())
+        while True:
+            interval = self.config.get('reload_interval', 5)
+            if not interval:
+                return
+            await asyncio.sleep(interval)
+            changed = watcher.changed()
+            if changed:
+                logger.info(f"Reloading after changes to {', '.join(changed)}")
+                self.reload(scheduler)
+                watcher.watch(self.config_files())
+
+    def reload(self, scheduler: 'Scheduler'):
+        """Apply the current config files to a running scheduler.
+
+        Jobs in progress keep running with the config they started with;
+        later runs pick up the new config.json, and endpoints.yaml is read
+        by each run. ``max_workers`` takes a restart to change.
+        """
+        if not self.reload_config():
+            return
+        jobs, _ = self.load_jobs()
+        scheduler.update(jobs)
 
 def main():
     parser = argparse.ArgumentParser(description='HEX Control Nexus Automation Engine')
@@ -103,9 +468,32 @@ def main():
     parser.add_argument('--once', action='store_true', help='Run once and exit')
     parser.add_argument('--daemon', action='store_true', help='Run in daemon mode')
     parser.add_argument('--dry-run', action='store_true', help='Dry run without actually scraping')
-    parser.add_argument('--export', type=str, help='Export format (csv, jsonl, sqlite)')
+    parser.add_argument('--export', type=str,
+                        choices=['csv', 'jsonl', 'sqlite', 'parquet'],
+                        help='Convert stored output to a format '
+                             '(csv, jsonl, sqlite, parquet) and exit')
+    parser.add_argument('--export-path', type=str, help='Destination for --export')
+    parser.add_argument('--coordinator', action='store_true',
+                        help='Queue the targets\' crawls for --worker processes')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='With --coordinator, start this many local workers '
+                             'and wait for them')
+    parser.add_argument('--worker', action='store_true',
+                        help='Crawl pages from the shared task queue '
+                             '(with --once, exit when it is empty)')
+    parser.add_argument('--metrics-port', type=int,
+                        help='Serve /metrics and /metrics.json on this port '
+                             '(overrides config)')
+    parser.add_argument('--profile', nargs='?', const='auto',
+                        choices=['auto', 'cprofile', 'sample'],
+                        help='Profile each target run with cProfile or a stack '
+                             'sampler (default auto: cProfile for sync crawls)')
+    parser.add_argument('--profile-dir', type=str, default='logs/profiles',
+                        help='Where --profile writes its files')
+    parser.add_argument('--metrics-dump', type=str, help=argparse.SUPPRESS)
     
     args = parser.parse_args()
+    setup_logging()
     
     # Print banner
     try:
@@ -115,15 +503,42 @@ def main():
         print("HEX Control Nexus - Multi-Language Automation Hub")
     
     engine = AutomationEngine(args.config)
+    engine.profile = args.profile
+    engine.profile_dir = args.profile_dir
+    # Child processes report through --metrics-dump instead of serving,
+    # publishing while they run so the parent can show their gauges
+    metrics_server = publisher = None
+    if args.metrics_dump:
+        interval = (engine.config.get('metrics') or {}).get('publish_interval', 2.0)
+        publisher = SnapshotPublisher(REGISTRY, args.metrics_dump, interval).start()
+    elif not args.export:
+        metrics_server = start_metrics_server(engine.config, args.metrics_port)
     
-    if args.target:
+    try:
+        run_mode(engine, args)
+    finally:
+        if publisher:
+            publisher.stop()
+        if metrics_server:
+            metrics_server.stop()
+
+    logger.info("Automation run completed")
+
+
+def run_mode(engine: AutomationEngine, args: argparse.Namespace):
+    """Run whichever mode the command line selected"""
+    if args.export:
+        engine.export_targets(args.export, args.target, args.export_path)
+    elif args.coordinator:
+        engine.run_coordinator(args.target, args.workers)
+    elif args.worker:
+        engine.run_worker(args.target, args.once)
+    elif args.target:
         engine.run_target(args.target, args.dry_run)
     elif args.daemon:
         engine.run_daemon()
     else:
         engine.run_all_targets(args.dry_run)
-        
-    logger.info("Automation run completed")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
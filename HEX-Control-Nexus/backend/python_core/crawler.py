@@ -0,0 +1,430 @@
+"""
+HEX Control Nexus - Async Crawl Engine
+Fetches target pages concurrently under global and per-domain limits
+"""
+
+import asyncio
+import atexit
+import logging
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+import aiohttp
+
+from extraction import compile_plan, get_backend
+from frontier import CrawlFrontier, FrontierEntry, Pagination
+from httpcache import FetchResult
+from metrics import BYTES, IN_FLIGHT, PAGES, STAGE_SECONDS, stage_timer
+from ratelimit import BACKOFF_STATUSES, host_of, parse_retry_after
+from robots import RobotsRules, origin_of
+from storage import StreamingWriter
+from transport import acquire_async_session, release_async_session
+
+logger = logging.getLogger(__name__)
+
+# Per-domain semaphores of every crawl on a loop, so crawls running side by
+# side on the I/O loop (overlapping daemon jobs) share ``per_domain``
+_domain_semaphores: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict]' = (
+    weakref.WeakKeyDictionary()
+)
+
+
+class AsyncCrawler:
+    """Concurrent counterpart of the sync engine in Scraper.scrape.
+
+    Pages are fetched with aiohttp under a global semaphore plus one semaphore
+    per domain (the ``concurrency`` block of config.json). Pagination is driven
+    by the same CrawlFrontier as the sync engine, and parsing, extraction and
+    storage settings are shared with the owning Scraper.
+
+    Fetched bodies flow through a parse stage (a thread, or a process pool
+    when ``parse_workers`` is set) and a bounded queue into the storage stage,
+    which streams items to the target's sink in the order pages finish.
+    """
+
+    def __init__(self, scraper):
+        self.scraper = scraper
+        self.target = scraper.target
+        self.config = scraper.config
+
+        concurrency = self.config.get('concurrency', {})
+        self.global_limit = max(1, int(concurrency.get('global', 5)))
+        self.per_domain_limit = max(1, int(concurrency.get('per_domain', 2)))
+
+        self.global_semaphore: Optional[asyncio.Semaphore] = None
+        self.robots_cache = scraper.robots_cache
+        self.rate_limiter = scraper.rate_limiter
+        self.robots_locks: Dict[str, asyncio.Lock] = {}
+
+        self.pagination = Pagination(
+            self.target.get('pagination'), self.target['base_url'], scraper.backend
+        )
+        self.frontier = self.pagination.new_frontier()
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.pending: Set[asyncio.Future] = set()
+        self.exhausted_chains: Set[int] = set()
+
+        # Parse stage: 0 workers parses in a thread of this process, N > 0
+        # hands raw bodies to a pool of N processes
+        self.parse_workers = max(0, int(self.target.get(
+            'parse_workers', concurrency.get('parse_workers', 0)
+        )))
+        self.queue_size = max(1, int(concurrency.get('queue_size', 100)))
+        # Pages taken from the frontier at once: enough to keep every fetch
+        # slot busy with one more waiting behind it
+        self.max_in_flight = self.global_limit * 2
+        self.parse_pool: Optional[ProcessPoolExecutor] = None
+        self.parse_semaphore: Optional[asyncio.Semaphore] = None
+        self.results_queue: Optional[asyncio.Queue] = None
+        self.storage_lock: Optional[asyncio.Lock] = None
+
+    def domain_semaphore(self, url: str) -> asyncio.Semaphore:
+        """Return the semaphore guarding requests to the URL's domain.
+
+        It is shared with the other crawls on the running loop.
+        """
+        semaphores = _domain_semaphores.setdefault(asyncio.get_running_loop(), {})
+        domain = urlparse(url).netloc
+        if domain not in semaphores:
+            semaphores[domain] = asyncio.Semaphore(self.per_domain_limit)
+        return semaphores[domain]
+
+    async def check_robots_txt(self, session: aiohttp.ClientSession, url: str) -> bool:
+        """Check robots.txt for allowed paths using the shared robots cache"""
+        with stage_timer(self.scraper.name, 'robots'):
+            rules = await self.robots_rules(session, url)
+        user_agent = self.scraper.headers['User-Agent']
+        self.rate_limiter.set_crawl_delay(host_of(url), rules.crawl_delay(user_agent))
+        if not rules.can_fetch(user_agent, url):
+            logger.warning(f"Path {urlparse(url).path} disallowed by robots.txt")
+            return False
+        return True
+
+    async def robots_rules(self, session: aiohttp.ClientSession,
+                           url: str) -> RobotsRules:
+        """Return robots.txt rules for the URL's host, fetching once on a miss"""
+        origin = origin_of(url)
+        lock = self.robots_locks.setdefault(origin, asyncio.Lock())
+        async with lock:
+            rules = self.robots_cache.get(origin)
+            if rules is not None:
+                return rules
+            try:
+                async with session.get(
+                    f"{origin}/robots.txt", headers=self.scraper.headers,
+                    timeout=aiohttp.ClientTimeout(total=10)
+                ) as response:
+                    text = await response.text()
+                    return self.robots_cache.store(origin, text, response.status)
+            except Exception as e:
+                logger.warning(f"Could not check robots.txt: {e}")
+                return self.robots_cache.store(origin, None, 0)
+
+    async def fetch(self, session: aiohttp.ClientSession,
+                    url: str) -> Optional[FetchResult]:
+        """Fetch a page body under the global and per-domain limits"""
+        if not await self.check_robots_txt(session, url):
+            logger.error(f"Scraping disallowed by robots.txt: {url}")
+            return None
+
+        host = host_of(url)
+        name = self.scraper.name
+        max_retries = self.config.get('rate_limit', {}).get('max_retries', 2)
+        http_cache = self.scraper.http_cache
+        page_tracker = self.scraper.page_tracker
+        timeout = aiohttp.ClientTimeout(total=30)
+        cached = page_tracker.lookup(url) if page_tracker else None
+        headers = dict(self.scraper.headers)
+        if http_cache:
+            headers.update(http_cache.conditional_headers(cached))
+
+        # Waiting for the host's rate-limit slot only holds this domain's
+        # semaphore, so other domains keep using the global pool meanwhile.
+        async with self.domain_semaphore(url):
+            for attempt in range(max_retries + 1):
+                waiting = time.perf_counter()
+                await self.rate_limiter.acquire(host)
+                async with self.shared_domain_slot(host), self.global_semaphore:
+                    STAGE_SECONDS.observe(time.perf_counter() - waiting,
+                                          target=name, stage='rate_limit')
+                    started = time.monotonic()
+                    try:
+                        with stage_timer(name, 'fetch'), IN_FLIGHT.track(target=name):
+                            async with session.get(
+                                url, headers=headers, timeout=timeout
+                            ) as response:
+                                status = response.status
+                                retry_after = parse_retry_after(
+                                    response.headers.get('Retry-After')
+                                )
+                                self.rate_limiter.record_response(
+                                    host, status, time.monotonic() - started,
+                                    retry_after
+                                )
+                                if (status in BACKOFF_STATUSES
+                                        and attempt < max_retries):
+                                    logger.warning(
+                                        f"HTTP {status} for {url}, retrying"
+                                    )
+                                    continue
+                                if http_cache is None or status != 304:
+                                    response.raise_for_status()
+                                body = await response.read()
+                                BYTES.inc(len(body), target=name)
+                                if http_cache is None:
+                                    return FetchResult(body)
+                                return http_cache.resolve(
+                                    url, status, body, response.headers, cached
+                                )
+                    except Exception as e:
+                        if not isinstance(e, aiohttp.ClientResponseError):
+                            self.rate_limiter.record_response(
+                                host, None, time.monotonic() - started
+                            )
+                        logger.error(f"Failed to scrape {url}: {e}")
+                        return None
+        return None
+
+    @asynccontextmanager
+    async def shared_domain_slot(self, host: str):
+        """Hold one of the host's request slots shared with other worker processes,
+        taken at the host's next turn across them"""
+        slots = self.scraper.domain_slots
+        if slots is None:
+            yield
+            return
+        slot = await slots.acquire_async(host, self.rate_limiter.interval(host))
+        try:
+            yield
+        finally:
+            await slots.release_async(slot)
+
+    def enqueue(self, url: str, depth: int, chain: int):
+        """Admit a URL to the frontier and start fetching it if there is room"""
+        entry = self.frontier.add(url, depth, chain)
+        if entry is None:
+            return
+        if depth:
+            logger.info(f"Next page: {url}")
+        self.dispatch()
+
+    def dispatch(self):
+        """Start crawling frontier entries until ``max_in_flight`` pages are in hand"""
+        stop_event = self.scraper.stop_event
+        while len(self.pending) < self.max_in_flight and not stop_event.is_set():
+            entry = self.frontier.pop()
+            if entry is None:
+                return
+            self.pending.add(asyncio.ensure_future(self.crawl_page(entry)))
+
+    def parse_and_extract(
+        self, content: bytes, entry: FrontierEntry, loop: asyncio.AbstractEventLoop
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """Parse a page and extract items (runs in an executor thread)"""
+        doc = self.scraper.parse_page(content)
+
+        # Hand the next link to the event loop before extracting, so page
+        # N+1 is already downloading while page N is being extracted.
+        next_url = self.pagination.link_url(doc, entry)
+        if next_url:
+            loop.call_soon_threadsafe(
+                self.enqueue, next_url, entry.depth + 1, entry.chain
+            )
+
+        return self.scraper.extract_data(doc, self.target['selectors']), next_url
+
+    async def parse(self, content: bytes,
+                    entry: FrontierEntry) -> Tuple[List[Dict], Optional[str]]:
+        """Run the parse stage in a worker thread or the process pool.
+
+        Returns the page's items and its next_selector link.
+        """
+        loop = asyncio.get_running_loop()
+        async with self.parse_semaphore:
+            if self.parse_pool is None:
+                return await loop.run_in_executor(
+                    None, self.parse_and_extract, content, entry, loop
+                )
+
+            # Pool processes have their own metrics, so the pool round trip
+            # is recorded here as one parse stage covering extraction too
+            with stage_timer(self.scraper.name, 'parse'):
+                data, next_url = await loop.run_in_executor(
+                    self.parse_pool, parse_in_worker, content,
+                    self.scraper.backend.name, self.target['selectors'],
+                    self.pagination.next_selector, entry
+                )
+            if next_url:
+                self.enqueue(next_url, entry.depth + 1, entry.chain)
+            return data, next_url
+
+    async def crawl_page(self, entry: FrontierEntry):
+        """Crawl one frontier entry, letting the frontier retry it if it raises"""
+        try:
+            await self.process_page(entry)
+        except Exception as e:
+            PAGES.inc(target=self.scraper.name, outcome='error')
+            if not self.frontier.fail(entry, str(e)):
+                raise
+
+    async def process_page(self, entry: FrontierEntry):
+        """Fetch a page and hand it through the parse and storage stages"""
+        logger.info(f"Scraping: {entry.url}")
+        result = await self.fetch(self.session, entry.url)
+        if result is None:
+            self.scraper.settle_unfetched(self.frontier, entry)
+            return
+
+        PAGES.inc(target=self.scraper.name,
+                  outcome='unchanged' if result.unchanged else 'fetched')
+        if result.unchanged:
+            # Nothing new since the last run: skip parsing and follow the
+            # pagination links recorded then
+            logger.info(f"Unchanged since last crawl: {entry.url}")
+            for next_url in result.entry.next_urls:
+                self.enqueue(next_url, entry.depth + 1, entry.chain)
+            self.scraper.record_page(result, result.entry.next_urls)
+            self.frontier.complete(entry)
+            return
+
+        # Template pagination doesn't need the parsed page, so prefetch the
+        # next page as soon as this one has downloaded.
+        template_url = self.pagination.template_url(entry)
+        if template_url and entry.chain not in self.exhausted_chains:
+            self.enqueue(template_url, entry.depth + 1, entry.chain)
+
+        data, next_url = await self.parse(result.content, entry)
+        if not data:
+            self.exhausted_chains.add(entry.chain)
+        next_urls = [next_url] if next_url else []
+        if data and template_url:
+            next_urls.append(template_url)
+        # Blocks while the storage stage is behind, throttling the fetchers
+        await self.results_queue.put((entry, data, result, next_urls))
+
+    async def store_results(self, writer: StreamingWriter):
+        """Storage stage: stream parsed pages into the writer until the crawl ends"""
+        loop = asyncio.get_running_loop()
+        while True:
+            result = await self.results_queue.get()
+            if result is None:
+                break
+            entry, data, fetched, next_urls = result
+            # Filtered here, right before the items reach the writer, so
+            # their fingerprints are recorded with the flush that stores them
+            data = self.scraper.changed_items(data, entry.url)
+            if data:
+                async with self.storage_lock:
+                    await loop.run_in_executor(None, self.scraper.store, writer, data)
+            # Completed and cached only after its items reached the writer,
+            # so both are committed with the flush that stores them
+            self.scraper.record_page(fetched, next_urls)
+            self.frontier.complete(entry)
+
+    async def stop_pages(self):
+        """Cancel pages still in progress (the crawl ended or failed)"""
+        for task in self.pending:
+            task.cancel()
+        await asyncio.gather(*self.pending, return_exceptions=True)
+        self.pending = set()
+
+    async def crawl(self, writer: StreamingWriter,
+                    frontier: Optional[CrawlFrontier] = None) -> int:
+        """Crawl the target concurrently, streaming items into ``writer``.
+
+        ``frontier`` defaults to a freshly seeded one for the target.
+        """
+        self.global_semaphore = asyncio.Semaphore(self.global_limit)
+        self.frontier = frontier or self.scraper.open_frontier(self.pagination)
+        self.pending = set()
+        self.exhausted_chains = set()
+        self.results_queue = asyncio.Queue(maxsize=self.queue_size)
+        self.storage_lock = asyncio.Lock()
+        self.parse_pool = (get_parse_pool(self.parse_workers)
+                           if self.parse_workers else None)
+        self.parse_semaphore = asyncio.Semaphore(max(2, self.parse_workers * 2))
+
+        self.session = await acquire_async_session(self.config)
+        storage = asyncio.ensure_future(self.store_results(writer))
+
+        try:
+            while True:
+                self.dispatch()
+                if not self.pending:
+                    # Pages may still be waiting out a retry delay
+                    delay = self.frontier.waiting()
+                    if delay is None or self.scraper.stop_event.is_set():
+                        break
+                    # Flushing commits our finished pages, which other
+                    # workers may be waiting on
+                    async with self.storage_lock:
+                        await asyncio.get_running_loop().run_in_executor(
+                            None, writer.flush
+                        )
+                    await asyncio.sleep(min(delay, 1.0))
+                    continue
+
+                # enqueue() keeps adding to self.pending while we wait, so wait
+                # on a snapshot and only remove what actually finished. The
+                # storage stage is watched too: if the sink raises, pages
+                # would otherwise block forever on the full results queue.
+                done, _ = await asyncio.wait(
+                    self.pending | {storage}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if storage in done:
+                    break
+                self.pending -= done
+                for task in done:
+                    task.result()
+        finally:
+            await self.stop_pages()
+            if not storage.done():
+                await self.results_queue.put(None)
+            await release_async_session()
+            self.session = None
+            # Raises the sink's error, if that is what ended the crawl
+            await storage
+
+        return writer.count
+
+
+@lru_cache(maxsize=64)
+def _worker_pagination(parser: str, next_selector: Optional[str]) -> Pagination:
+    return Pagination({'next_selector': next_selector}, '', get_backend(parser))
+
+
+def parse_in_worker(content: bytes, parser: str, selectors: Dict,
+                    next_selector: Optional[str],
+                    entry: FrontierEntry) -> Tuple[List[Dict], Optional[str]]:
+    """Parse stage run inside a pool process.
+
+    Returns the extracted items and the next-page link. Extraction plans are
+    cached per process, so each worker compiles a target's selectors once.
+    """
+    backend = get_backend(parser)
+    doc = backend.parse(content)
+    next_url = _worker_pagination(parser, next_selector).link_url(doc, entry)
+    return compile_plan(selectors, backend).extract(doc), next_url
+
+
+_parse_pools: Dict[int, ProcessPoolExecutor] = {}
+
+
+def get_parse_pool(workers: int) -> ProcessPoolExecutor:
+    """Return the process-wide parse pool with the given worker count"""
+    if workers not in _parse_pools:
+        _parse_pools[workers] = ProcessPoolExecutor(max_workers=workers)
+    return _parse_pools[workers]
+
+
+@atexit.register
+def shutdown_parse_pools():
+    """Stop all parse pool processes"""
+    for pool in _parse_pools.values():
+        pool.shutdown(wait=False, cancel_futures=True)
+    _parse_pools.clear()
@@ -0,0 +1,262 @@
+"""
+HEX Control Nexus - Extraction Module
+Pluggable HTML parser backends and precompiled selector plans
+"""
+
+import importlib.util
+import logging
+import re
+import sys
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from records import Record, record_type
+
+logger = logging.getLogger(__name__)
+
+ATTR_RE = re.compile(r'::attr\((\w+)\)')
+
+# bs4 does not count the contents of these tags as text
+NON_TEXT_TAGS = frozenset(['script', 'style', 'template'])
+
+
+class BS4Backend:
+    """BeautifulSoup with the pure-Python html.parser (always available)"""
+    name = 'bs4'
+
+    def parse(self, content: Any) -> Any:
+        from bs4 import BeautifulSoup
+        return BeautifulSoup(content, 'html.parser')
+
+    def owns(self, doc: Any) -> bool:
+        # Nothing can have been parsed by a library that was never imported
+        bs4 = sys.modules.get('bs4')
+        return bs4 is not None and isinstance(doc, bs4.BeautifulSoup)
+
+    def compile(self, css: str) -> Any:
+        import soupsieve
+        return soupsieve.compile(css)
+
+    def select(self, node: Any, compiled: Any) -> List[Any]:
+        return compiled.select(node)
+
+    def select_one(self, node: Any, compiled: Any) -> Optional[Any]:
+        return compiled.select_one(node)
+
+    def text(self, node: Any) -> str:
+        return node.get_text(strip=True)
+
+    def attr(self, node: Any, name: str) -> Any:
+        return node.get(name, '')
+
+
+class LxmlBackend:
+    """lxml.html with cssselect-compiled XPath"""
+    name = 'lxml'
+
+    def parse(self, content: Any) -> Any:
+        import lxml.html
+        return lxml.html.document_fromstring(content)
+
+    def owns(self, doc: Any) -> bool:
+        etree = sys.modules.get('lxml.etree')
+        return etree is not None and isinstance(doc, etree._Element)
+
+    def compile(self, css: str) -> Any:
+        from lxml.cssselect import CSSSelector
+        return CSSSelector(css, translator='html')
+
+    def select(self, node: Any, compiled: Any) -> List[Any]:
+        # CSSSelector matches descendant-or-self; bs4 only matches descendants
+        return [match for match in compiled(node) if match is not node]
+
+    def select_one(self, node: Any, compiled: Any) -> Optional[Any]:
+        for match in compiled(node):
+            if match is not node:
+                return match
+        return None
+
+    def text(self, node: Any) -> str:
+        parts: List[str] = []
+        self._collect_text(node, parts)
+        return ''.join(part.strip() for part in parts)
+
+    def _collect_text(self, node: Any, parts: List[str]):
+        if node.tag in NON_TEXT_TAGS:
+            return
+        if node.text:
+            parts.append(node.text)
+        for child in node:
+            if isinstance(child.tag, str):
+                self._collect_text(child, parts)
+            if child.tail:
+                parts.append(child.tail)
+
+    def attr(self, node: Any, name: str) -> Any:
+        return node.get(name, '')
+
+
+class SelectolaxBackend:
+    """selectolax parser (lexbor engine, modest on old releases)"""
+    name = 'selectolax'
+
+    def parse(self, content: Any) -> Any:
+        tree = selectolax_parser()(content)
+        # selectolax counts script/style contents as text; bs4 does not
+        tree.strip_tags(list(NON_TEXT_TAGS))
+        return tree
+
+    def owns(self, doc: Any) -> bool:
+        return 'selectolax' in sys.modules and isinstance(doc, selectolax_parser())
+
+    def compile(self, css: str) -> Any:
+        return css
+
+    def select(self, node: Any, compiled: Any) -> List[Any]:
+        return node.css(compiled)
+
+    def select_one(self, node: Any, compiled: Any) -> Optional[Any]:
+        return node.css_first(compiled)
+
+    def text(self, node: Any) -> str:
+        return node.text(deep=True, separator='', strip=True)
+
+    def attr(self, node: Any, name: str) -> Any:
+        return node.attributes.get(name) or ''
+
+
+BACKENDS = {
+    'bs4': BS4Backend(),
+    'lxml': LxmlBackend(),
+    'selectolax': SelectolaxBackend(),
+}
+
+AUTO_ORDER = ('selectolax', 'lxml', 'bs4')
+
+
+@lru_cache(maxsize=None)
+def backend_available(name: str) -> bool:
+    """Whether a backend's parser library is installed.
+
+    Backends import their library the first time they parse or compile, so a
+    process only loads the parser it actually uses.
+    """
+    if name == 'lxml':
+        return all(importlib.util.find_spec(module) is not None
+                   for module in ('lxml', 'cssselect'))
+    if name == 'selectolax':
+        return importlib.util.find_spec('selectolax') is not None
+    return name == 'bs4'
+
+
+@lru_cache(maxsize=None)
+def selectolax_parser() -> Any:
+    """selectolax's lexbor parser, or modest on releases without lexbor"""
+    try:
+        from selectolax.lexbor import LexborHTMLParser
+        return LexborHTMLParser
+    except ImportError:
+        from selectolax.parser import HTMLParser
+        return HTMLParser
+
+
+def get_backend(name: Optional[str] = 'bs4') -> Any:
+    """Return a parser backend by name, falling back to bs4.
+
+    ``auto`` (opt-in, as other parsers may read broken markup differently)
+    picks the fastest installed backend.
+    """
+    name = name or 'bs4'
+    if name == 'auto':
+        for candidate in AUTO_ORDER:
+            if backend_available(candidate):
+                return BACKENDS[candidate]
+    if name not in BACKENDS:
+        logger.warning(f"Unknown parser backend '{name}', using bs4")
+        return BACKENDS['bs4']
+    if not backend_available(name):
+        logger.warning(f"Parser backend '{name}' is not installed, using bs4")
+        return BACKENDS['bs4']
+    return BACKENDS[name]
+
+
+def backend_for_document(doc: Any, preferred: Any = None) -> Any:
+    """Find the backend that produced a parsed document"""
+    if preferred is not None and preferred.owns(doc):
+        return preferred
+    for name, backend in BACKENDS.items():
+        if backend_available(name) and backend.owns(doc):
+            return backend
+    raise TypeError(f"Unsupported document type: {type(doc).__name__}")
+
+
+def parse_field_selector(selector: str) -> Tuple[str, Optional[str]]:
+    """Split a field selector into (css, attribute); attribute None means text"""
+    if selector.endswith('::text'):
+        return selector[:-len('::text')].strip(), None
+    attr_match = ATTR_RE.search(selector)
+    if attr_match:
+        return selector[:attr_match.start()].strip(), attr_match.group(1)
+    return selector, None
+
+
+class ExtractionPlan:
+    """A target's ``selectors`` compiled once for a backend.
+
+    Field selectors are split into CSS and ``::text``/``::attr(name)`` parts
+    and compiled up front, so extracting a page only runs the matchers. Items
+    come out as records of one type per plan (see records.py).
+    """
+
+    def __init__(self, selectors: Dict, backend: Any):
+        self.backend = backend
+        self.item = backend.compile(selectors.get('item', ''))
+        self.fields: List[Tuple[str, Any, Optional[str]]] = []
+        for field_name, selector in selectors.get('fields', {}).items():
+            css, attr = parse_field_selector(selector)
+            try:
+                compiled = backend.compile(css) if css else None
+            except Exception as e:
+                logger.warning(f"Invalid selector for field {field_name}: {e}")
+                compiled = False
+            self.fields.append((field_name, compiled, attr))
+        self.record = record_type(tuple(field_name for field_name, _, _ in self.fields))
+
+    def extract(self, doc: Any) -> List[Record]:
+        """Extract all items from a parsed document"""
+        backend = self.backend
+        items = []
+        for element in backend.select(doc, self.item):
+            values = []
+            for field_name, compiled, attr in self.fields:
+                try:
+                    if compiled is False:
+                        values.append('')
+                        continue
+                    # An empty CSS part (e.g. "::attr(href)") targets the item itself
+                    node = (element if compiled is None
+                            else backend.select_one(element, compiled))
+                    if node is None:
+                        values.append('')
+                    elif attr is None:
+                        values.append(backend.text(node))
+                    else:
+                        values.append(backend.attr(node, attr))
+                except Exception as e:
+                    logger.warning(f"Failed to extract field {field_name}: {e}")
+                    values.append('')
+            items.append(self.record(values))
+        return items
+
+
+@lru_cache(maxsize=256)
+def _compile_plan(backend_name: str, item: str,
+                  fields: Tuple[Tuple[str, str], ...]) -> ExtractionPlan:
+    return ExtractionPlan({'item': item, 'fields': dict(fields)},
+                          BACKENDS[backend_name])
+
+
+def compile_plan(selectors: Dict, backend: Any) -> ExtractionPlan:
+    """Return the cached extraction plan for a selectors block and backend"""
+    fields = tuple(selectors.get('fields', {}).items())
+    return _compile_plan(backend.name, selectors.get('item', ''), fields)
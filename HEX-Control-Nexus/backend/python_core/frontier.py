@@ -0,0 +1,155 @@
+"""
+HEX Control Nexus - Crawl Frontier Module
+Tracks pages to visit and resolves pagination links for a target
+"""
+
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterator, List, Optional, Set
+from urllib.parse import urldefrag, urljoin, urlparse
+
+from extraction import get_backend
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_PAGES = 100
+
+
+@dataclass(frozen=True)
+class FrontierEntry:
+    url: str
+    depth: int = 0  # pagination hops from the start path
+    chain: int = 0  # index of the start path this page descends from
+    seq: int = 0  # admission order, used to keep output ordering stable
+
+
+def normalize_url(url: str) -> str:
+    """Normalize a URL for the seen-set (drop fragment, lowercase host)"""
+    url, _ = urldefrag(url)
+    parsed = urlparse(url)
+    return parsed._replace(
+        scheme=parsed.scheme.lower(), netloc=parsed.netloc.lower()
+    ).geturl()
+
+
+class CrawlFrontier:
+    """FIFO frontier with a seen-URL set and page/depth limits"""
+
+    def __init__(self, max_pages: Optional[int] = DEFAULT_MAX_PAGES,
+                 max_depth: Optional[int] = None):
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.queue: Deque[FrontierEntry] = deque()
+        self.seen: Set[str] = set()
+        self.scheduled = 0
+
+    def add(self, url: str, depth: int = 0, chain: int = 0) -> Optional[FrontierEntry]:
+        """Schedule a URL; returns the entry, or None if it was rejected"""
+        if self.max_depth is not None and depth > self.max_depth:
+            logger.debug(f"Skipping {url}: depth {depth} exceeds max_depth")
+            return None
+
+        key = normalize_url(url)
+        if key in self.seen:
+            return None
+
+        if self.max_pages is not None and self.scheduled >= self.max_pages:
+            logger.info(
+                f"Frontier limit of {self.max_pages} pages reached, skipping {url}"
+            )
+            return None
+
+        self.seen.add(key)
+        entry = FrontierEntry(url, depth, chain, self.scheduled)
+        self.scheduled += 1
+        self.queue.append(entry)
+        return entry
+
+    def pop(self) -> Optional[FrontierEntry]:
+        """Take the next entry to crawl"""
+        return self.queue.popleft() if self.queue else None
+
+    def complete(self, entry: FrontierEntry):
+        """Mark an entry processed (a no-op in memory, see DurableFrontier)"""
+
+    def fail(self, entry: FrontierEntry, error: str) -> bool:
+        """Record that processing an entry raised.
+
+        Returns whether the frontier will retry it; if not, the caller
+        re-raises.
+        """
+        return False
+
+    def commit(self):
+        """Persist completed entries once their items are in storage"""
+
+    def waiting(self) -> Optional[float]:
+        """Seconds until ``pop`` may return an entry, or None when the crawl is done"""
+        return 0.0 if self.queue else None
+
+    def release(self):
+        """Give up entries popped but not completed"""
+
+    def finish(self):
+        """Clean up after the crawl"""
+
+    def __len__(self) -> int:
+        return len(self.queue)
+
+
+class Pagination:
+    """Resolves next-page URLs from a target's ``pagination`` config.
+
+    ``next_selector`` follows the link found on each page. ``next_url_template``
+    is formatted with ``{page}`` (start paths are page 1) and keeps advancing
+    as long as pages keep yielding items.
+    """
+
+    def __init__(self, config: Optional[Dict], base_url: str, backend: Any = None):
+        config = config or {}
+        self.base_url = base_url
+        self.backend = backend or get_backend('bs4')
+        self.next_selector = config.get('next_selector')
+        self.next_matcher = (self.backend.compile(self.next_selector)
+                             if self.next_selector else None)
+        self.next_url_template = config.get('next_url_template')
+        self.max_pages = config.get('max_pages', DEFAULT_MAX_PAGES)
+        self.max_depth = config.get('max_depth')
+
+    def new_frontier(self) -> CrawlFrontier:
+        """Create a frontier bounded by this target's limits"""
+        return CrawlFrontier(self.max_pages, self.max_depth)
+
+    def seed(self, frontier: CrawlFrontier, start_paths: List[str]):
+        """Add the target's start paths to a frontier"""
+        for chain, path in enumerate(start_paths):
+            frontier.add(urljoin(self.base_url, path), 0, chain)
+
+    def template_url(self, entry: FrontierEntry) -> Optional[str]:
+        """URL of the page after ``entry`` according to next_url_template"""
+        if not self.next_url_template:
+            return None
+        return urljoin(self.base_url,
+                       self.next_url_template.format(page=entry.depth + 2))
+
+    def link_url(self, doc: Any, entry: FrontierEntry) -> Optional[str]:
+        """URL of the page after ``entry`` according to next_selector"""
+        if self.next_matcher is None:
+            return None
+        next_link = self.backend.select_one(doc, self.next_matcher)
+        href = self.backend.attr(next_link, 'href') if next_link is not None else None
+        if href:
+            return urljoin(entry.url, href)
+        return None
+
+    def next_urls(self, doc: Any, entry: FrontierEntry,
+                  has_items: bool) -> Iterator[str]:
+        """All next-page URLs for a parsed page"""
+        link = self.link_url(doc, entry)
+        if link:
+            yield link
+        if has_items:
+            template = self.template_url(entry)
+            if template:
+                yield template
@@ -0,0 +1,372 @@
+"""
+HEX Control Nexus - HTTP Cache Module
+On-disk cache of response validators and bodies for conditional requests
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_hash: str
+    stored_at: float
+    next_urls: List[str] = field(default_factory=list)
+
+
+@dataclass
+class FetchResult:
+    body: Optional[bytes]
+    unchanged: bool = False  # 304, or the same bytes as the cached copy
+    entry: Optional[CacheEntry] = None
+    cache: Optional['HTTPCache'] = field(default=None, repr=False)
+
+    @property
+    def content(self) -> Optional[bytes]:
+        """The page body; a 304's is read from the cache on first use, and is
+        None if it can no longer be read"""
+        if self.body is None and self.cache is not None and self.entry is not None:
+            self.body = self.cache.read_body(self.entry)
+        return self.body
+
+
+class HTTPCache:
+    """Stores ETag/Last-Modified validators and bodies under a directory.
+
+    The index lives in ``index.db``; bodies are zlib-compressed files named by
+    their SHA-256, so identical pages share storage. Next-page URLs found on a
+    page are kept with its entry so an unchanged page can still be paginated
+    without being parsed. Entries are kept per ``scope`` (the target name), so
+    targets crawling the same URL don't see each other's pages as unchanged.
+
+    Every ``gc_interval`` seconds, recording pages also drops entries stored
+    more than ``max_age`` seconds ago (if set) and deletes the bodies no entry
+    refers to any more.
+    """
+
+    def __init__(self, root: str, max_age: Optional[float] = None,
+                 gc_interval: float = 3600):
+        self.root = root
+        self.max_age = max_age
+        self.gc_interval = gc_interval
+        self.last_gc = time.monotonic()
+        self.bodies_dir = os.path.join(root, 'bodies')
+        os.makedirs(self.bodies_dir, exist_ok=True)
+        self.conn = sqlite3.connect(
+            os.path.join(root, 'index.db'), check_same_thread=False
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(responses)")]
+        if columns and 'scope' not in columns:
+            # Entries from before they were scoped by target; it is only a
+            # cache, so the pages are simply fetched in full once more
+            self.conn.execute("DROP TABLE responses")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "scope TEXT NOT NULL, url TEXT NOT NULL, etag TEXT, last_modified TEXT, "
+            "content_hash TEXT NOT NULL, stored_at REAL NOT NULL, next_urls TEXT, "
+            "PRIMARY KEY (scope, url))"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            "scope TEXT NOT NULL, key TEXT NOT NULL, item_hash TEXT NOT NULL, "
+            "url TEXT, seen_at REAL NOT NULL, PRIMARY KEY (scope, key))"
+        )
+        self.conn.commit()
+        self.lock = threading.Lock()
+        self.hits = 0  # responses served as unchanged
+        self.misses = 0
+
+    def lookup(self, scope: str, url: str) -> Optional[CacheEntry]:
+        """Return a scope's cache entry for a URL"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT url, etag, last_modified, content_hash, stored_at, next_urls "
+                "FROM responses WHERE scope = ? AND url = ?", (scope, url)
+            ).fetchone()
+        if row is None:
+            return None
+        return CacheEntry(
+            row[0], row[1], row[2], row[3], row[4], json.loads(row[5] or '[]')
+        )
+
+    def conditional_headers(self, entry: Optional[CacheEntry]) -> Dict[str, str]:
+        """If-None-Match / If-Modified-Since headers for a cached entry"""
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def body_path(self, content_hash: str) -> str:
+        return os.path.join(self.bodies_dir, content_hash[:2], content_hash)
+
+    def read_body(self, entry: CacheEntry) -> Optional[bytes]:
+        """Load a cached body, or None if it has gone missing"""
+        try:
+            with open(self.body_path(entry.content_hash), 'rb') as f:
+                return zlib.decompress(f.read())
+        except (OSError, zlib.error) as e:
+            logger.warning(f"Cached body for {entry.url} unreadable: {e}")
+            return None
+
+    def resolve(self, url: str, status: int, content: bytes, headers: Dict,
+                entry: Optional[CacheEntry]) -> FetchResult:
+        """Turn a (possibly conditional) response into a FetchResult.
+
+        The result's entry is not recorded yet: that is up to ``record``,
+        once the page's items are in storage. A 304's body is only read
+        from disk if its ``content`` is asked for.
+        """
+        if status == 304 and entry is not None:
+            self.hits += 1
+            return FetchResult(None, unchanged=True, entry=entry, cache=self)
+
+        content_hash = hashlib.sha256(content).hexdigest()
+        unchanged = entry is not None and entry.content_hash == content_hash
+        if unchanged:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self.save_body(content, content_hash)
+        next_urls = list(entry.next_urls) if unchanged else []
+        entry = CacheEntry(
+            url, headers.get('ETag'), headers.get('Last-Modified'), content_hash,
+            time.time(), next_urls
+        )
+        return FetchResult(content, unchanged=unchanged, entry=entry)
+
+    def save_body(self, content: bytes, content_hash: str):
+        """Write a response body, unless one with the same hash is stored"""
+        path = self.body_path(content_hash)
+        if os.path.exists(path):
+            # Fresh again, so collect_garbage leaves it to the entry pending
+            # for it even if older entries referring to it are replaced
+            os.utime(path)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(zlib.compress(content))
+        os.replace(tmp_path, path)
+
+    def record(self, scope: str, entries: List[CacheEntry]):
+        """Store the validators and next-page URLs of fetched pages"""
+        if not entries:
+            return
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(scope, entry.url, entry.etag, entry.last_modified,
+                  entry.content_hash, entry.stored_at, json.dumps(entry.next_urls))
+                 for entry in entries]
+            )
+        if time.monotonic() - self.last_gc >= self.gc_interval:
+            self.collect_garbage()
+
+    def collect_garbage(self, grace: float = 3600) -> int:
+        """Drop expired entries and delete unreferenced bodies; returns how
+        many bodies were deleted.
+
+        Bodies written in the last ``grace`` seconds are kept, since their
+        entries may still be waiting for ``record``.
+        """
+        self.last_gc = time.monotonic()
+        with self.lock, self.conn:
+            if self.max_age is not None:
+                self.conn.execute(
+                    "DELETE FROM responses WHERE stored_at < ?",
+                    (time.time() - self.max_age,)
+                )
+            referenced = {
+                row[0] for row in
+                self.conn.execute("SELECT DISTINCT content_hash FROM responses")
+            }
+        cutoff = time.time() - grace
+        removed = 0
+        for dirpath, _, filenames in os.walk(self.bodies_dir):
+            for name in filenames:
+                # Leftover .tmp files from interrupted writes go as well
+                if name in referenced:
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    continue  # written or removed meanwhile
+        if removed:
+            logger.info(f"HTTP cache: removed {removed} unreferenced bodies")
+        return removed
+
+    def item_hashes(self, scope: str, keys: List[str]) -> Dict[str, str]:
+        """Stored fingerprints of the given item keys"""
+        hashes = {}
+        with self.lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT key, item_hash FROM items WHERE scope = ? "
+                    f"AND key IN ({', '.join('?' * len(chunk))})", [scope, *chunk]
+                ).fetchall()
+                hashes.update(rows)
+        return hashes
+
+    def record_items(self, scope: str, rows: List[Tuple[str, str, str]]):
+        """Store ``(key, item_hash, url)`` fingerprints"""
+        if not rows:
+            return
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?)",
+                [(scope, key, item_hash, url, now) for key, item_hash, url in rows]
+            )
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def item_fingerprint(item: Dict) -> str:
+    # dict() so extracted records hash the same as the dicts they replaced
+    return hashlib.sha256(
+        json.dumps(dict(item), sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()
+
+
+class ItemTracker:
+    """Narrows a target's extracted items down to new and changed ones.
+
+    Items are identified by their ``unique_key`` field (or, without one, by
+    their content, so only new items get through) and compared by a hash of
+    all their fields. Fingerprints are recorded by ``commit``, which runs once
+    the items have been flushed to storage; a crash before that only means
+    they are stored again.
+    """
+
+    def __init__(self, cache: HTTPCache, scope: str, unique_key: Optional[str] = None):
+        self.cache = cache
+        self.scope = scope
+        self.unique_key = unique_key
+        self.pending: Dict[str, Tuple[str, str]] = {}
+        self.lock = threading.Lock()
+        self.new = 0
+        self.changed = 0
+        self.unchanged = 0
+
+    def filter(self, url: str, items: List[Dict]) -> List[Dict]:
+        """Return the items that are new or differ from the last stored version"""
+        fingerprints = []
+        for item in items:
+            item_hash = item_fingerprint(item)
+            key = item.get(self.unique_key) if self.unique_key else None
+            key = item_hash if key is None else str(key)
+            fingerprints.append((key, item_hash, item))
+
+        known = self.cache.item_hashes(self.scope, [key for key, _, _ in fingerprints])
+        delta = []
+        with self.lock:
+            for key, item_hash, item in fingerprints:
+                if key in self.pending:
+                    previous = self.pending[key][0]
+                else:
+                    previous = known.get(key)
+                if previous == item_hash:
+                    self.unchanged += 1
+                    continue
+                if previous is None:
+                    self.new += 1
+                else:
+                    self.changed += 1
+                self.pending[key] = (item_hash, url)
+                delta.append(item)
+        return delta
+
+    def commit(self):
+        """Record the fingerprints of items that are now in storage"""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        self.cache.record_items(
+            self.scope,
+            [(key, item_hash, url) for key, (item_hash, url) in pending.items()]
+        )
+
+
+class PageTracker:
+    """Records fetched pages in the cache once their items are in storage.
+
+    An entry recorded at fetch time would have a page whose items never
+    reached the sink (a crash, a failing sink) served as unchanged on the
+    next run, and its items never stored. Entries are held until ``commit``,
+    which runs after a flush, as ItemTracker does with fingerprints.
+    """
+
+    def __init__(self, cache: HTTPCache, scope: str):
+        self.cache = cache
+        self.scope = scope
+        self.pending: Dict[str, CacheEntry] = {}
+        self.lock = threading.Lock()
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        """The recorded entry for a URL in this tracker's scope"""
+        return self.cache.lookup(self.scope, url)
+
+    def add(self, entry: CacheEntry, next_urls: Optional[List[str]] = None):
+        """Record a page on the next commit; call once its items went to the writer"""
+        if next_urls is not None:
+            entry.next_urls = next_urls
+        with self.lock:
+            self.pending[entry.url] = entry
+
+    def commit(self):
+        """Record the pages whose items are now in storage"""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        self.cache.record(self.scope, list(pending.values()))
+
+
+_caches: Dict[str, HTTPCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_http_cache(config: Dict, target: Optional[Dict] = None) -> Optional[HTTPCache]:
+    """Return the shared cache configured by ``http_cache``, or None if disabled.
+
+    A target can turn caching off with ``"http_cache": false`` or point at its
+    own settings block. Settings of a cache already opened by another target
+    (same ``path``) are those it was opened with.
+    """
+    settings = config.get('http_cache') or {}
+    if target is not None and 'http_cache' in target:
+        settings = target['http_cache'] or {}
+    if not settings.get('enabled', False):
+        return None
+
+    root = os.path.abspath(settings.get('path', 'database/http_cache'))
+    with _caches_lock:
+        if root not in _caches:
+            max_age_days = settings.get('max_age_days')
+            _caches[root] = HTTPCache(
+                root,
+                max_age=max_age_days * 86400 if max_age_days is not None else None,
+                gc_interval=settings.get('gc_interval', 3600),
+            )
+        return _caches[root]
@@ -0,0 +1,559 @@
+"""
+HEX Control Nexus - Metrics Module
+Per-stage counters, latency histograms and gauges with Prometheus and JSON export
+"""
+
+import bisect
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter as Tally
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers a cached parse (~1ms) up to a slow page fetch
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0)
+
+
+class Metric:
+    """A named family of samples, one per combination of label values"""
+    kind = 'untyped'
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.lock = threading.Lock()
+
+    def key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self) -> List[Tuple[Dict[str, str], float]]:
+        with self.lock:
+            return [(dict(zip(self.labels, key)), value)
+                    for key, value in self.values.items()]
+
+    def snapshot(self) -> Dict:
+        return {'type': self.kind, 'help': self.help,
+                'samples': [{'labels': labels, 'value': value}
+                            for labels, value in self.samples()]}
+
+    def blank(self) -> 'Metric':
+        """A metric of the same kind and name with no samples"""
+        return type(self)(self.name, self.help, self.labels)
+
+    def merge(self, snapshot: Dict):
+        """Fold in a snapshot taken in another process"""
+        with self.lock:
+            for sample in snapshot['samples']:
+                key = self.key(sample['labels'])
+                self.values[key] = self.values.get(key, 0) + sample['value']
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A value that goes up and down.
+
+    Merged across processes by ``aggregate``: ``sum`` (requests in flight)
+    or ``max`` (the worst breaker state any process sees).
+    """
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 aggregate: str = 'sum'):
+        super().__init__(name, help_text, labels)
+        self.aggregate = aggregate
+
+    def blank(self) -> 'Gauge':
+        return Gauge(self.name, self.help, self.labels, self.aggregate)
+
+    def set(self, value: float, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels):
+        """Count the enclosed block as in progress"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def merge(self, snapshot: Dict):
+        combine = max if self.aggregate == 'max' else (lambda a, b: a + b)
+        with self.lock:
+            for sample in snapshot['samples']:
+                key = self.key(sample['labels'])
+                value = sample['value']
+                if key in self.values:
+                    value = combine(self.values[key], value)
+                self.values[key] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (+Inf last, not cumulative), sum]
+        self.series: Dict[Tuple[str, ...], List] = {}
+
+    def blank(self) -> 'Histogram':
+        return Histogram(self.name, self.help, self.labels, self.buckets)
+
+    def observe(self, value: float, **labels):
+        key = self.key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the enclosed block takes"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> List[Tuple[Dict[str, str], Dict]]:
+        """Per label set: count, sum and cumulative bucket counts"""
+        with self.lock:
+            series = [(key, list(counts), total)
+                      for key, (counts, total) in self.series.items()]
+        samples = []
+        for key, counts, total in series:
+            cumulative = []
+            running = 0
+            for count in counts:
+                running += count
+                cumulative.append(running)
+            bounds = [repr(float(b)) for b in self.buckets] + ['+Inf']
+            samples.append((dict(zip(self.labels, key)),
+                            {'count': running, 'sum': total,
+                             'buckets': dict(zip(bounds, cumulative))}))
+        return samples
+
+    def snapshot(self) -> Dict:
+        return {'type': self.kind, 'help': self.help,
+                'samples': [{'labels': labels, **value}
+                            for labels, value in self.samples()]}
+
+    def merge(self, snapshot: Dict):
+        for sample in snapshot['samples']:
+            key = self.key(sample['labels'])
+            cumulative = list(sample['buckets'].values())
+            counts = [n - (cumulative[i - 1] if i else 0)
+                      for i, n in enumerate(cumulative)]
+            with self.lock:
+                series = self.series.get(key)
+                if series is None:
+                    series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+                for i, n in enumerate(counts[:len(series[0])]):
+                    series[0][i] += n
+                series[1] += sample['sum']
+
+
+def format_labels(labels: Dict[str, str],
+                  extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels.items()) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+               for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+class MetricsRegistry:
+    """The metrics of one process, exportable as Prometheus text or JSON.
+
+    Child processes running jobs publish snapshots to a file while they run
+    (SnapshotPublisher). Once the parent watches that file, ``live`` includes it,
+    so the endpoint shows children's gauges and running totals before they
+    exit.
+    """
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.lock = threading.Lock()
+        self.watched: Set[str] = set()
+
+    def register(self, metric: Metric) -> Metric:
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: Sequence[str] = (),
+              aggregate: str = 'sum') -> Gauge:
+        return self.register(Gauge(name, help_text, labels, aggregate))
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Every metric and its samples as plain JSON-ready data"""
+        return {name: metric.snapshot()
+                for name, metric in sorted(self.metrics.items())}
+
+    def merge(self, snapshot: Dict[str, Dict], gauges: bool = False):
+        """Add counters and histograms from another process's snapshot.
+
+        Gauges are the state of the process that set them, so they are only
+        combined with ``gauges`` (for a view of processes still running).
+        """
+        for name, data in snapshot.items():
+            metric = self.metrics.get(name)
+            if metric is None or metric.kind != data.get('type'):
+                continue
+            if gauges or metric.kind != 'gauge':
+                metric.merge(data)
+
+    def read_file(self, path: str) -> Optional[Dict[str, Dict]]:
+        """A snapshot written with ``dump``, if the process got that far"""
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read metrics from {path}: {e}")
+            return None
+
+    def merge_file(self, path: str):
+        """Merge the final snapshot of a process that has exited"""
+        snapshot = self.read_file(path)
+        if snapshot is not None:
+            self.merge(snapshot)
+
+    def dump(self, path: str):
+        # Replaced in one step, since another process may be reading it
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def watch(self, path: str):
+        """Include a running child's published snapshots in ``live``"""
+        with self.lock:
+            self.watched.add(path)
+
+    def absorb(self, path: str):
+        """Stop watching a child that has exited and merge its final snapshot"""
+        with self.lock:
+            self.watched.discard(path)
+        self.merge_file(path)
+
+    def live(self) -> 'MetricsRegistry':
+        """This process's metrics combined with those of watched children"""
+        with self.lock:
+            paths = list(self.watched)
+        if not paths:
+            return self
+        combined = MetricsRegistry()
+        for metric in list(self.metrics.values()):
+            combined.register(metric.blank())
+        combined.merge(self.snapshot(), gauges=True)
+        for path in paths:
+            snapshot = self.read_file(path)
+            if snapshot is not None:
+                combined.merge(snapshot, gauges=True)
+        return combined
+
+    def render_prometheus(self) -> str:
+        """The text exposition format scraped by Prometheus"""
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for labels, value in metric.samples():
+                if metric.kind != 'histogram':
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+                    continue
+                for bound, count in value['buckets'].items():
+                    bucket_labels = format_labels(labels, ('le', bound))
+                    lines.append(f"{name}_bucket{bucket_labels} {count}")
+                lines.append(f"{name}_sum{format_labels(labels)} {value['sum']}")
+                lines.append(f"{name}_count{format_labels(labels)} {value['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+# Instrumentation shared by both crawl engines, the API client and the engine
+STAGE_SECONDS = REGISTRY.histogram(
+    'hex_stage_seconds',
+    'Time spent in each crawl stage '
+    '(robots, rate_limit, fetch, parse, extract, store)',
+    ['target', 'stage'])
+PAGES = REGISTRY.counter(
+    'hex_pages_total', 'Pages handled, by outcome', ['target', 'outcome'])
+ITEMS = REGISTRY.counter(
+    'hex_items_stored_total', 'Items handed to the storage sink', ['target'])
+BYTES = REGISTRY.counter(
+    'hex_bytes_downloaded_total', 'Response body bytes downloaded', ['target'])
+IN_FLIGHT = REGISTRY.gauge(
+    'hex_requests_in_flight', 'Page requests awaiting a response', ['target'])
+BREAKER_STATE = REGISTRY.gauge(
+    'hex_circuit_breaker_state',
+    'Circuit breaker state per endpoint (0 closed, 1 half-open, 2 open)',
+    ['endpoint'], aggregate='max')
+RUNS = REGISTRY.counter(
+    'hex_target_runs_total', 'Target runs, by outcome', ['target', 'outcome'])
+RUN_SECONDS = REGISTRY.histogram(
+    'hex_target_run_seconds', 'Duration of whole target runs', ['target'],
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600))
+
+BREAKER_STATES = {'CLOSED': 0, 'HALF_OPEN': 1, 'OPEN': 2}
+
+
+def stage_timer(target: str, stage: str):
+    """Context manager timing one stage of a target's crawl"""
+    return STAGE_SECONDS.time(target=target, stage=stage)
+
+
+class SnapshotPublisher:
+    """Dumps a registry to a file at an interval, and once more on ``stop``.
+
+    Run by child processes so the parent can show their metrics live.
+    """
+
+    def __init__(self, registry: MetricsRegistry, path: str, interval: float = 2.0):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.registry.dump(self.path)
+            except OSError as e:
+                logger.warning(f"Could not publish metrics to {self.path}: {e}")
+
+    def start(self) -> 'SnapshotPublisher':
+        self.thread = threading.Thread(
+            target=self.run, name='metrics-publisher', daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop publishing and write the final snapshot"""
+        self.stopped.set()
+        self.thread.join()
+        self.registry.dump(self.path)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serves ``/metrics`` (Prometheus) and ``/metrics.json`` (dashboard)"""
+
+    def do_GET(self):
+        registry = self.server.registry.live()
+        path = self.path.split('?', 1)[0]
+        if path == '/metrics':
+            body = registry.render_prometheus().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        elif path == '/metrics.json':
+            body = json.dumps({'timestamp': time.time(), 'pid': os.getpid(),
+                               'metrics': registry.snapshot()}).encode('utf-8')
+            content_type = 'application/json'
+        else:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        # The dashboard is a static page on another origin
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer:
+    """Exports a registry over HTTP from a background thread"""
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY, host: str = '127.0.0.1',
+                 port: int = 9108):
+        self.httpd = ThreadingHTTPServer((host, port), MetricsHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.registry = registry
+        self.url = f'http://{host}:{self.httpd.server_address[1]}'
+        # A short poll interval keeps stop() from holding up the end of a run
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, args=(0.05,), daemon=True
+        )
+
+    def start(self) -> 'MetricsServer':
+        self.thread.start()
+        logger.info(
+            f"Serving metrics on {self.url}/metrics and {self.url}/metrics.json"
+        )
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def start_metrics_server(config: Dict,
+                         port: Optional[int] = None) -> Optional[MetricsServer]:
+    """Start the endpoint from the ``metrics`` config block (or an explicit port).
+
+    Returns None when metrics are disabled or the port is taken.
+    """
+    settings = config.get('metrics') or {}
+    if port is None:
+        if not settings.get('enabled', False):
+            return None
+        port = settings.get('port', 9108)
+    try:
+        return MetricsServer(REGISTRY, settings.get('host', '127.0.0.1'), port).start()
+    except OSError as e:
+        logger.warning(f"Could not serve metrics on port {port}: {e}")
+        return None
+
+
+class StackSampler:
+    """Samples every thread's stack at an interval into folded-stack counts.
+
+    Unlike cProfile it adds no per-call overhead and shows where time goes in
+    waits and executor threads. The output (``frame;frame;frame count`` lines)
+    loads into speedscope or flamegraph.pl.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Tally = Tally()
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def sample(self):
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                filename = os.path.basename(code.co_filename)
+                stack.append(f"{code.co_name} ({filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.run, name='stack-sampler', daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def write(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def profiled(name: str, mode: str = 'cprofile',
+             directory: str = 'logs/profiles') -> Iterator[None]:
+    """Profile the enclosed block and write the result under ``directory``.
+
+    ``cprofile`` writes a pstats file (``python -m pstats``, snakeviz) and
+    logs the top functions; it only sees the calling thread, so work done on
+    an event loop thread or in executors is missing. ``sample`` writes folded
+    stacks of every thread. Neither sees other processes (parse workers).
+    """
+    os.makedirs(directory, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    if mode == 'sample':
+        sampler = StackSampler()
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            path = os.path.join(directory, f"{name}-{stamp}.folded")
+            sampler.write(path)
+            logger.info(f"Wrote {sum(sampler.stacks.values())} stack samples to {path}")
+        return
+
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        path = os.path.join(directory, f"{name}-{stamp}.prof")
+        profiler.dump_stats(path)
+        stats = pstats.Stats(profiler, stream=ProfileLog()).sort_stats('cumulative')
+        stats.print_stats(15)
+        stats.stream.flush()
+        logger.info(f"Wrote profile to {path}")
+
+
+class ProfileLog:
+    """File-like sink that sends pstats' report to the log in one record"""
+
+    def __init__(self):
+        self.parts: List[str] = []
+
+    def write(self, text: str):
+        self.parts.append(text)
+
+    def flush(self):
+        if self.parts:
+            report = ''.join(self.parts).strip('\n')
+            logger.info("Profile, top functions by cumulative time:\n" + report)
+            self.parts = []
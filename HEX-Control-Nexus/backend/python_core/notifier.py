@@ -3,88 +3,455 @@ HEX Control Nexus - Notification Module
 Handles sending notifications via Telegram, Email, etc.
 """
 
+import asyncio
+import atexit
 import logging
 import smtplib
 import os
+import threading
+import time
+import weakref
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Optional
-import requests
+from typing import Dict, List, Optional, Tuple
+
+from ratelimit import HostRateLimiter, parse_retry_after
+from transport import acquire_async_session, get_session, release_async_session
 
 logger = logging.getLogger(__name__)
 
+# Minimum seconds between two messages to one chat/webhook/address; whatever
+# queues up in between is sent as a single digest
+DEFAULT_INTERVALS = {
+    'telegram': 1.0,
+    'slack': 1.0,
+    'discord': 0.5,
+    'email': 10.0,
+}
+
+# Longest message text each chat API accepts, in characters
+MAX_LENGTHS = {
+    'telegram': 4096,
+    'discord': 2000,
+    'slack': 40000,
+}
+
+# Sends that failed are retried this many times in all before being dropped
+DEFAULT_MAX_ATTEMPTS = 5
+
+
+@dataclass
+class Notification:
+    channel: str  # telegram, slack, discord or email
+    destination: str  # chat id, webhook URL or email address
+    text: str
+    subject: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    attempts: int = 0  # failed sends so far
+
+
+def digest(notifications: List[Notification]) -> Notification:
+    """Merge notifications for one destination into a single message.
+
+    Repeats of the same text are counted instead of listed again.
+    """
+    first = notifications[0]
+    if len(notifications) == 1:
+        return first
+
+    counts = Counter((n.subject, n.text) for n in notifications)
+    unique = list(OrderedDict.fromkeys((n.subject, n.text) for n in notifications))
+    lines = []
+    for subject, text in unique:
+        repeat = f" (x{counts[subject, text]})" if counts[subject, text] > 1 else ''
+        if first.channel == 'email':
+            lines.append(f"{subject}{repeat}\n\n{text}")
+        else:
+            lines.append(f"- {text}{repeat}")
+
+    if first.channel == 'email':
+        subject = first.subject
+        if len(unique) > 1:
+            subject = f"{subject} (+{len(unique) - 1} more)"
+        return Notification('email', first.destination, "\n\n---\n\n".join(lines),
+                            subject)
+    text = f"{len(notifications)} notifications:\n" + "\n".join(lines)
+    return Notification(first.channel, first.destination, text)
+
+
+def split_message(notification: Notification,
+                  limit: Optional[int]) -> List[Notification]:
+    """Split a message into parts of at most ``limit`` characters.
+
+    Parts break between lines; a single line longer than the limit is cut.
+    """
+    if limit is None or len(notification.text) <= limit:
+        return [notification]
+    parts = []
+    current: Optional[str] = None
+    for line in notification.text.split('\n'):
+        candidate = line if current is None else f"{current}\n{line}"
+        if len(candidate) <= limit:
+            current = candidate
+            continue
+        if current is not None:
+            parts.append(current)
+        while len(line) > limit:
+            parts.append(line[:limit])
+            line = line[limit:]
+        current = line
+    if current:
+        parts.append(current)
+    return [Notification(notification.channel, notification.destination, part,
+                         notification.subject, notification.created_at)
+            for part in parts]
+
+
+class SMTPConnection:
+    """A logged-in SMTP connection kept open between messages.
+
+    Idle connections are checked with NOOP before reuse, and a dropped
+    connection is re-established once per message.
+    """
+
+    def __init__(self, host: str, port: int, user: str, password: str,
+                 idle_timeout: float = 60.0):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.idle_timeout = idle_timeout
+        self.server: Optional[smtplib.SMTP] = None
+        self.last_used = 0.0
+        self.lock = threading.Lock()
+
+    def connect(self) -> smtplib.SMTP:
+        idle = time.monotonic() - self.last_used
+        if self.server is not None and idle > self.idle_timeout:
+            try:
+                if self.server.noop()[0] != 250:
+                    self.reset()
+            except smtplib.SMTPException:
+                self.reset()
+        if self.server is None:
+            server = smtplib.SMTP(self.host, self.port, timeout=30)
+            server.starttls()
+            server.login(self.user, self.password)
+            self.server = server
+        return self.server
+
+    def send(self, message):
+        with self.lock:
+            for attempt in range(2):
+                try:
+                    self.connect().send_message(message)
+                    self.last_used = time.monotonic()
+                    return
+                except (smtplib.SMTPServerDisconnected, ConnectionError):
+                    self.reset()
+                    if attempt:
+                        raise
+
+    def reset(self):
+        server, self.server = self.server, None
+        if server is not None:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def close(self):
+        with self.lock:
+            if self.server is not None:
+                try:
+                    self.server.quit()
+                except Exception:
+                    pass
+                self.reset()
+
+
+class NotificationDispatcher:
+    """Delivers queued notifications from a background event loop.
+
+    ``submit`` only hands the message to the loop thread. Each channel has a
+    worker task that takes everything queued, merges it per destination with
+    ``digest`` and sends it once that destination's interval allows, so
+    bursts collapse into a few messages instead of hitting rate limits.
+    Digests longer than the channel accepts go out in several parts. A send
+    that fails with a network error, 429 or 5xx is queued again after the
+    destination's backoff (or its Retry-After), up to ``max_attempts`` times.
+    """
+
+    def __init__(self, notifier: 'Notifier',
+                 intervals: Optional[Dict[str, float]] = None,
+                 max_queue: int = 10000, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.notifier = notifier
+        self.intervals = dict(DEFAULT_INTERVALS)
+        self.intervals.update(intervals or {})
+        self.max_queue = max_queue
+        self.max_attempts = max(1, max_attempts)
+        # Per channel, failed messages waiting to be queued again
+        self.retrying: Dict[str, int] = {channel: 0 for channel in self.intervals}
+        self.limiters = {
+            channel: HostRateLimiter(delay_seconds=interval, max_delay_seconds=300)
+            for channel, interval in self.intervals.items()
+        }
+        self.loop = asyncio.new_event_loop()
+        self.queues: Dict[str, asyncio.Queue] = {}
+        self.workers = None
+        self.session = None
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name='notifier', daemon=True
+        )
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.closed = False
+
+    def start(self):
+        self.thread.start()
+        self.workers = asyncio.run_coroutine_threadsafe(self.run_workers(), self.loop)
+        _dispatchers.add(self)
+
+    async def run_workers(self):
+        # Held open until close(), for every webhook the workers send
+        self.session = await acquire_async_session()
+        for channel in self.intervals:
+            self.queues[channel] = asyncio.Queue(self.max_queue)
+        await asyncio.gather(*(self.worker(channel) for channel in self.queues))
+
+    def submit(self, notification: Notification) -> bool:
+        """Queue a notification; returns immediately"""
+        if self.closed or notification.channel not in self.intervals:
+            return False
+        self.loop.call_soon_threadsafe(self.put, notification)
+        return True
+
+    def put(self, notification: Notification):
+        queue = self.queues.get(notification.channel)
+        if queue is None:  # workers not set up yet
+            self.loop.call_soon(self.put, notification)
+            return
+        try:
+            queue.put_nowait(notification)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(
+                f"{notification.channel} notification queue full, dropping message"
+            )
+
+    def stop_workers(self):
+        if not self.queues:  # workers not set up yet
+            self.loop.call_soon(self.stop_workers)
+            return
+        for queue in self.queues.values():
+            asyncio.ensure_future(queue.put(None))  # after anything already queued
+
+    async def worker(self, channel: str):
+        queue = self.queues[channel]
+        stopping = False
+        # On shutdown, messages waiting for a retry are still sent
+        while not stopping or self.retrying[channel]:
+            batch = [await queue.get()]
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+            if None in batch:
+                stopping = True
+                batch = [n for n in batch if n is not None]
+
+            # Retried messages were digested and split the first time round
+            groups: Dict[str, Tuple[List, List]] = OrderedDict()
+            for notification in batch:
+                retried, fresh = groups.setdefault(notification.destination, ([], []))
+                (retried if notification.attempts else fresh).append(notification)
+            messages = []
+            for retried, fresh in groups.values():
+                if fresh:
+                    self.coalesced += len(fresh) - 1
+                    limit = MAX_LENGTHS.get(channel)
+                    retried = retried + split_message(digest(fresh), limit)
+                messages.append(retried)
+            await asyncio.gather(*(self.send_all(channel, parts) for parts in messages))
+
+    async def send_all(self, channel: str, messages: List[Notification]):
+        """Send a destination's messages in order, requeueing the rest on a failure"""
+        for index, message in enumerate(messages):
+            delivered, retry_delay = await self.send(channel, message)
+            if not delivered:
+                if retry_delay is not None:
+                    self.retry(channel, messages[index:], retry_delay)
+                else:
+                    self.failed += len(messages) - index
+                return
+
+    async def send(self, channel: str,
+                   notification: Notification) -> Tuple[bool, Optional[float]]:
+        """Send a message; returns (sent, seconds until a retry, or None for none)"""
+        limiter = self.limiters[channel]
+        await limiter.acquire(notification.destination)
+        started = time.monotonic()
+        status, retry_after = await self.deliver(notification)
+        limiter.record_response(notification.destination, status,
+                                time.monotonic() - started, retry_after)
+        if status is not None and status < 300:
+            self.sent += 1
+            return True, None
+        logger.error(f"Failed to send {channel} notification (status {status})")
+        if status is not None and status < 500 and status != 429:
+            return False, None  # rejected; sending it again won't help
+        if notification.attempts + 1 >= self.max_attempts:
+            logger.error(f"Giving up on {channel} notification after "
+                         f"{notification.attempts + 1} attempts")
+            return False, None
+        # The limiter has backed off, and is blocked for any Retry-After
+        backoff = limiter.interval(notification.destination)
+        return False, max(backoff, retry_after or 0.0)
+
+    def retry(self, channel: str, messages: List[Notification], delay: float):
+        """Queue failed messages again once ``delay`` seconds have passed"""
+        self.retrying[channel] += len(messages)
+        self.retried += len(messages)
+        for message in messages:
+            message.attempts += 1
+            self.loop.call_later(delay, self.requeue, message)
+
+    def requeue(self, notification: Notification):
+        self.retrying[notification.channel] -= 1
+        self.put(notification)
+
+    async def deliver(self, notification: Notification):
+        """Send one message; returns (HTTP-like status or None, retry_after)"""
+        try:
+            if notification.channel == 'email':
+                message = self.notifier.build_email(
+                    notification.subject, notification.text, notification.destination
+                )
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self.notifier.smtp.send, message
+                )
+                return 200, None
+            url, payload = self.notifier.webhook_request(notification)
+            async with self.session.post(url, json=payload, timeout=30) as response:
+                await response.read()
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                return response.status, retry_after
+        except Exception as e:
+            logger.error(f"Failed to send {notification.channel} notification: {e}")
+            return None, None
+
+    def stats(self) -> Dict[str, int]:
+        return {'sent': self.sent, 'failed': self.failed, 'retried': self.retried,
+                'dropped': self.dropped, 'coalesced': self.coalesced}
+
+    def close(self, timeout: float = 30.0):
+        """Deliver what is queued, then stop the loop thread"""
+        if self.closed:
+            return
+        self.closed = True
+        _dispatchers.discard(self)
+        self.loop.call_soon_threadsafe(self.stop_workers)
+        try:
+            self.workers.result(timeout)
+        except Exception as e:
+            logger.warning(f"Notifications still queued at shutdown: {e}")
+        asyncio.run_coroutine_threadsafe(
+            release_async_session(), self.loop
+        ).result(timeout)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+        self.loop.close()
+        self.notifier.smtp.close()
+
+
+# Started dispatchers not closed yet, flushed at exit
+_dispatchers: 'weakref.WeakSet[NotificationDispatcher]' = weakref.WeakSet()
+
+
+@atexit.register
+def close_dispatchers():
+    """Flush and stop every dispatcher still running"""
+    for dispatcher in list(_dispatchers):
+        dispatcher.close()
+
+
 class Notifier:
-    def __init__(self):
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = (config or {}).get('notifications', {})
         self.telegram_token = os.getenv('TELEGRAM_BOT_TOKEN')
         self.telegram_chat_id = os.getenv('TELEGRAM_CHAT_ID')
         self.email_host = os.getenv('EMAIL_HOST')
         self.email_port = int(os.getenv('EMAIL_PORT', 587))
         self.email_user = os.getenv('EMAIL_USER')
         self.email_password = os.getenv('EMAIL_PASSWORD')
-        
+        self.smtp = SMTPConnection(self.email_host, self.email_port,
+                                   self.email_user, self.email_password,
+                                   self.config.get('smtp_idle_timeout', 60))
+        self.dispatcher: Optional[NotificationDispatcher] = None
+        self.dispatcher_lock = threading.Lock()
+
     def send_telegram_message(self, message: str) -> bool:
         """Send message via Telegram bot"""
         if not self.telegram_token or not self.telegram_chat_id:
             logger.warning("Telegram credentials not configured")
             return False
-            
+
         try:
             url = f"https://api.telegram.org/bot{self.telegram_token}/sendMessage"
             data = {
                 "chat_id": self.telegram_chat_id,
                 "text": message
             }
-            response = requests.post(url, data=data, timeout=30)
+            response = get_session().post(url, data=data, timeout=30)
             response.raise_for_status()
             logger.info("Telegram message sent successfully")
             return True
         except Exception as e:
             logger.error(f"Failed to send Telegram message: {e}")
             return False
-            
+
+    def build_email(self, subject: str, body: str, to_email: str) -> MIMEMultipart:
+        msg = MIMEMultipart()
+        msg['From'] = self.email_user
+        msg['To'] = to_email
+        msg['Subject'] = subject
+        msg.attach(MIMEText(body, 'plain'))
+        return msg
+
     def send_email(self, subject: str, body: str, to_email: str) -> bool:
-        """Send email notification"""
+        """Send email notification over the reused SMTP connection"""
         if not all([self.email_host, self.email_user, self.email_password]):
             logger.warning("Email credentials not configured")
             return False
-            
+
         try:
-            msg = MIMEMultipart()
-            msg['From'] = self.email_user
-            msg['To'] = to_email
-            msg['Subject'] = subject
-            
-            msg.attach(MIMEText(body, 'plain'))
-            
-            server = smtplib.SMTP(self.email_host, self.email_port)
-            server.starttls()
-            server.login(self.email_user, self.email_password)
-            server.send_message(msg)
-            server.quit()
-            
+            self.smtp.send(self.build_email(subject, body, to_email))
             logger.info("Email sent successfully")
             return True
         except Exception as e:
             logger.error(f"Failed to send email: {e}")
             return False
-            
+
     def send_slack_webhook(self, webhook_url: str, message: str) -> bool:
         """Send message via Slack webhook"""
         try:
             data = {"text": message}
-            response = requests.post(webhook_url, json=data, timeout=30)
+            response = get_session().post(webhook_url, json=data, timeout=30)
             response.raise_for_status()
             logger.info("Slack webhook message sent successfully")
             return True
         except Exception as e:
             logger.error(f"Failed to send Slack webhook message: {e}")
             return False
-            
+
     def send_discord_webhook(self, webhook_url: str, message: str) -> bool:
         """Send message via Discord webhook"""
         try:
             data = {"content": message}
-            response = requests.post(webhook_url, json=data, timeout=30)
+            response = get_session().post(webhook_url, json=data, timeout=30)
             response.raise_for_status()
             logger.info("Discord webhook message sent successfully")
             return True
@@ -92,12 +459,72 @@ class Notifier:
             logger.error(f"Failed to send Discord webhook message: {e}")
             return False
 
+    def webhook_request(self, notification: Notification):
+        """URL and JSON payload that deliver a chat notification"""
+        if notification.channel == 'telegram':
+            url = f"https://api.telegram.org/bot{self.telegram_token}/sendMessage"
+            return url, {"chat_id": notification.destination, "text": notification.text}
+        if notification.channel == 'slack':
+            return notification.destination, {"text": notification.text}
+        if notification.channel == 'discord':
+            return notification.destination, {"content": notification.text}
+        raise ValueError(f"Unknown channel: {notification.channel}")
+
+    def get_dispatcher(self) -> NotificationDispatcher:
+        """Start the background dispatcher on first use"""
+        with self.dispatcher_lock:
+            if self.dispatcher is None:
+                self.dispatcher = NotificationDispatcher(
+                    self, self.config.get('intervals'),
+                    self.config.get('max_queue', 10000),
+                    self.config.get('max_attempts', DEFAULT_MAX_ATTEMPTS)
+                )
+                self.dispatcher.start()
+            return self.dispatcher
+
+    def notify(self, channel: str, message: str, destination: Optional[str] = None,
+               subject: Optional[str] = None) -> bool:
+        """Queue a notification for background delivery; returns immediately.
+
+        ``destination`` is the webhook URL for slack/discord and the address
+        for email; telegram defaults to TELEGRAM_CHAT_ID.
+        """
+        if channel == 'telegram':
+            if not self.telegram_token or not (destination or self.telegram_chat_id):
+                logger.warning("Telegram credentials not configured")
+                return False
+            destination = destination or self.telegram_chat_id
+        elif channel == 'email' and not all(
+            [self.email_host, self.email_user, self.email_password]
+        ):
+            logger.warning("Email credentials not configured")
+            return False
+        if not destination:
+            logger.warning(f"No destination for {channel} notification")
+            return False
+        return self.get_dispatcher().submit(
+            Notification(channel, destination, message, subject or "HEX Control Nexus")
+        )
+
+    def close(self, timeout: float = 30.0):
+        """Flush queued notifications and close connections"""
+        if self.dispatcher is not None:
+            self.dispatcher.close(timeout)
+        else:
+            self.smtp.close()
+
 # Example usage
 if __name__ == "__main__":
     notifier = Notifier()
-    
+
     # Example: Send Telegram notification
     # notifier.send_telegram_message("HEX Control Nexus started successfully!")
-    
+
     # Example: Send email notification
-    # notifier.send_email("HEX Control Nexus Alert", "System is running", "admin@example.com")
\ No newline at end of file
+    # notifier.send_email("HEX Control Nexus Alert", "System is running",
+    #                     "admin@example.com")
+
+    # Example: Queue notifications; bursts are merged into digests
+    # notifier.notify("slack", "Target finished",
+    #                 destination="https://hooks.slack.com/...")
+    # notifier.close()
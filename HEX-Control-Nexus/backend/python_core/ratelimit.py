@@ -0,0 +1,166 @@
+"""
+HEX Control Nexus - Rate Limiter Module
+Schedules requests per host with an adaptive leaky bucket
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_STATUSES = (429, 503)
+
+
+def host_of(url: str) -> str:
+    """Return the host[:port] a URL is rate limited under"""
+    return urlparse(url).netloc or url
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        logger.debug(f"Ignoring invalid Retry-After: {value}")
+        return None
+
+
+@dataclass
+class HostBucket:
+    interval: float  # current seconds between requests, adapted over time
+    min_interval: float  # floor from config delay or robots Crawl-delay
+    tat: float = 0.0  # theoretical arrival time of the next request (GCRA)
+    blocked_until: float = 0.0  # set from Retry-After
+
+
+class HostRateLimiter:
+    """Per-host request scheduler (GCRA leaky bucket).
+
+    ``reserve`` hands out the next free slot for a host and returns how long
+    the caller has to wait for it, so only requests to the same host queue up
+    behind each other. The interval backs off on 429/503 and slow responses
+    and recovers towards the configured delay on fast successes.
+    """
+
+    def __init__(self, delay_seconds: float = 1.0, jitter: bool = False, burst: int = 1,
+                 max_delay_seconds: float = 60.0, slow_latency_seconds: float = 5.0):
+        self.delay_seconds = max(0.0, delay_seconds)
+        self.jitter = jitter
+        self.burst = max(1, burst)
+        self.max_delay_seconds = max(self.delay_seconds, max_delay_seconds)
+        self.slow_latency_seconds = slow_latency_seconds
+        self.buckets: Dict[str, HostBucket] = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'HostRateLimiter':
+        """Build a limiter from the ``rate_limit`` block of config.json"""
+        rate_limit = config.get('rate_limit', {})
+        return cls(
+            delay_seconds=rate_limit.get('delay_seconds', 1.0),
+            jitter=rate_limit.get('jitter', False),
+            burst=rate_limit.get('burst', 1),
+            max_delay_seconds=rate_limit.get('max_delay_seconds', 60.0),
+            slow_latency_seconds=rate_limit.get('slow_latency_seconds', 5.0),
+        )
+
+    def bucket(self, host: str) -> HostBucket:
+        """Return the bucket for a host (caller holds the lock)"""
+        if host not in self.buckets:
+            self.buckets[host] = HostBucket(self.delay_seconds, self.delay_seconds)
+        return self.buckets[host]
+
+    def reserve(self, host: str) -> float:
+        """Claim the next request slot for a host; returns seconds to wait"""
+        with self.lock:
+            bucket = self.bucket(host)
+            now = time.monotonic()
+            interval = bucket.interval
+            if self.jitter:
+                interval += random.uniform(0, 1)
+
+            tolerance = (self.burst - 1) * bucket.interval
+            slot = max(now, bucket.tat - tolerance, bucket.blocked_until)
+            bucket.tat = max(bucket.tat, slot) + interval
+            return slot - now
+
+    def wait(self, host: str):
+        """Block the calling thread until the host's next slot"""
+        delay = self.reserve(host)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire(self, host: str):
+        """Wait for the host's next slot without blocking the event loop"""
+        delay = self.reserve(host)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def set_crawl_delay(self, host: str, crawl_delay: Optional[float]):
+        """Apply a robots.txt Crawl-delay as the minimum interval for a host"""
+        if crawl_delay is None:
+            return
+        with self.lock:
+            bucket = self.bucket(host)
+            bucket.min_interval = max(self.delay_seconds, crawl_delay)
+            bucket.interval = max(bucket.interval, bucket.min_interval)
+
+    def record_response(self, host: str, status: Optional[int], latency: float,
+                        retry_after: Optional[float] = None):
+        """Adapt a host's rate from an observed response.
+
+        ``status`` is None for network errors, which are treated like a
+        throttling response.
+        """
+        with self.lock:
+            bucket = self.bucket(host)
+            now = time.monotonic()
+
+            if status is None or status in BACKOFF_STATUSES:
+                bucket.interval = min(self.max_delay_seconds,
+                                      max(bucket.interval * 2, 1.0))
+                if retry_after is not None:
+                    bucket.blocked_until = max(bucket.blocked_until, now + retry_after)
+                logger.info(f"Backing off {host}: interval now {bucket.interval:.2f}s")
+            elif latency > self.slow_latency_seconds:
+                bucket.interval = min(self.max_delay_seconds,
+                                      max(bucket.interval * 1.5, 0.5))
+            else:
+                bucket.interval = max(bucket.min_interval, bucket.interval * 0.9)
+
+    def interval(self, host: str) -> float:
+        """Current interval between requests to a host"""
+        with self.lock:
+            return self.bucket(host).interval
+
+
+_shared_limiters: Dict[tuple, HostRateLimiter] = {}
+_shared_lock = threading.Lock()
+
+
+def get_rate_limiter(config: Optional[Dict] = None) -> HostRateLimiter:
+    """Return the process-wide limiter for config's ``rate_limit`` settings.
+
+    Scrapers built from the same settings share one limiter, so per-host
+    schedules hold across targets that hit the same site.
+    """
+    config = config or {}
+    key = tuple(sorted(config.get('rate_limit', {}).items()))
+    with _shared_lock:
+        if key not in _shared_limiters:
+            _shared_limiters[key] = HostRateLimiter.from_config(config)
+        return _shared_limiters[key]
@@ -0,0 +1,168 @@
+"""
+HEX Control Nexus - Records Module
+Fixed-field item records compiled from a target's selector fields
+"""
+
+import json
+from collections.abc import Mapping
+from functools import lru_cache
+from operator import attrgetter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+
+def slot_reader(slots: Sequence[str]) -> Callable[[Any], Tuple]:
+    """A function returning an object's ``slots`` as a tuple"""
+    if not slots:
+        return lambda record: ()
+    if len(slots) == 1:
+        getter = attrgetter(slots[0])
+        return lambda record: (getter(record),)
+    return attrgetter(*slots)
+
+
+class Record(Mapping):
+    """An extracted item stored in slots instead of a dict.
+
+    Concrete types come from ``record_type``, one per set of field names, so
+    the names are kept once per type rather than in every item. A record
+    reads like a dict (``[]``, ``get``, ``in``, ``keys``, ``items``,
+    ``dict(record)``) and compares equal to one with the same items. Its
+    fields can be reassigned but not added to; ``to_dict`` gives a plain dict.
+    """
+    __slots__ = ()
+
+    # Set on each type by record_type
+    fields: Tuple[str, ...] = ()
+    fields_slots: Dict[str, str] = {}
+    getters: Dict[str, Callable[['Record'], Any]] = {}
+    setters: Dict[str, Callable[['Record', Any], None]] = {}
+    read: Callable[['Record'], Tuple] = staticmethod(lambda record: ())  # all values
+    readers: Dict[Tuple[str, ...], Callable[['Record'], Tuple]] = {}
+
+    def __init__(self, values: Iterable[Any]):
+        # Replaced on each type by one that unpacks straight into the slots
+        for setter, value in zip(self.setters.values(), values):
+            setter(self, value)
+
+    def __getitem__(self, key: str) -> Any:
+        return self.getters[key](self)
+
+    def __setitem__(self, key: str, value: Any):
+        try:
+            setter = self.setters[key]
+        except KeyError:
+            raise KeyError(f"{key!r} is not one of the fields {self.fields}") from None
+        setter(self, value)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.fields)
+
+    def __len__(self) -> int:
+        return len(self.fields)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.getters
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Record) and other.fields == self.fields:
+            return self.read(self) == other.read(other)
+        return super().__eq__(other)
+
+    def __reduce__(self):
+        # Record types are made at runtime, so pickles name the fields instead
+        return make_record, (self.fields, self.read(self))
+
+    def __repr__(self) -> str:
+        return f"Record({self.to_dict()!r})"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        getter = self.getters.get(key)
+        return default if getter is None else getter(self)
+
+    def values(self) -> Tuple:
+        return self.read(self)
+
+    def items(self) -> List[Tuple[str, Any]]:
+        return list(zip(self.fields, self.read(self)))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(zip(self.fields, self.read(self)))
+
+    @classmethod
+    def column_reader(cls, columns: Tuple[str, ...],
+                      missing: Any = '') -> Callable[['Record'], Tuple]:
+        """A function returning a record's values for ``columns`` in order"""
+        key = (columns, missing)
+        reader = cls.readers.get(key)
+        if reader is None:
+            if columns == cls.fields:
+                reader = cls.read
+            elif all(column in cls.getters for column in columns):
+                reader = slot_reader([cls.fields_slots[column] for column in columns])
+            else:
+                getters = [cls.getters.get(column) for column in columns]
+
+                def reader(record: 'Record') -> Tuple:
+                    return tuple(missing if getter is None else getter(record)
+                                 for getter in getters)
+            cls.readers[key] = reader
+        return reader
+
+
+@lru_cache(maxsize=256)
+def record_type(fields: Tuple[str, ...]) -> type:
+    """The Record type for an ordered set of field names"""
+    slots = tuple(f'_{n}' for n in range(len(fields)))
+    # One unpacking assignment fills every slot (as namedtuple generates its __new__)
+    namespace: Dict[str, Any] = {}
+    if slots:
+        assign = ''.join(f'self.{slot}, ' for slot in slots) + '= values'
+    else:
+        assign = 'pass'
+    exec(f"def __init__(self, values):\n    {assign}\n", namespace)
+    cls = type('Record', (Record,), {'__slots__': slots, 'fields': fields,
+                                     '__init__': namespace['__init__']})
+    descriptors = [cls.__dict__[slot] for slot in slots]
+    cls.fields_slots = dict(zip(fields, slots))
+    cls.getters = {name: descriptor.__get__
+                   for name, descriptor in zip(fields, descriptors)}
+    cls.setters = {name: descriptor.__set__
+                   for name, descriptor in zip(fields, descriptors)}
+    cls.read = staticmethod(slot_reader(slots))
+    cls.readers = {}
+    return cls
+
+
+def make_record(fields: Tuple[str, ...], values: Iterable[Any]) -> Record:
+    return record_type(fields)(values)
+
+
+def rows(items: Iterable[Mapping], columns: Sequence[str],
+         missing: Any = '') -> Iterator[Sequence[Any]]:
+    """Each item's values for ``columns`` in order, ``missing`` where it has none.
+
+    Records are read straight from their slots; other mappings through ``get``.
+    """
+    columns = tuple(columns)
+    item_type = reader = None
+    for item in items:
+        if type(item) is not item_type:
+            item_type = type(item)
+            reader = None
+            if isinstance(item, Record):
+                reader = item.column_reader(columns, missing)
+        if reader is not None:
+            yield reader(item)
+        else:
+            yield [item.get(column, missing) for column in columns]
+
+
+def json_default(obj: Any) -> Any:
+    """``json.dumps`` fallback that writes records as JSON objects"""
+    if isinstance(obj, Record):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# json.dumps builds a new encoder whenever it gets options; reuse this one
+JSON_ENCODER = json.JSONEncoder(default=json_default)
@@ -0,0 +1,283 @@
+"""
+HEX Control Nexus - Robots.txt Module
+Parses robots.txt rules and caches them per host for the whole process
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Pattern, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 3600
+DEFAULT_ERROR_TTL = 300
+DEFAULT_MAX_HOSTS = 1024
+
+
+def origin_of(url: str) -> str:
+    """Return scheme://host[:port] for a URL"""
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+def compile_pattern(path: str) -> Pattern:
+    """Compile a robots.txt path pattern (supports ``*`` and trailing ``$``)"""
+    anchored = path.endswith('$')
+    if anchored:
+        path = path[:-1]
+    regex = '.*'.join(re.escape(part) for part in path.split('*'))
+    return re.compile(regex + ('$' if anchored else ''))
+
+
+@dataclass
+class RobotsGroup:
+    agents: List[str] = field(default_factory=list)
+    # (length, allow, pattern)
+    rules: List[Tuple[int, bool, Pattern]] = field(default_factory=list)
+    crawl_delay: Optional[float] = None
+
+
+class RobotsRules:
+    """Parsed robots.txt with RFC 9309 matching.
+
+    The group for the most specific matching user-agent token is used (falling
+    back to ``*``), and within it the longest matching rule wins, with Allow
+    winning ties.
+    """
+
+    def __init__(self, groups: Optional[List[RobotsGroup]] = None,
+                 allow_all: bool = False):
+        self.groups = groups or []
+        self.allow_all = allow_all
+
+    @classmethod
+    def parse(cls, text: str) -> 'RobotsRules':
+        """Parse robots.txt content"""
+        groups: List[RobotsGroup] = []
+        current: Optional[RobotsGroup] = None
+        in_agent_lines = False
+
+        for raw_line in text.splitlines():
+            line = raw_line.split('#', 1)[0].strip()
+            if ':' not in line:
+                continue
+            key, value = line.split(':', 1)
+            key = key.strip().lower()
+            value = value.strip()
+
+            if key == 'user-agent':
+                if current is None or not in_agent_lines:
+                    current = RobotsGroup()
+                    groups.append(current)
+                current.agents.append(value.lower())
+                in_agent_lines = True
+                continue
+
+            in_agent_lines = False
+            if current is None:
+                continue
+
+            if key in ('allow', 'disallow'):
+                if not value:
+                    # "Disallow:" with no path means allow everything
+                    continue
+                current.rules.append(
+                    (len(value), key == 'allow', compile_pattern(value))
+                )
+            elif key == 'crawl-delay':
+                try:
+                    current.crawl_delay = float(value)
+                except ValueError:
+                    logger.debug(f"Ignoring invalid Crawl-delay: {value}")
+
+        return cls(groups)
+
+    def group_for(self, user_agent: str) -> Optional[RobotsGroup]:
+        """Pick the group whose user-agent token best matches"""
+        user_agent = user_agent.lower()
+        best: Optional[RobotsGroup] = None
+        best_length = -1
+        fallback: Optional[RobotsGroup] = None
+
+        for group in self.groups:
+            for agent in group.agents:
+                if agent == '*':
+                    fallback = fallback or group
+                elif agent in user_agent and len(agent) > best_length:
+                    best, best_length = group, len(agent)
+        return best or fallback
+
+    def can_fetch(self, user_agent: str, url: str) -> bool:
+        """Whether the user agent may fetch the URL"""
+        if self.allow_all:
+            return True
+
+        parsed = urlparse(url)
+        path = parsed.path or '/'
+        if path == '/robots.txt':
+            return True
+        if parsed.query:
+            path += '?' + parsed.query
+
+        group = self.group_for(user_agent)
+        if group is None:
+            return True
+
+        best_length = -1
+        allowed = True
+        for length, allow, pattern in group.rules:
+            if pattern.match(path) and (
+                length > best_length or (length == best_length and allow)
+            ):
+                best_length, allowed = length, allow
+        return allowed
+
+    def crawl_delay(self, user_agent: str) -> Optional[float]:
+        """Crawl-delay for the user agent's group, if any"""
+        group = self.group_for(user_agent)
+        return group.crawl_delay if group else None
+
+
+@dataclass
+class RobotsEntry:
+    rules: RobotsRules
+    text: Optional[str]
+    status: int
+    fetched_at: float
+    expires_at: float
+
+
+class RobotsCache:
+    """Thread-safe per-host robots.txt cache with TTL and LRU eviction.
+
+    When ``persist_path`` is set the raw robots.txt bodies are written to a JSON
+    file so a restarted daemon can reuse them until they expire.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL, max_hosts: int = DEFAULT_MAX_HOSTS,
+                 persist_path: Optional[str] = None,
+                 error_ttl: float = DEFAULT_ERROR_TTL):
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.max_hosts = max_hosts
+        self.persist_path = persist_path
+        self.entries: 'OrderedDict[str, RobotsEntry]' = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if persist_path:
+            self.load()
+
+    def get(self, origin: str) -> Optional[RobotsRules]:
+        """Return cached rules for an origin, or None if missing/expired"""
+        with self.lock:
+            entry = self.entries.get(origin)
+            if entry is None or entry.expires_at <= time.time():
+                self.misses += 1
+                return None
+            self.entries.move_to_end(origin)
+            self.hits += 1
+            return entry.rules
+
+    def store(self, origin: str, text: Optional[str], status: int) -> RobotsRules:
+        """Cache a fetched robots.txt.
+
+        ``status`` is the HTTP status (0 if the fetch failed). A missing file
+        (4xx) allows everything; server errors and failed fetches also allow
+        everything but are retried sooner.
+        """
+        now = time.time()
+        if status == 200 and text is not None:
+            rules = RobotsRules.parse(text)
+            ttl = self.ttl
+        else:
+            rules = RobotsRules(allow_all=True)
+            ttl = self.ttl if 400 <= status < 500 else self.error_ttl
+
+        with self.lock:
+            self.entries[origin] = RobotsEntry(rules, text, status, now, now + ttl)
+            self.entries.move_to_end(origin)
+            while len(self.entries) > self.max_hosts:
+                self.entries.popitem(last=False)
+
+        if self.persist_path:
+            self.save()
+        return rules
+
+    def clear(self):
+        """Drop all cached entries"""
+        with self.lock:
+            self.entries.clear()
+
+    def load(self):
+        """Load unexpired entries from the persistence file"""
+        try:
+            with open(self.persist_path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"Could not load robots cache: {e}")
+            return
+
+        now = time.time()
+        for origin, data in stored.items():
+            if data.get('expires_at', 0) <= now:
+                continue
+            text = data.get('text')
+            status = data.get('status', 0)
+            if status == 200 and text is not None:
+                rules = RobotsRules.parse(text)
+            else:
+                rules = RobotsRules(allow_all=True)
+            self.entries[origin] = RobotsEntry(
+                rules, text, status, data.get('fetched_at', now), data['expires_at']
+            )
+
+    def save(self):
+        """Write the cache to the persistence file atomically"""
+        with self.lock:
+            stored = {
+                origin: {
+                    'text': entry.text,
+                    'status': entry.status,
+                    'fetched_at': entry.fetched_at,
+                    'expires_at': entry.expires_at,
+                }
+                for origin, entry in self.entries.items()
+            }
+        try:
+            directory = os.path.dirname(self.persist_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.persist_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(stored, f)
+            os.replace(tmp_path, self.persist_path)
+        except Exception as e:
+            logger.warning(f"Could not persist robots cache: {e}")
+
+
+_shared_cache: Optional[RobotsCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_robots_cache(config: Optional[Dict] = None) -> RobotsCache:
+    """Return the process-wide robots cache, creating it from ``config['robots']``"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            robots_config = (config or {}).get('robots', {})
+            _shared_cache = RobotsCache(
+                ttl=robots_config.get('ttl', DEFAULT_TTL),
+                max_hosts=robots_config.get('max_hosts', DEFAULT_MAX_HOSTS),
+                persist_path=robots_config.get('cache_path'),
+            )
+        return _shared_cache
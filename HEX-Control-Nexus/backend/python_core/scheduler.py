@@ -0,0 +1,478 @@
+"""
+HEX Control Nexus - Scheduler Module
+Runs targets on cron or interval schedules from config/schedule.yaml
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import Awaitable, Callable, Deque, Dict, FrozenSet, List, Optional, Tuple
+
+try:
+    import yaml
+except ImportError:  # schedule.yaml is optional; the daemon falls back to intervals
+    yaml = None
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+
+logger = logging.getLogger(__name__)
+
+CRON_ALIASES = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *',
+}
+
+MONTH_NAMES = ['jan', 'feb', 'mar', 'apr', 'may', 'jun',
+               'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+DAY_NAMES = ['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat']
+
+# (low, high, names) for minute, hour, day of month, month, day of week
+CRON_FIELDS = [
+    (0, 59, None),
+    (0, 23, None),
+    (1, 31, None),
+    (1, 12, MONTH_NAMES),
+    (0, 7, DAY_NAMES),
+]
+
+# A cron expression that never matches (e.g. "0 0 31 2 *") gives up after this
+MAX_CRON_SEARCH = timedelta(days=366 * 5)
+
+OVERLAP_POLICIES = ('skip', 'queue', 'allow')
+MISFIRE_POLICIES = ('run_once', 'skip')
+
+# Job attributes that come from schedule.yaml (the rest is run state)
+JOB_SETTINGS = ('target', 'cron', 'interval', 'enabled', 'max_runtime', 'timeout',
+                'overlap', 'misfire', 'misfire_grace', 'tz', 'run_at_start')
+
+
+def parse_cron_field(text: str, low: int, high: int,
+                     names: Optional[List[str]] = None) -> FrozenSet[int]:
+    """Expand one cron field (``*``, ``1-5``, ``*/15``, ``mon,wed``) to its values"""
+    def value(token: str) -> int:
+        token = token.lower()
+        if names and token in names:
+            return names.index(token) + (low if low == 1 else 0)
+        number = int(token)
+        if not low <= number <= high:
+            raise ValueError(f"{number} is outside {low}-{high}")
+        return number
+
+    values = set()
+    for part in text.split(','):
+        step = 1
+        if '/' in part:
+            part, step_text = part.split('/', 1)
+            step = int(step_text)
+            if step < 1:
+                raise ValueError(f"Invalid step in cron field '{text}'")
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start_text, end_text = part.split('-', 1)
+            start, end = value(start_text), value(end_text)
+        else:
+            start = value(part)
+            end = high if step > 1 else start
+        if start > end:
+            raise ValueError(f"Invalid range in cron field '{text}'")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class CronExpression:
+    """A five-field cron expression (minute hour day month weekday).
+
+    As in Vixie cron, when both day of month and day of week are restricted a
+    day matches if either one does.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        fields = CRON_ALIASES.get(expression.strip().lower(), expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: '{expression}'")
+        parsed = [parse_cron_field(text, low, high, names)
+                  for text, (low, high, names) in zip(fields, CRON_FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = frozenset(day % 7 for day in weekdays)  # 7 is also Sunday
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def day_matches(self, moment: datetime) -> bool:
+        in_days = moment.day in self.days
+        in_weekdays = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+    def next_after(self, moment: datetime) -> datetime:
+        """First matching minute strictly after ``moment`` (in its timezone)"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + MAX_CRON_SEARCH
+        while candidate < limit:
+            if candidate.month not in self.months:
+                month_start = candidate.replace(day=1, hour=0, minute=0)
+                candidate = (month_start + timedelta(days=32)).replace(day=1)
+            elif not self.day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression never fires: '{self.expression}'")
+
+
+def get_timezone(name: Optional[str]) -> tzinfo:
+    """Resolve a timezone name, falling back to UTC"""
+    if not name or name.upper() == 'UTC' or ZoneInfo is None:
+        return timezone.utc
+    try:
+        return ZoneInfo(name)
+    except Exception as e:
+        logger.warning(f"Unknown timezone '{name}', using UTC: {e}")
+        return timezone.utc
+
+
+@dataclass
+class RunRecord:
+    scheduled_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    status: str = 'pending'  # success, failed, timeout, skipped, missed
+    error: Optional[str] = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+
+@dataclass
+class Job:
+    name: str
+    target: str
+    cron: Optional[CronExpression] = None
+    interval: Optional[float] = None
+    enabled: bool = True
+    max_runtime: Optional[float] = 3600
+    timeout: Optional[float] = 300  # how long a due run may wait for a worker
+    overlap: str = 'skip'
+    misfire: str = 'run_once'
+    misfire_grace: float = 60
+    tz: tzinfo = timezone.utc
+    run_at_start: bool = False  # run as soon as the scheduler starts
+    next_run: Optional[float] = None
+    running: int = 0
+    queued: bool = False
+    history: Deque[RunRecord] = field(default_factory=lambda: deque(maxlen=50))
+
+    @classmethod
+    def from_config(cls, entry: Dict, defaults: Optional[Dict] = None) -> 'Job':
+        """Build a job from a schedule.yaml entry and its ``defaults`` block"""
+        settings = dict(defaults or {})
+        settings.update(entry)
+        cron = settings.get('cron')
+        interval = settings.get('interval')
+        if not cron and not interval:
+            raise ValueError(
+                f"Schedule '{settings.get('name')}' needs a cron or interval"
+            )
+        overlap = settings.get('overlap', 'skip')
+        misfire = settings.get('misfire', 'run_once')
+        if overlap not in OVERLAP_POLICIES:
+            raise ValueError(f"Unknown overlap policy '{overlap}'")
+        if misfire not in MISFIRE_POLICIES:
+            raise ValueError(f"Unknown misfire policy '{misfire}'")
+        job = cls(
+            name=settings.get('name') or settings['target'],
+            target=settings['target'],
+            cron=CronExpression(str(cron)) if cron else None,
+            interval=float(interval) if interval and not cron else None,
+            enabled=settings.get('enabled', True),
+            max_runtime=settings.get('max_runtime', 3600),
+            timeout=settings.get('timeout', 300),
+            overlap=overlap,
+            misfire=misfire,
+            misfire_grace=settings.get('misfire_grace', 60),
+            tz=get_timezone(settings.get('timezone')),
+            # Interval jobs run right away by default, as the daemon always did
+            run_at_start=settings.get('run_at_start', not cron),
+        )
+        job.history = deque(maxlen=settings.get('history', 50))
+        return job
+
+    def timing(self) -> Tuple:
+        """The settings that decide when the job runs"""
+        return (self.cron.expression if self.cron else None, self.interval,
+                self.enabled, str(self.tz))
+
+    def configure(self, other: 'Job'):
+        """Take ``other``'s settings, keeping this job's run state and history"""
+        for name in JOB_SETTINGS:
+            setattr(self, name, getattr(other, name))
+
+    def first_run(self, timestamp: float) -> float:
+        """Timestamp of the job's first run once scheduled at ``timestamp``"""
+        return timestamp if self.run_at_start else self.next_after(timestamp)
+
+    def next_after(self, timestamp: float) -> float:
+        """Timestamp of the first run after ``timestamp``"""
+        if self.cron is None:
+            return timestamp + self.interval
+        moment = datetime.fromtimestamp(timestamp, self.tz)
+        return self.cron.next_after(moment).timestamp()
+
+    @property
+    def last_run(self) -> Optional[RunRecord]:
+        return self.history[-1] if self.history else None
+
+
+class FileWatcher:
+    """Notices when files change by polling their modification times.
+
+    A file that appears or disappears counts as changed too.
+    """
+
+    def __init__(self, paths: List[str]):
+        self.stamps: Dict[str, Optional[Tuple[int, int]]] = {}
+        self.watch(paths)
+
+    @staticmethod
+    def stamp(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def watch(self, paths: List[str]):
+        """Watch exactly ``paths``, keeping what is known about those already watched"""
+        self.stamps = {path: (self.stamps[path] if path in self.stamps
+                              else self.stamp(path))
+                       for path in paths}
+
+    def changed(self) -> List[str]:
+        """The watched files that changed since the last call"""
+        changed = []
+        for path, stamp in self.stamps.items():
+            current = self.stamp(path)
+            if current != stamp:
+                self.stamps[path] = current
+                changed.append(path)
+        return changed
+
+
+def load_schedule(path: str) -> Tuple[List[Dict], Dict]:
+    """Read the ``schedules`` list and ``defaults`` block of a schedule.yaml"""
+    if yaml is None:
+        logger.warning(f"PyYAML is not installed, ignoring {path}")
+        return [], {}
+    try:
+        with open(path, 'r') as f:
+            data = yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        return [], {}
+    return data.get('schedules') or [], data.get('defaults') or {}
+
+
+async def run_command(args: List[str], grace: float = 10.0):
+    """Run a subprocess, terminating it if the awaiting task is cancelled"""
+    process = await asyncio.create_subprocess_exec(*args)
+    try:
+        returncode = await process.wait()
+    except asyncio.CancelledError:
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), grace)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+        raise
+    if returncode != 0:
+        raise RuntimeError(f"exited with status {returncode}")
+
+
+class Scheduler:
+    """Runs jobs when they are due, at most ``max_workers`` at a time.
+
+    Due times sit in a heap, so the loop sleeps until the earliest one (or
+    until ``stop``). Each run is a task awaiting ``runner(job)``, cancelled
+    once it exceeds the job's ``max_runtime``. A run found more than
+    ``misfire_grace`` seconds late is either run once or skipped (``misfire``),
+    and a run that comes due while the previous one is still going is
+    skipped, queued behind it, or started anyway (``overlap``).
+    """
+
+    def __init__(self, jobs: List[Job], runner: Callable[[Job], Awaitable],
+                 max_workers: int = 2):
+        self.jobs: Dict[str, Job] = {job.name: job for job in jobs}
+        self.runner = runner
+        self.max_workers = max(1, max_workers)
+        self.heap: List[Tuple[float, int, str]] = []
+        self.counter = itertools.count()
+        self.tasks = set()
+        self.running = False
+        self.wakeup: Optional[asyncio.Event] = None
+        self.slots: Optional[asyncio.Semaphore] = None
+
+    def schedule(self, job: Job, at: float):
+        job.next_run = at
+        heapq.heappush(self.heap, (at, next(self.counter), job.name))
+
+    def update(self, jobs: List[Job]):
+        """Replace the job definitions, e.g. after schedule.yaml changed.
+
+        A job that keeps its name is updated in place, so a run in progress
+        carries on and still counts for ``overlap``; it is only rescheduled if
+        its timing changed. New jobs honour ``run_at_start``. Removed jobs are
+        not run again.
+        """
+        current = dict(self.jobs)
+        self.jobs.clear()
+        now = time.time()
+        for job in jobs:
+            old = current.pop(job.name, None)
+            retimed = old is None or old.timing() != job.timing()
+            if old is not None:
+                old.configure(job)
+                job = old
+            self.jobs[job.name] = job
+            if not self.running:
+                continue  # run() schedules every job when it starts
+            if not job.enabled:
+                job.next_run = None
+            elif retimed or job.next_run is None:
+                # A job added while running starts as it would have at startup
+                self.schedule(job, job.first_run(now) if old is None
+                              else job.next_after(now))
+                when = datetime.fromtimestamp(job.next_run, job.tz).isoformat()
+                logger.info(f"Scheduled {job.name} ({job.target}) for {when}")
+        for job in current.values():
+            job.next_run = None
+            logger.info(f"Removed job {job.name}")
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    def stop(self):
+        """Stop dispatching; runs in progress are allowed to finish"""
+        self.running = False
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    async def run(self):
+        """Dispatch jobs until ``stop`` is called"""
+        self.running = True
+        self.wakeup = asyncio.Event()
+        self.slots = asyncio.Semaphore(self.max_workers)
+        now = time.time()
+        for job in self.jobs.values():
+            if job.enabled:
+                self.schedule(job, job.first_run(now))
+                when = datetime.fromtimestamp(job.next_run, job.tz).isoformat()
+                logger.info(f"Scheduled {job.name} ({job.target}) for {when}")
+
+        while self.running:
+            if not self.heap:
+                # Nothing scheduled; wait for update() or stop()
+                await self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+            due, _, name = self.heap[0]
+            job = self.jobs.get(name)
+            if job is None or job.next_run != due:
+                heapq.heappop(self.heap)  # removed or rescheduled by update()
+                continue
+            delay = due - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                self.wakeup.clear()
+                continue
+            heapq.heappop(self.heap)
+            now = time.time()
+            self.dispatch(job, due, now)
+            # Runs missed while late collapse into the one just dispatched
+            self.schedule(job, job.next_after(max(due, now)))
+
+        if self.tasks:
+            logger.info(f"Waiting for {len(self.tasks)} running job(s)")
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def dispatch(self, job: Job, due: float, now: float):
+        """Start (or skip) the run of ``job`` that was due at ``due``"""
+        if now - due > job.misfire_grace and job.misfire == 'skip':
+            logger.warning(
+                f"Skipping missed run of {job.name} due {now - due:.0f}s ago"
+            )
+            job.history.append(RunRecord(due, status='missed'))
+            return
+        if job.running and job.overlap != 'allow':
+            if job.overlap == 'queue':
+                job.queued = True
+            else:
+                logger.warning(f"{job.name} is still running, skipping this run")
+                job.history.append(RunRecord(due, status='skipped'))
+            return
+        self.start(job, due)
+
+    def start(self, job: Job, due: float):
+        task = asyncio.create_task(self.execute(job, due))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def execute(self, job: Job, due: float):
+        """Run a job once under the worker limit and record the outcome"""
+        record = RunRecord(due)
+        job.running += 1
+        try:
+            try:
+                await asyncio.wait_for(self.slots.acquire(), job.timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"No free worker for {job.name} within {job.timeout}s")
+                record.status = 'missed'
+                return
+            try:
+                record.started_at = time.time()
+                logger.info(f"Starting job {job.name}")
+                await asyncio.wait_for(self.runner(job), job.max_runtime)
+                record.status = 'success'
+            except asyncio.TimeoutError:
+                logger.error(
+                    f"Job {job.name} exceeded max_runtime of {job.max_runtime}s"
+                )
+                record.status = 'timeout'
+            except Exception as e:
+                logger.error(f"Job {job.name} failed: {e}")
+                record.status = 'failed'
+                record.error = str(e)
+            finally:
+                record.finished_at = time.time()
+                self.slots.release()
+                logger.info(f"Job {job.name} finished: {record.status} "
+                            f"in {record.duration:.1f}s")
+        finally:
+            job.running -= 1
+            job.history.append(record)
+            if job.queued and self.running:
+                job.queued = False
+                self.start(job, time.time())
@@ -3,205 +3,400 @@ HEX Control Nexus - Web Scraper Module
 Handles static and dynamic web scraping tasks
 """
 
-import requests
-from bs4 import BeautifulSoup
 import time
 import random
 import logging
-import json
 import csv
-import sqlite3
-import os
-from urllib.parse import urljoin, urlparse
-from typing import Dict, List, Optional
-import re
+import threading
+from urllib.parse import urlparse
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from extraction import backend_for_document, compile_plan, get_backend
+from frontier import CrawlFrontier, FrontierEntry, Pagination
+from httpcache import FetchResult, ItemTracker, PageTracker, get_http_cache
+from metrics import BYTES, IN_FLIGHT, ITEMS, PAGES, stage_timer
+from ratelimit import BACKOFF_STATUSES, get_rate_limiter, host_of, parse_retry_after
+from records import JSON_ENCODER, rows
+from robots import RobotsRules, get_robots_cache, origin_of
+from storage import StreamingWriter, get_sqlite_writer
+from taskqueue import DomainSlots, DurableFrontier, get_task_queue
+from transport import get_session, run_async
 
 logger = logging.getLogger(__name__)
 
+# Requests in flight per domain across this process's scrapers, which
+# overlapping daemon jobs run side by side on threads
+_domain_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_domain_semaphores_lock = threading.Lock()
+
+
+def domain_semaphore(domain: str, limit: int) -> threading.BoundedSemaphore:
+    """The process-wide semaphore capping requests to ``domain`` at ``limit``"""
+    with _domain_semaphores_lock:
+        if domain not in _domain_semaphores:
+            _domain_semaphores[domain] = threading.BoundedSemaphore(max(1, limit))
+        return _domain_semaphores[domain]
+
+
 class Scraper:
-    def __init__(self, target_config: Dict, global_config: Dict):
+    def __init__(self, target_config: Dict, global_config: Dict,
+                 stop_event: Optional[threading.Event] = None,
+                 domain_slots: Optional[DomainSlots] = None):
         self.target = target_config
         self.config = global_config
-        self.session = requests.Session()
+        # Set on shutdown: the crawl finishes the pages in hand and stops
+        self.stop_event = stop_event or threading.Event()
+        # Shared with other worker processes to cap requests per domain
+        self.domain_slots = domain_slots
+        self.session = get_session(global_config)
+        self.headers: Dict[str, str] = {}
+        self.robots_cache = get_robots_cache(global_config)
+        self.rate_limiter = get_rate_limiter(global_config)
+        self.backend = get_backend(
+            target_config.get('parser', global_config.get('parser', 'bs4'))
+        )
+        self.http_cache = get_http_cache(global_config, target_config)
+        # With ``incremental``, only new and changed items reach storage
+        self.item_tracker: Optional[ItemTracker] = None
+        self.name = target_config.get('name', 'unnamed')
+        # Crawled pages are recorded in the HTTP cache once they are stored
+        self.page_tracker = (
+            PageTracker(self.http_cache, self.name) if self.http_cache else None
+        )
         self.setup_session()
         
     def setup_session(self):
-        """Setup session with user agents and headers"""
+        """Pick this scraper's user agent and headers.
+
+        The session is shared by every scraper, so headers go on each request.
+        """
         user_agents = self.config.get('user_agents', [
             'Mozilla/5.0 (compatible; HEX/1.0)'
         ])
-        self.session.headers.update({
-            'User-Agent': random.choice(user_agents)
-        })
+        self.headers['User-Agent'] = random.choice(user_agents)
         
     def check_robots_txt(self, url: str) -> bool:
         """Check robots.txt for allowed paths"""
-        try:
-            parsed_url = urlparse(url)
-            robots_url = f"{parsed_url.scheme}://{parsed_url.netloc}/robots.txt"
+        with stage_timer(self.name, 'robots'):
+            rules = self.robots_rules(url)
+        user_agent = self.headers['User-Agent']
+        self.rate_limiter.set_crawl_delay(host_of(url), rules.crawl_delay(user_agent))
+        if not rules.can_fetch(user_agent, url):
+            logger.warning(f"Path {urlparse(url).path} disallowed by robots.txt")
+            return False
+        return True
+
+    def robots_rules(self, url: str) -> RobotsRules:
+        """Return robots.txt rules for the URL's host, fetching on a cache miss"""
+        origin = origin_of(url)
+        rules = self.robots_cache.get(origin)
+        if rules is not None:
+            return rules
             
-            response = self.session.get(robots_url, timeout=10)
-            if response.status_code == 200:
-                # Simple check - in reality, you'd want a proper robots.txt parser
-                if 'Disallow: ' + parsed_url.path in response.text:
-                    logger.warning(f"Path {parsed_url.path} disallowed by robots.txt")
-                    return False
-            return True
+        try:
+            response = self.session.get(
+                f"{origin}/robots.txt", headers=self.headers, timeout=10
+            )
+            return self.robots_cache.store(origin, response.text, response.status_code)
         except Exception as e:
             logger.warning(f"Could not check robots.txt: {e}")
-            return True  # Default to allowed if we can't check
+            return self.robots_cache.store(origin, None, 0)  # Default to allowed
             
-    def scrape_page(self, url: str) -> Optional[BeautifulSoup]:
-        """Scrape a single page and return BeautifulSoup object"""
+    def scrape_page(self, url: str) -> Optional[Any]:
+        """Scrape a single page and return the parsed document"""
+        result = self.fetch_page(url)
+        content = result.content if result else None
+        return self.parse_page(content) if content is not None else None
+
+    def fetch_page(self, url: str) -> Optional[FetchResult]:
+        """Download a page, revalidating against the HTTP cache if enabled"""
         if not self.check_robots_txt(url):
             logger.error(f"Scraping disallowed by robots.txt: {url}")
             return None
             
-        try:
-            # Apply rate limiting
-            delay = self.config.get('rate_limit', {}).get('delay_seconds', 1.0)
-            if self.config.get('rate_limit', {}).get('jitter', False):
-                delay += random.uniform(0, 1)
-            time.sleep(delay)
-            
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
-            
-            return BeautifulSoup(response.content, 'html.parser')
-        except Exception as e:
-            logger.error(f"Failed to scrape {url}: {e}")
-            return None
+        host = host_of(url)
+        max_retries = self.config.get('rate_limit', {}).get('max_retries', 2)
+        per_domain = self.config.get('concurrency', {}).get('per_domain', 2)
+        cached = self.page_tracker.lookup(url) if self.page_tracker else None
+        headers = dict(self.headers)
+        if self.http_cache:
+            headers.update(self.http_cache.conditional_headers(cached))
+
+        for attempt in range(max_retries + 1):
+            # Wait for this host's next slot; other hosts are not held up
+            with stage_timer(self.name, 'rate_limit'):
+                self.rate_limiter.wait(host)
+                slot = None
+                if self.domain_slots:
+                    # Paced across workers too, not only within this process
+                    slot = self.domain_slots.acquire(
+                        host, self.rate_limiter.interval(host)
+                    )
             
-    def extract_data(self, soup: BeautifulSoup, selectors: Dict) -> List[Dict]:
-        """Extract data from soup using CSS selectors"""
-        items = []
-        item_selector = selectors.get('item', '')
-        field_selectors = selectors.get('fields', {})
-        
-        item_elements = soup.select(item_selector)
-        
-        for element in item_elements:
-            item_data = {}
-            for field_name, selector in field_selectors.items():
-                try:
-                    if selector.endswith('::text'):
-                        # Extract text
-                        selector = selector[:-7]  # Remove ::text
-                        field_element = element.select_one(selector)
-                        item_data[field_name] = field_element.get_text(strip=True) if field_element else ''
-                    elif '::attr(' in selector:
-                        # Extract attribute
-                        attr_match = re.search(r'::attr\((\w+)\)', selector)
-                        if attr_match:
-                            attr_name = attr_match.group(1)
-                            selector = selector[:attr_match.start()]
-                            field_element = element.select_one(selector)
-                            item_data[field_name] = field_element.get(attr_name, '') if field_element else ''
-                    else:
-                        # Default to text extraction
-                        field_element = element.select_one(selector)
-                        item_data[field_name] = field_element.get_text(strip=True) if field_element else ''
-                except Exception as e:
-                    logger.warning(f"Failed to extract field {field_name}: {e}")
-                    item_data[field_name] = ''
-                    
-            items.append(item_data)
+            started = time.monotonic()
+            try:
+                with domain_semaphore(host, per_domain):
+                    with stage_timer(self.name, 'fetch'), \
+                            IN_FLIGHT.track(target=self.name):
+                        response = self.session.get(url, headers=headers, timeout=30)
+                BYTES.inc(len(response.content), target=self.name)
+            except Exception as e:
+                self.rate_limiter.record_response(
+                    host, None, time.monotonic() - started
+                )
+                logger.error(f"Failed to scrape {url}: {e}")
+                return None
+            finally:
+                if slot is not None:
+                    self.domain_slots.release(slot)
+
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            self.rate_limiter.record_response(
+                host, response.status_code, time.monotonic() - started, retry_after
+            )
+            if response.status_code in BACKOFF_STATUSES and attempt < max_retries:
+                logger.warning(f"HTTP {response.status_code} for {url}, retrying")
+                continue
+
+            try:
+                if self.http_cache is None:
+                    response.raise_for_status()
+                    return FetchResult(response.content)
+                if response.status_code != 304:
+                    response.raise_for_status()
+                return self.http_cache.resolve(
+                    url, response.status_code, response.content, response.headers,
+                    cached
+                )
+            except Exception as e:
+                logger.error(f"Failed to scrape {url}: {e}")
+                return None
+        return None
             
-        return items
+    def parse_page(self, content: bytes) -> Any:
+        """Parse raw page content with the configured parser backend"""
+        with stage_timer(self.name, 'parse'):
+            return self.backend.parse(content)
+
+    def extract_data(self, soup: Any, selectors: Dict) -> List[Dict]:
+        """Extract data from a parsed page using CSS selectors"""
+        backend = backend_for_document(soup, self.backend)
+        with stage_timer(self.name, 'extract'):
+            return compile_plan(selectors, backend).extract(soup)
         
     def save_to_csv(self, data: List[Dict], filename: str):
         """Save data to CSV file"""
         if not data:
             return
             
-        keys = data[0].keys()
+        keys = list(data[0].keys())
         with open(filename, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=keys)
-            writer.writeheader()
-            writer.writerows(data)
+            writer = csv.writer(f)
+            writer.writerow(keys)
+            writer.writerows(rows(data, keys))
             
     def save_to_jsonl(self, data: List[Dict], filename: str):
         """Save data to JSONL file"""
         with open(filename, 'w', encoding='utf-8') as f:
             for item in data:
-                f.write(json.dumps(item) + '\n')
+                f.write(JSON_ENCODER.encode(item) + '\n')
                 
     def save_to_sqlite(self, data: List[Dict], db_path: str, table_name: str, unique_key: str = None):
         """Save data to SQLite database"""
-        if not data:
-            return
-            
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Create table if it doesn't exist
-        if data:
-            columns = list(data[0].keys())
-            column_defs = ', '.join([f"{col} TEXT" for col in columns])
-            cursor.execute(f"CREATE TABLE IF NOT EXISTS {table_name} ({column_defs})")
-            
-            # Insert data
-            for item in data:
-                # Check for duplicates if unique_key is specified
-                if unique_key and unique_key in item:
-                    cursor.execute(f"SELECT 1 FROM {table_name} WHERE {unique_key} = ?", 
-                                 (item[unique_key],))
-                    if cursor.fetchone():
-                        continue  # Skip duplicates
-                        
-                placeholders = ', '.join(['?' for _ in columns])
-                values = [item.get(col, '') for col in columns]
-                cursor.execute(f"INSERT INTO {table_name} VALUES ({placeholders})", values)
-                
-        conn.commit()
-        conn.close()
+        on_conflict = self.target.get('storage', {}).get('on_conflict', 'ignore')
+        get_sqlite_writer(db_path).write(table_name, data, unique_key, on_conflict)
         
-    def scrape(self) -> List[Dict]:
-        """Main scraping function"""
-        base_url = self.target['base_url']
-        start_paths = self.target['start_paths']
+    def save_data(self, data: List[Dict]):
+        """Append data to the target's configured storage"""
+        with StreamingWriter.for_target(self.target) as writer:
+            writer.add(data)
+
+    def new_pagination(self) -> Pagination:
+        return Pagination(
+            self.target.get('pagination'), self.target['base_url'], self.backend
+        )
+
+    def open_frontier(self, pagination: Pagination, seed: bool = True) -> CrawlFrontier:
+        """Return the target's seeded frontier.
+
+        With ``task_queue`` enabled the frontier lives on disk, and a crawl
+        that was interrupted resumes where it stopped instead of reseeding.
+        With ``seed`` off, only work already in the queue is taken (workers).
+        """
+        task_queue = get_task_queue(self.config, self.target)
+        if task_queue is None:
+            frontier = pagination.new_frontier()
+            pagination.seed(frontier, self.target['start_paths'])
+            return frontier
+
+        frontier = DurableFrontier(task_queue, self.target['name'],
+                                   pagination.max_pages, pagination.max_depth)
+        if seed:
+            frontier.start(lambda f: pagination.seed(f, self.target['start_paths']))
+        else:
+            frontier.join()
+        return frontier
+
+    def scrape(self, seed: bool = True) -> int:
+        """Crawl the target, streaming items into storage; returns the item count"""
+        frontier = self.open_frontier(self.new_pagination(), seed)
+        self.item_tracker = self.new_item_tracker()
+
+        def on_flush():
+            # Pages count as done, and items as seen, only once flushed
+            frontier.commit()
+            if self.page_tracker:
+                self.page_tracker.commit()
+            if self.item_tracker:
+                self.item_tracker.commit()
+
+        try:
+            with StreamingWriter.for_target(self.target) as writer:
+                writer.on_flush = on_flush
+                if self.target.get('engine') == 'async':
+                    # Imported lazily so the sync engine doesn't pay for aiohttp
+                    from crawler import AsyncCrawler
+                    run_async(AsyncCrawler(self).crawl(writer, frontier), self.config)
+                else:
+                    for data in self.iter_pages(frontier, on_idle=writer.flush):
+                        self.store(writer, data)
+            frontier.finish()
+        finally:
+            frontier.release()
+
+        if self.stop_event.is_set():
+            logger.info(f"Stopped {self.target['name']} early, "
+                        f"{len(frontier)} pages left for the next run")
+        logger.info(f"Scraped {writer.count} items from {self.target['name']}")
+        if self.item_tracker:
+            tracker = self.item_tracker
+            logger.info(f"{self.target['name']}: {tracker.new} new, "
+                        f"{tracker.changed} changed, "
+                        f"{tracker.unchanged} unchanged items")
+            self.notify_changes(tracker)
+        return writer.count
+
+    def store(self, writer: StreamingWriter, data: List[Dict]):
+        """Hand a page's items to the writer"""
+        with stage_timer(self.name, 'store'):
+            writer.add(data)
+        ITEMS.inc(len(data), target=self.name)
+
+    def settle_unfetched(self, frontier: CrawlFrontier, entry: FrontierEntry):
+        """Finish with a page ``fetch_page`` returned nothing for.
+
+        A page robots.txt disallows is done with; one whose fetch failed
+        (network error, 5xx, retries used up) is left to the frontier to
+        retry later.
+        """
+        rules = self.robots_cache.get(origin_of(entry.url))
+        user_agent = self.headers['User-Agent']
+        if rules is not None and not rules.can_fetch(user_agent, entry.url):
+            PAGES.inc(target=self.name, outcome='skipped')
+            frontier.complete(entry)
+            return
+        PAGES.inc(target=self.name, outcome='error')
+        frontier.fail(entry, "fetch failed")
+
+    def record_page(self, result: FetchResult, next_urls: List[str]):
+        """Have the HTTP cache record a page, with its next-page URLs"""
+        if self.page_tracker and result.entry is not None:
+            self.page_tracker.add(result.entry, next_urls)
+
+    def new_item_tracker(self) -> Optional[ItemTracker]:
+        if not self.target.get('incremental'):
+            return None
+        if self.http_cache is None:
+            logger.warning(f"{self.target['name']}: incremental needs http_cache "
+                           f"enabled, storing every item")
+            return None
+        unique_key = self.target.get('storage', {}).get('unique_key')
+        return ItemTracker(self.http_cache, self.target['name'], unique_key)
+
+    def changed_items(self, data: List[Dict], url: str) -> List[Dict]:
+        """Items worth storing: all of them, or only new and changed ones.
+
+        Only new and changed items are kept when the target is incremental.
+        """
+        if self.item_tracker is None or not data:
+            return data
+        return self.item_tracker.filter(url, data)
+
+    def notify_changes(self, tracker: ItemTracker):
+        """Send the target's ``notify`` channel a summary of new and changed items"""
+        settings = self.target.get('notify')
+        if not settings or not (tracker.new or tracker.changed):
+            return
+        from notifier import Notifier
+        notifier = Notifier(self.config)
+        try:
+            notifier.notify(
+                settings['channel'],
+                f"{self.target['name']}: {tracker.new} new and "
+                f"{tracker.changed} changed items",
+                settings.get('destination'),
+                subject=f"HEX: {self.target['name']} changed"
+            )
+        finally:
+            notifier.close()
+
+    def iter_pages(
+        self, frontier: Optional[CrawlFrontier] = None,
+        on_idle: Optional[Callable[[], None]] = None
+    ) -> Iterator[List[Dict]]:
+        """Crawl the target one page at a time, yielding each page's items.
+
+        ``on_idle`` is called while waiting for pages that are not ready yet.
+        """
+        pagination = self.new_pagination()
         selectors = self.target['selectors']
-        storage_config = self.target.get('storage', {})
+        if frontier is None:
+            frontier = self.open_frontier(pagination)
         
-        all_data = []
-        
-        for path in start_paths:
-            url = urljoin(base_url, path)
-            logger.info(f"Scraping: {url}")
-            
-            soup = self.scrape_page(url)
-            if not soup:
+        while not self.stop_event.is_set():
+            entry = frontier.pop()
+            if entry is None:
+                # Pages may still be waiting out a retry delay
+                delay = frontier.waiting()
+                if delay is None:
+                    break
+                if on_idle is not None:
+                    # Flushing commits our finished pages, which other
+                    # workers may be waiting on
+                    on_idle()
+                self.stop_event.wait(min(delay, 1.0))
                 continue
-                
-            data = self.extract_data(soup, selectors)
-            all_data.extend(data)
-            
-            # Handle pagination
-            pagination = self.target.get('pagination', {})
-            next_selector = pagination.get('next_selector')
-            next_url_template = pagination.get('next_url_template')
-            
-            if next_selector:
-                next_link = soup.select_one(next_selector)
-                if next_link and next_link.get('href'):
-                    next_url = urljoin(base_url, next_link['href'])
-                    # For demo, we'll just log the next URL
-                    logger.info(f"Next page: {next_url}")
-                    
-        # Save data
-        storage_type = storage_config.get('type', 'jsonl')
-        storage_path = storage_config.get('path', f"output_{self.target['name']}.jsonl")
-        unique_key = storage_config.get('unique_key')
-        
-        if storage_type == 'csv':
-            self.save_to_csv(all_data, storage_path)
-        elif storage_type == 'jsonl':
-            self.save_to_jsonl(all_data, storage_path)
-        elif storage_type == 'sqlite':
-            table_name = self.target.get('name', 'scraped_data')
-            self.save_to_sqlite(all_data, storage_path, table_name, unique_key)
+            logger.info(f"Scraping: {entry.url}")
             
-        logger.info(f"Scraped {len(all_data)} items from {self.target['name']}")
-        return all_data
\ No newline at end of file
+            try:
+                result = self.fetch_page(entry.url)
+                if result is None:
+                    self.settle_unfetched(frontier, entry)
+                    continue
+
+                PAGES.inc(target=self.name,
+                          outcome='unchanged' if result.unchanged else 'fetched')
+                if result.unchanged:
+                    # Nothing new since the last run: skip parsing and follow the
+                    # pagination links recorded then
+                    logger.info(f"Unchanged since last crawl: {entry.url}")
+                    next_urls = result.entry.next_urls
+                else:
+                    doc = self.parse_page(result.content)
+                    data = self.extract_data(doc, selectors)
+                    yield self.changed_items(data, entry.url)
+                    next_urls = list(pagination.next_urls(doc, entry, bool(data)))
+                # Resumed only after the items went to the writer, so the page
+                # is recorded with the flush that stores them
+                self.record_page(result, next_urls)
+
+                # Handle pagination
+                for next_url in next_urls:
+                    if frontier.add(next_url, entry.depth + 1, entry.chain):
+                        logger.info(f"Next page: {next_url}")
+            except Exception as e:
+                PAGES.inc(target=self.name, outcome='error')
+                if not frontier.fail(entry, str(e)):
+                    raise
+                continue
+            frontier.complete(entry)
@@ -0,0 +1,590 @@
+"""
+HEX Control Nexus - Storage Module
+Long-lived, batched writers and streaming sinks for scraped data
+"""
+
+import atexit
+import csv
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from records import JSON_ENCODER, Record, rows
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",  # ~20 MB page cache
+    "PRAGMA busy_timeout=5000",
+)
+
+
+def quote_identifier(name: str) -> str:
+    """Quote a table or column name for SQLite"""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def chunked(rows: List, size: int) -> Iterable[List]:
+    """Split a list into consecutive batches"""
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+class SQLiteWriter:
+    """Batched writer holding one connection to a SQLite database.
+
+    Tables get a UNIQUE index on their ``unique_key`` column so duplicates are
+    skipped (or updated) by ``INSERT ... ON CONFLICT`` instead of a lookup per
+    row, and rows are written with ``executemany`` in batched transactions.
+    A table that already holds duplicate keys is only indexed with ``dedupe``,
+    which keeps the first row of each key and deletes the rest.
+    """
+
+    def __init__(self, db_path: str, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        for pragma in SQLITE_PRAGMAS:
+            self.conn.execute(pragma)
+        self.lock = threading.Lock()
+        self.tables: Dict[str, List[str]] = {}
+
+    def table_columns(self, table_name: str) -> List[str]:
+        """Columns of an existing table (empty if it doesn't exist)"""
+        rows = self.conn.execute(f"PRAGMA table_info({quote_identifier(table_name)})")
+        return [row[1] for row in rows]
+
+    def ensure_table(self, table_name: str, columns: List[str],
+                     unique_key: Optional[str], dedupe: bool = False):
+        """Create or extend a table and its unique index.
+
+        Raises ValueError if the table has duplicate keys and ``dedupe`` is off.
+        """
+        table = quote_identifier(table_name)
+        column_defs = ', '.join(f"{quote_identifier(col)} TEXT" for col in columns)
+        with self.conn:
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({column_defs})")
+
+            existing = self.table_columns(table_name)
+            for col in columns:
+                if col not in existing:
+                    self.conn.execute(
+                        f"ALTER TABLE {table} ADD COLUMN {quote_identifier(col)} TEXT"
+                    )
+
+            if unique_key and unique_key in columns:
+                index_name = f"ux_{table_name}_{unique_key}"
+                has_index = self.conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?",
+                    (index_name,)
+                ).fetchone()
+                if not has_index:
+                    key = quote_identifier(unique_key)
+                    # Tables written before the index existed may hold
+                    # duplicates (NULL keys don't clash in a UNIQUE index)
+                    duplicates = self.conn.execute(
+                        f"SELECT COUNT({key}) - COUNT(DISTINCT {key}) FROM {table}"
+                    ).fetchone()[0]
+                    if duplicates and not dedupe:
+                        raise ValueError(
+                            f"{table_name} holds {duplicates} duplicate "
+                            f"{unique_key} values, so it can't get a unique "
+                            f"index; remove them or set storage.dedupe to keep "
+                            f"only the first row of each"
+                        )
+                    if duplicates:
+                        removed = self.conn.execute(
+                            f"DELETE FROM {table} WHERE {key} IS NOT NULL AND "
+                            f"rowid NOT IN (SELECT MIN(rowid) FROM {table} "
+                            f"GROUP BY {key})"
+                        ).rowcount
+                        logger.warning(
+                            f"Removed {removed} duplicate rows from {table_name}"
+                        )
+                    self.conn.execute(
+                        f"CREATE UNIQUE INDEX IF NOT EXISTS "
+                        f"{quote_identifier(index_name)} ON {table} ({key})"
+                    )
+
+        self.tables[table_name] = self.table_columns(table_name)
+
+    def insert_sql(self, table_name: str, columns: List[str], unique_key: Optional[str],
+                   on_conflict: str) -> str:
+        """Build the INSERT statement for a table"""
+        names = ', '.join(quote_identifier(col) for col in columns)
+        placeholders = ', '.join('?' for _ in columns)
+        sql = (f"INSERT INTO {quote_identifier(table_name)} ({names}) "
+               f"VALUES ({placeholders})")
+        if unique_key and unique_key in columns:
+            key = quote_identifier(unique_key)
+            updates = ', '.join(
+                f"{quote_identifier(col)} = excluded.{quote_identifier(col)}"
+                for col in columns if col != unique_key
+            )
+            if on_conflict == 'update' and updates:
+                sql += f" ON CONFLICT({key}) DO UPDATE SET {updates}"
+            else:
+                sql += f" ON CONFLICT({key}) DO NOTHING"
+        return sql
+
+    def write(self, table_name: str, data: List[Dict], unique_key: Optional[str] = None,
+              on_conflict: str = 'ignore', dedupe: bool = False) -> int:
+        """Write rows to a table; returns the number of rows inserted or updated.
+
+        The column set is taken from the first row; items are dicts or
+        records. ``on_conflict`` is ``ignore`` (keep the stored row) or
+        ``update`` (overwrite it). ``dedupe`` is passed to ``ensure_table``.
+        """
+        if not data:
+            return 0
+
+        columns = list(data[0].keys())
+        with self.lock:
+            known = self.tables.get(table_name)
+            if known is None or any(col not in known for col in columns):
+                self.ensure_table(table_name, columns, unique_key, dedupe)
+
+            sql = self.insert_sql(table_name, columns, unique_key, on_conflict)
+            before = self.conn.total_changes
+            for batch in chunked(data, self.batch_size):
+                with self.conn:
+                    self.conn.executemany(sql, rows(batch, columns))
+            return self.conn.total_changes - before
+
+    def close(self):
+        """Close the connection"""
+        with self.lock:
+            self.conn.close()
+
+
+class JSONLSink:
+    """Appends items to a JSON Lines file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def write(self, items: List[Dict]):
+        self.file.write(''.join(JSON_ENCODER.encode(item) + '\n' for item in items))
+
+    def flush(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+class CSVSink:
+    """Appends items to a CSV file, writing the header only for a new file.
+
+    Columns come from an existing file's header, or else from the first item.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = None
+        self.writer = None
+        self.fieldnames: List[str] = []
+
+    def open(self, first_item: Dict):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        fieldnames = None
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, 'r', newline='', encoding='utf-8') as f:
+                fieldnames = next(csv.reader(f), None)
+
+        self.file = open(self.path, 'a', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.fieldnames = fieldnames or list(first_item.keys())
+        if not fieldnames:
+            self.writer.writerow(self.fieldnames)
+
+    def write(self, items: List[Dict]):
+        if not items:
+            return
+        if self.writer is None:
+            self.open(items[0])
+        # Fields missing from the header are dropped; missing columns left empty
+        self.writer.writerows(rows(items, self.fieldnames))
+
+    def flush(self):
+        if self.file:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        if self.file and not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+class SQLiteSink:
+    """Writes items to a table through the shared SQLiteWriter"""
+
+    def __init__(self, db_path: str, table_name: str, unique_key: Optional[str] = None,
+                 on_conflict: str = 'ignore', dedupe: bool = False):
+        self.writer = get_sqlite_writer(db_path)
+        self.table_name = table_name
+        self.unique_key = unique_key
+        self.on_conflict = on_conflict
+        self.dedupe = dedupe
+
+    def write(self, items: List[Dict]):
+        self.writer.write(
+            self.table_name, items, self.unique_key, self.on_conflict, self.dedupe
+        )
+
+    def flush(self):
+        pass  # every write is its own committed transaction
+
+    def close(self):
+        pass  # the connection is shared and stays open
+
+
+@lru_cache(maxsize=None)
+def pyarrow_modules() -> Tuple[Any, Any]:
+    """pyarrow and pyarrow.parquet, imported on first use (None if not installed)"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:  # pyarrow is only needed for Parquet output
+        return None, None
+    return pyarrow, pyarrow.parquet
+
+
+def __getattr__(name: str) -> Any:
+    # storage.pa and storage.pq resolve lazily, so only Parquet users load pyarrow
+    if name in ('pa', 'pq'):
+        return pyarrow_modules()[name == 'pq']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class ParquetSink:
+    """Writes items as compressed Parquet files partitioned by target and date.
+
+    Files land in ``<root>/target=<name>/date=<YYYY-MM-DD>/``; every write is
+    one row group. The column types are inferred from the first batch and
+    later batches are cast to them (missing fields become nulls). A new file
+    is started when the UTC date changes.
+    """
+
+    def __init__(self, root: str, target_name: str, compression: str = 'zstd'):
+        self.pa, self.pq = pyarrow_modules()
+        if self.pq is None:
+            raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)")
+        self.root = root
+        self.target_name = target_name
+        self.compression = compression
+        self.schema = None
+        self.writer = None
+        self.date: Optional[str] = None
+        self.paths: List[str] = []
+
+    def open(self, date: str):
+        directory = os.path.join(
+            self.root, f"target={self.target_name}", f"date={date}"
+        )
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(
+            directory, f"part-{int(time.time() * 1000)}-{os.getpid()}.parquet"
+        )
+        self.writer = self.pq.ParquetWriter(
+            path, self.schema, compression=self.compression
+        )
+        self.date = date
+        self.paths.append(path)
+
+    def write(self, items: List[Dict]):
+        if not items:
+            return
+        if self.schema is None:
+            self.schema = self.pa.Table.from_pylist(items).schema
+        if isinstance(items[0], Record):
+            columns = zip(*rows(items, self.schema.names, missing=None))
+            table = self.pa.Table.from_arrays(
+                [list(column) for column in columns], schema=self.schema
+            )
+        else:
+            table = self.pa.Table.from_pylist(items, schema=self.schema)
+
+        date = time.strftime('%Y-%m-%d', time.gmtime())
+        if self.writer is not None and date != self.date:
+            self.writer.close()
+            self.writer = None
+        if self.writer is None:
+            self.open(date)
+        self.writer.write_table(table, row_group_size=len(items))
+
+    def flush(self):
+        pass  # row groups are written as they arrive; the footer is written on close
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+def open_sink(target: Dict, storage_type: Optional[str] = None,
+              storage_path: Optional[str] = None) -> Any:
+    """Create the sink described by a target's ``storage`` config.
+
+    ``storage_type`` and ``storage_path`` override the configured values.
+    """
+    storage_config = target.get('storage', {})
+    storage_type = storage_type or storage_config.get('type', 'jsonl')
+    storage_path = storage_path or storage_config.get(
+        'path', f"output_{target['name']}.jsonl"
+    )
+
+    if storage_type == 'csv':
+        return CSVSink(storage_path)
+    if storage_type == 'parquet':
+        return ParquetSink(
+            storage_path, target['name'], storage_config.get('compression', 'zstd')
+        )
+    if storage_type == 'sqlite':
+        return SQLiteSink(
+            storage_path, target.get('name', 'scraped_data'),
+            storage_config.get('unique_key'),
+            storage_config.get('on_conflict', 'ignore'),
+            storage_config.get('dedupe', False)
+        )
+    if storage_type != 'jsonl':
+        logger.warning(f"Unknown storage type '{storage_type}', writing JSONL")
+    return JSONLSink(storage_path)
+
+
+class StreamingWriter:
+    """Buffers items and flushes them to a sink in batches.
+
+    A batch is flushed (and fsynced) once ``batch_size`` items are buffered or
+    ``flush_interval`` seconds have passed, so memory stays bounded and a crash
+    loses at most the current batch.
+    """
+
+    def __init__(self, sink: Any, batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = 5.0):
+        self.sink = sink
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.buffer: List[Dict] = []
+        self.last_flush = time.monotonic()
+        self.count = 0
+        # Called after each flush, once everything added so far is durable
+        self.on_flush: Optional[Callable[[], None]] = None
+
+    @classmethod
+    def for_target(cls, target: Dict) -> 'StreamingWriter':
+        """Open the target's sink with its batching settings"""
+        storage_config = target.get('storage', {})
+        return cls(
+            open_sink(target),
+            batch_size=storage_config.get('batch_size', DEFAULT_BATCH_SIZE),
+            flush_interval=storage_config.get('flush_interval', 5.0),
+        )
+
+    def add(self, items: Iterable[Dict]):
+        """Buffer items, flushing when the batch is full or due"""
+        self.buffer.extend(items)
+        if (len(self.buffer) >= self.batch_size
+                or time.monotonic() - self.last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Write buffered items and make them durable"""
+        if self.buffer:
+            self.sink.write(self.buffer)
+            self.sink.flush()
+            self.count += len(self.buffer)
+            self.buffer = []
+        self.last_flush = time.monotonic()
+        if self.on_flush is not None:
+            self.on_flush()
+
+    def close(self):
+        """Flush remaining items and close the sink"""
+        try:
+            self.flush()
+        finally:
+            self.sink.close()
+
+    def __enter__(self) -> 'StreamingWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def iter_stored_items(target: Dict,
+                      batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[List[Dict]]:
+    """Read back a target's stored output in batches"""
+    storage_config = target.get('storage', {})
+    storage_type = storage_config.get('type', 'jsonl')
+    storage_path = storage_config.get('path', f"output_{target['name']}.jsonl")
+    if not os.path.exists(storage_path):
+        logger.warning(f"No stored output for {target['name']} at {storage_path}")
+        return
+
+    if storage_type == 'parquet':
+        yield from iter_parquet_items(storage_path, target['name'], batch_size)
+        return
+
+    if storage_type == 'sqlite':
+        conn = sqlite3.connect(storage_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            cursor = conn.execute(f"SELECT * FROM {quote_identifier(target['name'])}")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [dict(row) for row in rows]
+        finally:
+            conn.close()
+        return
+
+    with open(storage_path, 'r', newline='', encoding='utf-8') as f:
+        records = csv.DictReader(f) if storage_type == 'csv' else (
+            json.loads(line) for line in f if line.strip()
+        )
+        batch: List[Dict] = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def iter_parquet_items(root: str, target_name: str,
+                       batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[List[Dict]]:
+    """Read back a target's Parquet files (every date partition) in batches.
+
+    Files written by different runs may have different columns; they are
+    read with their schemas merged, missing fields coming back as None.
+    """
+    pa, pq = pyarrow_modules()
+    if pq is None:
+        raise RuntimeError(
+            "Reading Parquet output requires pyarrow (pip install pyarrow)"
+        )
+    import pyarrow.dataset as ds
+
+    directory = os.path.join(root, f"target={target_name}")
+    if not os.path.isdir(directory):
+        logger.warning(f"No stored Parquet output for {target_name} under {root}")
+        return
+    dataset = ds.dataset(directory, format='parquet')
+    schemas = [fragment.physical_schema for fragment in dataset.get_fragments()]
+    if not schemas:
+        return
+    dataset = ds.dataset(directory, schema=pa.unify_schemas(schemas), format='parquet')
+    for batch in dataset.to_batches(batch_size=batch_size):
+        if batch.num_rows:
+            yield batch.to_pylist()
+
+
+EXPORT_DEFAULT_PATHS = {
+    'parquet': 'database/parquet',
+    'csv': 'database/exports/{name}.csv',
+    'jsonl': 'database/exports/{name}.jsonl',
+    'sqlite': 'database/exports/hex_export.db',
+}
+
+
+def export_target(target: Dict, export_format: str, export_path: Optional[str] = None,
+                  batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Convert a target's stored output to another format in bulk.
+
+    Returns the number of items exported. A CSV or JSONL export replaces the
+    previous one once it is complete; SQLite and Parquet exports add to the
+    destination. Exporting onto the target's own storage is refused.
+    """
+    if export_format not in EXPORT_DEFAULT_PATHS:
+        raise ValueError(f"Unsupported export format: {export_format}")
+    path = (export_path or EXPORT_DEFAULT_PATHS[export_format]).format(
+        name=target['name']
+    )
+    source = target.get('storage', {}).get(
+        'path', f"output_{target['name']}.jsonl"
+    )
+    if os.path.realpath(path) == os.path.realpath(source):
+        raise ValueError(
+            f"Export path {path} is {target['name']}'s own storage"
+        )
+
+    write_path = path
+    if export_format in ('csv', 'jsonl'):
+        # Written beside the destination and moved over it when complete, so
+        # a failed export leaves the previous one in place
+        write_path = f"{path}.{os.getpid()}.tmp"
+        if os.path.exists(write_path):
+            os.remove(write_path)
+    try:
+        with StreamingWriter(open_sink(target, export_format, write_path),
+                             batch_size) as writer:
+            for batch in iter_stored_items(target, batch_size):
+                writer.add(batch)
+        if write_path != path:
+            if os.path.exists(write_path):
+                os.replace(write_path, path)
+            elif os.path.exists(path):
+                os.remove(path)  # nothing stored: no stale export either
+    finally:
+        if write_path != path and os.path.exists(write_path):
+            os.remove(write_path)
+    logger.info(f"Exported {writer.count} items from {target['name']} "
+                f"to {export_format} at {path}")
+    return writer.count
+
+
+_writers: Dict[str, SQLiteWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_sqlite_writer(db_path: str) -> SQLiteWriter:
+    """Return the process-wide writer for a database file"""
+    key = os.path.abspath(db_path)
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is not None and not os.path.exists(key):
+            # The file was removed underneath us; reconnect to a fresh one
+            writer.close()
+            writer = None
+        if writer is None:
+            writer = SQLiteWriter(db_path)
+            _writers[key] = writer
+        return writer
+
+
+@atexit.register
+def close_sqlite_writers():
+    """Close every cached SQLite connection"""
+    with _writers_lock:
+        for writer in _writers.values():
+            writer.close()
+        _writers.clear()
@@ -0,0 +1,586 @@
+"""
+HEX Control Nexus - Task Queue Module
+Durable SQLite-backed queue of crawl work with leases and retries
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set
+
+from frontier import CrawlFrontier, FrontierEntry, normalize_url
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_DELAY = 30
+
+
+def worker_id() -> str:
+    """Identifies this process as a lease owner"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@dataclass
+class Task:
+    id: int
+    queue: str
+    key: str
+    payload: Dict[str, Any]
+    attempts: int
+
+
+class TaskQueue:
+    """Tasks and checkpoints in a SQLite file, safe to share between processes.
+
+    A task is ``pending`` until a worker leases it, which hides it from other
+    workers for ``lease_seconds``; a worker still busy with it extends the
+    lease. The worker then completes it or fails it; failed tasks go back to
+    pending after a delay until ``max_attempts`` is reached. A lease that runs
+    out (its worker died) makes the task available again. Keys are unique per
+    queue, so re-adding known work is a no-op.
+    """
+
+    def __init__(self, path: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 retry_delay: float = DEFAULT_RETRY_DELAY,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease_seconds = lease_seconds  # default for frontiers on this queue
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # Autocommit mode: write transactions are opened explicitly with
+        # BEGIN IMMEDIATE so concurrent workers serialize on the write lock
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=30000")
+        self.lock = threading.Lock()
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                queue TEXT NOT NULL,
+                key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires REAL,
+                error TEXT,
+                updated_at REAL NOT NULL,
+                UNIQUE (queue, key)
+            );
+            CREATE INDEX IF NOT EXISTS tasks_ready
+                ON tasks (queue, state, available_at, id);
+            CREATE TABLE IF NOT EXISTS domain_slots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                domain TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                expires REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS domain_slots_domain ON domain_slots (domain);
+            CREATE TABLE IF NOT EXISTS domain_pacing (
+                domain TEXT PRIMARY KEY,
+                next_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                queue TEXT NOT NULL,
+                name TEXT NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (queue, name)
+            );
+        """)
+
+    def transaction(self):
+        return _Transaction(self)
+
+    def put(self, queue: str, key: str, payload: Dict[str, Any],
+            max_tasks: Optional[int] = None) -> Optional[int]:
+        """Add a task; returns its id, or None if the key is already queued
+        or the queue already holds ``max_tasks`` tasks"""
+        with self.transaction() as conn:
+            if max_tasks is not None:
+                total = conn.execute(
+                    "SELECT COUNT(*) FROM tasks WHERE queue = ?", (queue,)
+                ).fetchone()[0]
+                if total >= max_tasks:
+                    return None
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO tasks (queue, key, payload, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (queue, key, json.dumps(payload), time.time())
+            )
+            return cursor.lastrowid if cursor.rowcount else None
+
+    def lease(self, queue: str, owner: str, limit: int = 1,
+              lease_seconds: float = DEFAULT_LEASE_SECONDS) -> List[Task]:
+        """Claim up to ``limit`` ready tasks, oldest first"""
+        now = time.time()
+        with self.transaction() as conn:
+            rows = conn.execute(
+                "SELECT id, queue, key, payload, attempts FROM tasks "
+                "WHERE queue = ? AND ((state = 'pending' AND available_at <= ?) "
+                "OR (state = 'leased' AND lease_expires <= ?)) "
+                "ORDER BY id LIMIT ?",
+                (queue, now, now, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE tasks SET state = 'leased', lease_owner = ?, "
+                "lease_expires = ?, updated_at = ? WHERE id = ?",
+                [(owner, now + lease_seconds, now, row[0]) for row in rows]
+            )
+        return [Task(row[0], row[1], row[2], json.loads(row[3]), row[4])
+                for row in rows]
+
+    def extend_lease(self, task_ids: List[int], owner: str,
+                     lease_seconds: float = DEFAULT_LEASE_SECONDS) -> List[int]:
+        """Push back the expiry of tasks ``owner`` still holds; returns the ids
+        whose lease it had already lost"""
+        if not task_ids:
+            return []
+        now = time.time()
+        lost = []
+        with self.transaction() as conn:
+            for task_id in task_ids:
+                cursor = conn.execute(
+                    "UPDATE tasks SET lease_expires = ?, updated_at = ? "
+                    "WHERE id = ? AND state = 'leased' AND lease_owner = ?",
+                    (now + lease_seconds, now, task_id, owner)
+                )
+                if not cursor.rowcount:
+                    lost.append(task_id)
+        return lost
+
+    def complete(self, task_ids: List[int]):
+        """Mark tasks done"""
+        if not task_ids:
+            return
+        with self.transaction() as conn:
+            conn.executemany(
+                "UPDATE tasks SET state = 'done', lease_owner = NULL, updated_at = ? "
+                "WHERE id = ?",
+                [(time.time(), task_id) for task_id in task_ids]
+            )
+
+    def fail(self, task_id: int, error: str):
+        """Record a failed attempt; the task is retried later or given up on"""
+        now = time.time()
+        with self.transaction() as conn:
+            row = conn.execute(
+                "SELECT attempts FROM tasks WHERE id = ?", (task_id,)
+            ).fetchone()
+            if row is None:
+                return
+            attempts = row[0] + 1
+            state = 'failed' if attempts >= self.max_attempts else 'pending'
+            conn.execute(
+                "UPDATE tasks SET state = ?, attempts = ?, available_at = ?, "
+                "error = ?, lease_owner = NULL, updated_at = ? WHERE id = ?",
+                (state, attempts, now + self.retry_delay * attempts, error, now,
+                 task_id)
+            )
+        if state == 'failed':
+            logger.error(f"Task {task_id} failed {attempts} times, giving up: {error}")
+
+    def release(self, owner: str, queue: Optional[str] = None):
+        """Hand an owner's leased tasks back without counting an attempt"""
+        sql = ("UPDATE tasks SET state = 'pending', lease_owner = NULL "
+               "WHERE state = 'leased' AND lease_owner = ?")
+        params: List[Any] = [owner]
+        if queue is not None:
+            sql += " AND queue = ?"
+            params.append(queue)
+        with self.transaction() as conn:
+            conn.execute(sql, params)
+
+    def counts(self, queue: str) -> Dict[str, int]:
+        """Number of tasks in each state"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT state, COUNT(*) FROM tasks WHERE queue = ? GROUP BY state",
+                (queue,)
+            ).fetchall()
+        return dict(rows)
+
+    def next_available(self, queue: str,
+                       owner: Optional[str] = None) -> Optional[float]:
+        """Seconds until the next unfinished task becomes available.
+
+        Returns None if no unfinished tasks remain.
+
+        Tasks leased by ``owner`` are left out: it knows what it is holding.
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT MIN(CASE state WHEN 'pending' THEN available_at "
+                "ELSE lease_expires END) "
+                "FROM tasks WHERE queue = ? AND (state = 'pending' "
+                "OR (state = 'leased' AND lease_owner IS NOT ?))", (queue, owner)
+            ).fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def acquire_slot(self, domain: str, owner: str, limit: int,
+                     ttl: float) -> Optional[int]:
+        """Take one of ``limit`` slots for a domain.
+
+        Returns the slot's id, or None if all are held.
+
+        Slots of crashed workers lapse after ``ttl`` seconds.
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            conn.execute(
+                "DELETE FROM domain_slots WHERE domain = ? AND expires <= ?",
+                (domain, now)
+            )
+            held = conn.execute(
+                "SELECT COUNT(*) FROM domain_slots WHERE domain = ?", (domain,)
+            ).fetchone()[0]
+            if held >= limit:
+                return None
+            return conn.execute(
+                "INSERT INTO domain_slots (domain, owner, expires) VALUES (?, ?, ?)",
+                (domain, owner, now + ttl)
+            ).lastrowid
+
+    def release_slot(self, slot_id: int):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM domain_slots WHERE id = ?", (slot_id,))
+
+    def reserve_turn(self, domain: str, interval: float) -> float:
+        """Claim a domain's next request time; returns seconds to wait for it.
+
+        Turns are ``interval`` seconds apart across every worker sharing the
+        queue, so the configured delay holds for all of them together.
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            row = conn.execute(
+                "SELECT next_at FROM domain_pacing WHERE domain = ?", (domain,)
+            ).fetchone()
+            turn = max(now, row[0]) if row else now
+            conn.execute(
+                "INSERT OR REPLACE INTO domain_pacing VALUES (?, ?)",
+                (domain, turn + interval)
+            )
+        return turn - now
+
+    def lease_owners(self, queue: str) -> List[str]:
+        """Owners currently holding leases in a queue"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT lease_owner FROM tasks "
+                "WHERE queue = ? AND state = 'leased'", (queue,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def clear(self, queue: str):
+        """Delete a queue's tasks and checkpoints"""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM tasks WHERE queue = ?", (queue,))
+            conn.execute("DELETE FROM checkpoints WHERE queue = ?", (queue,))
+
+    def set_checkpoint(self, queue: str, name: str, value: Any):
+        with self.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?)",
+                         (queue, name, json.dumps(value)))
+
+    def get_checkpoint(self, queue: str, name: str, default: Any = None) -> Any:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value FROM checkpoints WHERE queue = ? AND name = ?",
+                (queue, name)
+            ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT under the queue's thread lock"""
+
+    def __init__(self, queue: TaskQueue):
+        self.queue = queue
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.queue.lock.acquire()
+        try:
+            self.queue.conn.execute("BEGIN IMMEDIATE")
+        except Exception:
+            self.queue.lock.release()
+            raise
+        return self.queue.conn
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            self.queue.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.queue.lock.release()
+
+
+class DurableFrontier(CrawlFrontier):
+    """A CrawlFrontier whose pages are tasks in a TaskQueue.
+
+    ``pop`` leases the next page. A page counts as done only after
+    ``complete`` and the next ``commit`` (called once its items have been
+    flushed to storage), so a crash loses no work; it may repeat a page.
+    When a crawl is interrupted, the next run picks up its unfinished pages.
+    While pages are held, a heartbeat thread renews their leases every third
+    of ``lease_seconds``, so slow pages aren't handed to another worker.
+    """
+
+    def __init__(self, task_queue: TaskQueue, name: str,
+                 max_pages: Optional[int] = None,
+                 max_depth: Optional[int] = None, owner: Optional[str] = None,
+                 lease_seconds: Optional[float] = None):
+        super().__init__(max_pages, max_depth)
+        self.task_queue = task_queue
+        self.name = name
+        self.owner = owner or worker_id()
+        self.lease_seconds = lease_seconds or task_queue.lease_seconds
+        self.completed: List[int] = []
+        self.completed_lock = threading.Lock()
+        self.held: Set[int] = set()  # leased, not yet committed or failed
+        self.heartbeat: Optional[threading.Thread] = None
+        self.heartbeat_stop = threading.Event()
+
+    def resumable(self) -> bool:
+        """Whether an interrupted crawl left unfinished pages"""
+        counts = self.task_queue.counts(self.name)
+        return bool(counts.get('pending') or counts.get('leased'))
+
+    def start(self, seed) -> bool:
+        """Resume an interrupted crawl, or clear the queue and call ``seed``.
+
+        Returns True when resuming.
+        """
+        if self.resumable():
+            self.join()
+            return True
+        self.task_queue.clear(self.name)
+        self.task_queue.set_checkpoint(self.name, 'started_at', time.time())
+        seed(self)
+        return False
+
+    def join(self):
+        """Work on the crawl already in the queue.
+
+        It was started by another run or by a coordinator.
+        """
+        self.reclaim()
+        counts = self.task_queue.counts(self.name)
+        self.scheduled = sum(counts.values())
+        left = counts.get('pending', 0) + counts.get('leased', 0)
+        logger.info(f"Resuming {self.name}: {left} pages left, "
+                    f"{counts.get('done', 0)} done")
+
+    def add(self, url: str, depth: int = 0, chain: int = 0) -> Optional[FrontierEntry]:
+        if self.max_depth is not None and depth > self.max_depth:
+            logger.debug(f"Skipping {url}: depth {depth} exceeds max_depth")
+            return None
+        # The page limit is checked against the queue, which other workers
+        # may be adding to
+        task_id = self.task_queue.put(
+            self.name, normalize_url(url), {'url': url, 'depth': depth, 'chain': chain},
+            max_tasks=self.max_pages
+        )
+        if task_id is None:
+            return None
+        self.scheduled += 1
+        return FrontierEntry(url, depth, chain, task_id)
+
+    def pop(self) -> Optional[FrontierEntry]:
+        tasks = self.task_queue.lease(self.name, self.owner, 1, self.lease_seconds)
+        if not tasks:
+            return None
+        with self.completed_lock:
+            self.held.add(tasks[0].id)
+            if self.heartbeat is None:
+                self.heartbeat_stop.clear()
+                self.heartbeat = threading.Thread(
+                    target=self.renew_leases, name=f"lease-{self.name}",
+                    daemon=True
+                )
+                self.heartbeat.start()
+        payload = tasks[0].payload
+        return FrontierEntry(payload['url'], payload['depth'], payload['chain'],
+                             tasks[0].id)
+
+    def renew_leases(self):
+        """Heartbeat: extend the leases of held pages until ``release``"""
+        while not self.heartbeat_stop.wait(self.lease_seconds / 3):
+            with self.completed_lock:
+                held = list(self.held)
+            try:
+                lost = self.task_queue.extend_lease(
+                    held, self.owner, self.lease_seconds
+                )
+            except sqlite3.Error as e:
+                logger.warning(f"Could not renew leases for {self.name}: {e}")
+                continue
+            if lost:
+                logger.warning(f"{self.name}: lease lost on {len(lost)} pages, "
+                               f"another worker may repeat them")
+
+    def complete(self, entry: FrontierEntry):
+        """Mark a page processed; it is recorded as done on the next commit"""
+        with self.completed_lock:
+            self.completed.append(entry.seq)
+
+    def fail(self, entry: FrontierEntry, error: str) -> bool:
+        logger.error(f"Failed to process {entry.url}: {error}")
+        with self.completed_lock:
+            self.held.discard(entry.seq)
+        self.task_queue.fail(entry.seq, error)
+        return True
+
+    def commit(self):
+        """Record completed pages as done (their items are now in storage)"""
+        with self.completed_lock:
+            completed, self.completed = self.completed, []
+            self.held.difference_update(completed)
+        self.task_queue.complete(completed)
+
+    def waiting(self) -> Optional[float]:
+        """Seconds until another page may be ready, or None once the crawl is done"""
+        return self.task_queue.next_available(self.name, self.owner)
+
+    def release(self):
+        """Stop the heartbeat and return leased pages to the queue (on shutdown)"""
+        with self.completed_lock:
+            heartbeat, self.heartbeat = self.heartbeat, None
+            self.held.clear()
+        if heartbeat is not None:
+            self.heartbeat_stop.set()
+            heartbeat.join()
+        self.task_queue.release(self.owner, self.name)
+
+    def reclaim(self):
+        """Release pages leased by dead processes on this host.
+
+        Their leases would otherwise only lapse after ``lease_seconds``.
+        """
+        hostname = socket.gethostname()
+        for owner in self.task_queue.lease_owners(self.name):
+            host, _, pid = owner.rpartition(':')
+            if host == hostname and pid.isdigit() and not pid_alive(int(pid)):
+                logger.info(f"Reclaiming pages leased by {owner}")
+                self.task_queue.release(owner, self.name)
+
+    def finish(self):
+        """Clear the queue once every page is done, so the next run starts fresh"""
+        if self.waiting() is None:
+            failed = self.task_queue.counts(self.name).get('failed', 0)
+            if failed:
+                logger.warning(f"{self.name}: {failed} pages failed")
+            self.task_queue.clear(self.name)
+
+    def __len__(self) -> int:
+        counts = self.task_queue.counts(self.name)
+        return counts.get('pending', 0) + counts.get('leased', 0)
+
+
+class DomainSlots:
+    """Per-domain request slots shared by every worker using a TaskQueue.
+
+    Each worker holds a slot for the duration of a request, so no more than
+    ``limit`` requests hit one domain at a time across all of them. A slot
+    is also only handed over at the domain's next turn, spaced by the
+    caller's request interval, so the delay between requests (including a
+    robots.txt Crawl-delay) holds across workers too.
+    """
+
+    def __init__(self, task_queue: TaskQueue, limit: int, owner: Optional[str] = None,
+                 ttl: float = 120.0, poll_interval: float = 0.05):
+        self.task_queue = task_queue
+        self.limit = max(1, limit)
+        self.owner = owner or worker_id()
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+
+    def acquire(self, domain: str, interval: float = 0.0) -> int:
+        """Block until a slot for ``domain`` is free and its turn has come"""
+        while True:
+            slot = self.task_queue.acquire_slot(
+                domain, self.owner, self.limit, self.ttl
+            )
+            if slot is not None:
+                break
+            time.sleep(self.poll_interval)
+        delay = self.task_queue.reserve_turn(domain, interval)
+        if delay > 0:
+            time.sleep(delay)
+        return slot
+
+    async def acquire_async(self, domain: str, interval: float = 0.0) -> int:
+        loop = asyncio.get_running_loop()
+        while True:
+            slot = await loop.run_in_executor(
+                None, self.task_queue.acquire_slot, domain, self.owner, self.limit,
+                self.ttl
+            )
+            if slot is not None:
+                break
+            await asyncio.sleep(self.poll_interval)
+        delay = await loop.run_in_executor(
+            None, self.task_queue.reserve_turn, domain, interval
+        )
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return slot
+
+    def release(self, slot: int):
+        self.task_queue.release_slot(slot)
+
+    async def release_async(self, slot: int):
+        await asyncio.get_running_loop().run_in_executor(None, self.release, slot)
+
+
+_task_queues: Dict[str, TaskQueue] = {}
+_task_queues_lock = threading.Lock()
+
+
+def get_task_queue(config: Dict, target: Optional[Dict] = None) -> Optional[TaskQueue]:
+    """Return the shared queue configured by ``task_queue``, or None if disabled.
+
+    A target can turn the queue off with ``"task_queue": false`` or point at
+    its own settings block.
+    """
+    settings = config.get('task_queue') or {}
+    if target is not None and 'task_queue' in target:
+        settings = target['task_queue'] or {}
+    if not settings.get('enabled', False):
+        return None
+    path = os.path.abspath(settings.get('path', 'database/task_queue.db'))
+    with _task_queues_lock:
+        if path not in _task_queues:
+            _task_queues[path] = TaskQueue(
+                path, settings.get('max_attempts', DEFAULT_MAX_ATTEMPTS),
+                settings.get('retry_delay', DEFAULT_RETRY_DELAY),
+                settings.get('lease_seconds', DEFAULT_LEASE_SECONDS)
+            )
+        return _task_queues[path]
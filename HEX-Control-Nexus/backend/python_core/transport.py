@@ -0,0 +1,239 @@
+"""
+HEX Control Nexus - Transport Module
+Process-wide pooled HTTP sessions shared by scrapers and API clients
+"""
+
+import asyncio
+import atexit
+import logging
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Awaitable, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SETTINGS = {
+    'pool_connections': 32,  # hosts with a kept-alive pool (requests)
+    'pool_maxsize': 16,  # kept-alive connections per host (requests)
+    'limit': 100,  # connections across all hosts (aiohttp)
+    'limit_per_host': 8,  # connections per host (aiohttp)
+    'dns_cache_ttl': 300,  # seconds (aiohttp)
+    'keepalive_timeout': 30,  # seconds an idle connection is kept (aiohttp)
+}
+
+
+def pool_settings(config: Optional[Dict] = None) -> Dict[str, Any]:
+    """Defaults overridden by the ``http_pool`` config block"""
+    settings = dict(DEFAULT_POOL_SETTINGS)
+    settings.update((config or {}).get('http_pool') or {})
+    return settings
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session(config: Optional[Dict] = None) -> requests.Session:
+    """Return the process-wide requests session.
+
+    The first caller's ``http_pool`` settings size the pool. Callers pass their
+    own headers per request instead of changing ``session.headers``. The pool
+    lasts until ``close_transport``, which runs at exit.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            settings = pool_settings(config)
+            adapter = HTTPAdapter(
+                pool_connections=settings['pool_connections'],
+                pool_maxsize=settings['pool_maxsize'],
+            )
+            _session = requests.Session()
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+
+@dataclass
+class AsyncPool:
+    """An event loop's shared aiohttp session and the code holding it open"""
+    session: Any
+    users: int = 0
+    connections_opened: int = 0
+    connections_reused: int = 0
+
+
+# One aiohttp session per event loop (sessions can't cross loops)
+_async_pools: Dict[asyncio.AbstractEventLoop, AsyncPool] = {}
+
+
+def count_connections(pool: AsyncPool) -> Any:
+    """A TraceConfig counting the pool's new and reused connections"""
+    import aiohttp
+
+    async def opened(session, context, params):
+        pool.connections_opened += 1
+
+    async def reused(session, context, params):
+        pool.connections_reused += 1
+
+    trace = aiohttp.TraceConfig()
+    trace.on_connection_create_end.append(opened)
+    trace.on_connection_reuseconn.append(reused)
+    return trace
+
+
+async def acquire_async_session(config: Optional[Dict] = None) -> Any:
+    """Return the running loop's shared aiohttp session, holding it open.
+
+    The first caller on a loop creates the session, sized by its
+    ``http_pool`` settings. Each call must be paired with
+    ``release_async_session`` on the same loop; the last release closes it.
+    """
+    loop = asyncio.get_running_loop()
+    pool = _async_pools.get(loop)
+    if pool is None or pool.session.closed:
+        # Only async crawls and API targets pay for importing aiohttp
+        import aiohttp
+        settings = pool_settings(config)
+        connector = aiohttp.TCPConnector(
+            limit=settings['limit'],
+            limit_per_host=settings['limit_per_host'],
+            ttl_dns_cache=settings['dns_cache_ttl'],
+            keepalive_timeout=settings['keepalive_timeout'],
+        )
+        pool = AsyncPool(None)
+        pool.session = aiohttp.ClientSession(
+            connector=connector, trace_configs=[count_connections(pool)]
+        )
+        _async_pools[loop] = pool
+    pool.users += 1
+    return pool.session
+
+
+async def release_async_session():
+    """Let go of the running loop's session, closing it after the last user"""
+    loop = asyncio.get_running_loop()
+    pool = _async_pools.get(loop)
+    if pool is None:
+        return
+    pool.users -= 1
+    if pool.users <= 0:
+        del _async_pools[loop]
+        await pool.session.close()
+
+
+class IOLoop:
+    """A process-wide event loop thread for async crawls and API syncs.
+
+    ``run`` executes a coroutine on it from any other thread, so targets run
+    one after another, or side by side from the daemon's job threads, share
+    one loop and so one aiohttp connection pool. The loop holds its session
+    open until ``close``.
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name='io-loop', daemon=True
+        )
+        self.thread.start()
+        self.submit(acquire_async_session(config)).result()
+
+    def submit(self, coro: Awaitable) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable) -> Any:
+        """Run a coroutine on the loop and wait for its result"""
+        if threading.current_thread() is self.thread:
+            raise RuntimeError("IOLoop.run called from the I/O loop itself")
+        future = self.submit(coro)
+        try:
+            return future.result()
+        except BaseException:
+            # e.g. KeyboardInterrupt in the waiting thread: don't leave the
+            # coroutine running unattended
+            future.cancel()
+            raise
+
+    def close(self, timeout: float = 10.0):
+        """Close the session and stop the loop thread"""
+        try:
+            self.submit(release_async_session()).result(timeout)
+        except Exception as e:
+            logger.warning(f"Closing the I/O loop's session failed: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+        if not self.thread.is_alive():
+            self.loop.close()
+
+
+_io_loop: Optional[IOLoop] = None
+_io_loop_lock = threading.Lock()
+
+
+def run_async(coro: Awaitable, config: Optional[Dict] = None) -> Any:
+    """Run a coroutine on the process-wide I/O loop, starting it if needed.
+
+    The first caller's ``http_pool`` settings size the loop's session.
+    """
+    global _io_loop
+    with _io_loop_lock:
+        if _io_loop is None:
+            _io_loop = IOLoop(config)
+        io_loop = _io_loop
+    return io_loop.run(coro)
+
+
+@atexit.register
+def close_transport():
+    """Close the I/O loop and its session, and the requests session"""
+    global _io_loop, _session
+    with _io_loop_lock:
+        io_loop, _io_loop = _io_loop, None
+    if io_loop is not None:
+        io_loop.close()
+    with _session_lock:
+        session, _session = _session, None
+    if session is not None:
+        session.close()
+
+
+def transport_stats() -> Dict[str, Any]:
+    """Connection pool usage, for tuning ``http_pool``.
+
+    For requests, each host's pool reports the connections it has opened
+    against the requests it served; a low ratio means connections are being
+    reused. Each aiohttp session reports the connections it opened and how
+    often it reused one instead.
+    """
+    stats: Dict[str, Any] = {'requests': {}, 'aiohttp': []}
+    with _session_lock:
+        session = _session
+    if session is not None:
+        for adapter in set(session.adapters.values()):
+            for key in list(adapter.poolmanager.pools.keys()):
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is None:
+                    continue
+                stats['requests'][f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                    'connections_opened': pool.num_connections,
+                    'requests': pool.num_requests,
+                    'idle': pool.pool.qsize() if pool.pool else 0,
+                }
+
+    for pool in list(_async_pools.values()):
+        connector = pool.session.connector
+        if connector is None or pool.session.closed:
+            continue
+        stats['aiohttp'].append({
+            'limit': connector.limit,
+            'limit_per_host': connector.limit_per_host,
+            'connections_opened': pool.connections_opened,
+            'connections_reused': pool.connections_reused,
+        })
+    return stats
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+HEX Control Nexus - Extraction Benchmark
+Measures items/sec for extract_data on canned listing pages, comparing the
+original per-field BeautifulSoup implementation with compiled selector plans
+on every installed parser backend.
+
+Usage: python benchmarks/bench_extraction.py [--items 500] [--pages 20]
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(
+    os.path.dirname(__file__), '..', 'backend', 'python_core'
+))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from extraction import BACKENDS, backend_available, compile_plan  # noqa: E402
+
+SELECTORS = {
+    "item": ".quote",
+    "fields": {
+        "text": ".text",
+        "author": ".author::text",
+        "link": "a.author-link::attr(href)",
+        "tags": ".tags .tag",
+    },
+}
+
+
+def listing_page(items: int, page: int = 1, has_next: bool = True) -> str:
+    """Generate a quotes-style listing page with ``items`` entries"""
+    rows = []
+    for n in range(items):
+        rows.append(
+            f'<div class="quote" itemscope>'
+            f'<span class="text">Quote number {page}-{n} with some filler text</span>'
+            f'<span>by <small class="author">Author {n % 37}</small>'
+            f'<a class="author-link" href="/author/{n % 37}">(about)</a></span>'
+            f'<div class="tags">Tags: '
+            f'<a class="tag" href="/tag/t{n % 11}/">t{n % 11}</a>'
+            f'<a class="tag" href="/tag/u{n % 7}/">u{n % 7}</a></div></div>'
+        )
+    pager = (f'<li class="next"><a href="/page/{page + 1}/">Next</a></li>'
+             if has_next else '')
+    return (
+        f'<html><head><title>Page {page}</title><style>.quote {{}}</style></head>'
+        f'<body><div class="container">{"".join(rows)}'
+        f'<nav><ul class="pager">{pager}</ul></nav></div></body></html>'
+    )
+
+
+def legacy_extract(soup, selectors):
+    """extract_data as it was before selector plans (the baseline).
+
+    The only change is slicing off all six characters of ``::text``.
+    """
+    items = []
+    item_selector = selectors.get('item', '')
+    field_selectors = selectors.get('fields', {})
+    for element in soup.select(item_selector):
+        item_data = {}
+        for field_name, selector in field_selectors.items():
+            if selector.endswith('::text'):
+                selector = selector[:-6]
+                field_element = element.select_one(selector)
+                item_data[field_name] = (
+                    field_element.get_text(strip=True) if field_element else ''
+                )
+            elif '::attr(' in selector:
+                attr_match = re.search(r'::attr\((\w+)\)', selector)
+                if attr_match:
+                    field_element = element.select_one(selector[:attr_match.start()])
+                    item_data[field_name] = (
+                        field_element.get(attr_match.group(1), '')
+                        if field_element else ''
+                    )
+            else:
+                field_element = element.select_one(selector)
+                item_data[field_name] = (
+                    field_element.get_text(strip=True) if field_element else ''
+                )
+        items.append(item_data)
+    return items
+
+
+def run_case(name, parse, extract, pages):
+    """Parse and extract every page, returning (items, seconds)"""
+    started = time.perf_counter()
+    total = 0
+    for content in pages:
+        total += len(extract(parse(content)))
+    return total, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Extraction throughput benchmark')
+    parser.add_argument('--items', type=int, default=500, help='Items per page')
+    parser.add_argument('--pages', type=int, default=20, help='Pages per case')
+    args = parser.parse_args()
+
+    pages = [listing_page(args.items, n).encode('utf-8')
+             for n in range(1, args.pages + 1)]
+
+    cases = [(
+        'legacy bs4/html.parser',
+        lambda content: BeautifulSoup(content, 'html.parser'),
+        lambda doc: legacy_extract(doc, SELECTORS),
+    )]
+    for backend_name, backend in BACKENDS.items():
+        if not backend_available(backend_name):
+            print(f"{backend_name:<24} not installed, skipped")
+            continue
+        plan = compile_plan(SELECTORS, backend)
+        cases.append((f'plan {backend_name}', backend.parse, plan.extract))
+
+    baseline = None
+    print(f"{'case':<24} {'items':>8} {'seconds':>9} {'items/sec':>11} {'speedup':>8}")
+    for name, parse, extract in cases:
+        items, seconds = run_case(name, parse, extract, pages)
+        rate = items / seconds if seconds else float('inf')
+        baseline = baseline or rate
+        print(f"{name:<24} {items:>8} {seconds:>9.3f} {rate:>11.0f} "
+              f"{rate / baseline:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+HEX Control Nexus - Parse Pool Benchmark
+Measures items/sec of the crawler's parse stage as the process pool grows,
+feeding canned listing pages straight to parse_in_worker (no network).
+
+Usage: python benchmarks/bench_parse_pool.py [--pages 200] [--max-workers N]
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(
+    os.path.dirname(__file__), '..', 'backend', 'python_core'
+))
+
+from bench_extraction import SELECTORS, listing_page  # noqa: E402
+from crawler import parse_in_worker  # noqa: E402
+from extraction import get_backend  # noqa: E402
+from frontier import FrontierEntry  # noqa: E402
+
+
+def run(pool, pages, parser):
+    """Parse all pages through the pool, returning (items, seconds)"""
+    started = time.perf_counter()
+    futures = [
+        pool.submit(parse_in_worker, content, parser, SELECTORS, '.next a',
+                    FrontierEntry(f'http://bench.local/page/{n}/'))
+        for n, content in enumerate(pages, start=1)
+    ]
+    items = sum(len(future.result()[0]) for future in futures)
+    return items, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parse pool scaling benchmark')
+    parser.add_argument('--pages', type=int, default=200, help='Pages to parse')
+    parser.add_argument('--items', type=int, default=100, help='Items per page')
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--parser', default='bs4', help='Parser backend')
+    args = parser.parse_args()
+
+    backend = get_backend(args.parser).name
+    pages = [listing_page(args.items, n).encode('utf-8')
+             for n in range(1, args.pages + 1)]
+
+    workers = 1
+    baseline = None
+    print(f"backend: {backend}")
+    print(f"{'workers':>7} {'items':>8} {'seconds':>9} {'items/sec':>11} "
+          f"{'scaling':>8}")
+    while workers <= args.max_workers:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            run(pool, pages[:workers], backend)  # warm up worker processes
+            items, seconds = run(pool, pages, backend)
+        rate = items / seconds
+        baseline = baseline or rate
+        print(f"{workers:>7} {items:>8} {seconds:>9.3f} {rate:>11.0f} "
+              f"{rate / baseline:>7.1f}x")
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+HEX Control Nexus - Benchmark Suite
+Runs the scraper engines, extraction, storage sinks and APIClient against a
+local fixture server and compares the results with saved baselines.
+
+Each run of a case happens in a fresh process, after a warm-up run, so its
+peak RSS is its own. Cases run ``--repeats`` times, taking turns so that
+machine drift spreads over all of them, and report the median. Baselines are
+saved per machine and scale, and results are only compared with a baseline
+taken on the same machine at the same scale. Throughput metrics
+(``*_per_sec``) regress when they drop, p50 latency and RSS when they grow,
+by more than ``--threshold`` or three times the run-to-run noise, whichever
+is larger; p99 is reported but not checked.
+
+Usage: python benchmarks/bench_suite.py [--case NAME ...] [--scale 1.0]
+                                        [--repeats 5] [--save-baseline] [--check]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(
+    os.path.dirname(__file__), '..', 'backend', 'python_core'
+))
+
+from bench_extraction import SELECTORS, listing_page  # noqa: E402
+from fixture_server import FixtureServer  # noqa: E402
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), 'baselines.json')
+DEFAULT_THRESHOLD = 0.25
+# Runs per case; their median shrugs off a run disturbed by something else
+REPEATS = 5
+# A change only counts once it is this many times the runs' relative spread
+NOISE_FACTOR = 3
+
+
+def machine_id():
+    """Names the machine baselines were taken on; others don't compare"""
+    return (f"{platform.node()} {platform.machine()} {os.cpu_count()}cpu "
+            f"py{sys.version_info[0]}.{sys.version_info[1]}")
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def latency_metrics(latencies):
+    return {
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def sizes(scale):
+    return {
+        'pages': max(2, int(50 * scale)),
+        'items': 20,
+        'rows': max(100, int(100000 * scale)),
+        'requests': max(10, int(300 * scale)),
+        'api_pages': max(2, int(20 * scale)),
+    }
+
+
+def bench_config():
+    return {
+        'concurrency': {'global': 8, 'per_domain': 8},
+        'rate_limit': {'delay_seconds': 0, 'jitter': False, 'max_retries': 0},
+        'user_agents': ['HEX-Bench/1.0'],
+    }
+
+
+def scrape_target(url, engine, pages, tmpdir):
+    return {
+        'name': f'bench_{engine}',
+        'mode': 'static',
+        'engine': engine,
+        'base_url': url,
+        'start_paths': ['/page/1/'],
+        'selectors': SELECTORS,
+        'pagination': {'next_selector': '.next a', 'max_pages': pages},
+        'storage': {'type': 'jsonl', 'path': os.path.join(tmpdir, f'{engine}.jsonl')},
+    }
+
+
+def case_scrape_sync(url, size, tmpdir):
+    from scraper import Scraper
+
+    class TimedScraper(Scraper):
+        latencies = []
+
+        def fetch_page(self, page_url):
+            started = time.perf_counter()
+            try:
+                return super().fetch_page(page_url)
+            finally:
+                self.latencies.append(time.perf_counter() - started)
+
+    scraper = TimedScraper(
+        scrape_target(url, 'sync', size['pages'], tmpdir), bench_config()
+    )
+    started = time.perf_counter()
+    items = scraper.scrape()
+    seconds = time.perf_counter() - started
+    return {
+        'pages_per_sec': len(scraper.latencies) / seconds,
+        'items_per_sec': items / seconds,
+        **latency_metrics(scraper.latencies),
+    }
+
+
+def case_scrape_async(url, size, tmpdir):
+    from crawler import AsyncCrawler
+    from scraper import Scraper
+    from storage import StreamingWriter
+
+    class TimedCrawler(AsyncCrawler):
+        latencies = []
+
+        async def fetch(self, session, page_url):
+            started = time.perf_counter()
+            try:
+                return await super().fetch(session, page_url)
+            finally:
+                self.latencies.append(time.perf_counter() - started)
+
+    target = scrape_target(url, 'async', size['pages'], tmpdir)
+    scraper = Scraper(target, bench_config())
+    crawler = TimedCrawler(scraper)
+    started = time.perf_counter()
+    with StreamingWriter.for_target(target) as writer:
+        asyncio.run(crawler.crawl(writer))
+    seconds = time.perf_counter() - started
+    return {
+        'pages_per_sec': len(crawler.latencies) / seconds,
+        'items_per_sec': writer.count / seconds,
+        **latency_metrics(crawler.latencies),
+    }
+
+
+def case_extract_data(url, size, tmpdir):
+    from scraper import Scraper
+
+    scraper = Scraper(
+        scrape_target(url, 'sync', size['pages'], tmpdir), bench_config()
+    )
+    pages = [listing_page(size['items'] * 5, n).encode('utf-8')
+             for n in range(1, size['pages'] + 1)]
+    latencies = []
+    items = 0
+    started = time.perf_counter()
+    for content in pages:
+        page_started = time.perf_counter()
+        items += len(scraper.extract_data(scraper.parse_page(content), SELECTORS))
+        latencies.append(time.perf_counter() - page_started)
+    seconds = time.perf_counter() - started
+    return {
+        'pages_per_sec': len(pages) / seconds,
+        'items_per_sec': items / seconds,
+        **latency_metrics(latencies),
+    }
+
+
+def storage_case(sink_type):
+    def run(url, size, tmpdir):
+        from storage import StreamingWriter
+
+        rows = [{'id': n, 'title': f'Item {n}', 'author': f'Author {n % 37}',
+                 'tags': f't{n % 11}'} for n in range(size['rows'])]
+        path = os.path.join(tmpdir, f'out.{sink_type}')
+        target = {
+            'name': f'bench_{sink_type}',
+            'storage': {'type': sink_type, 'path': path, 'unique_key': 'id',
+                        'batch_size': 500},
+        }
+        started = time.perf_counter()
+        with StreamingWriter.for_target(target) as writer:
+            for start in range(0, len(rows), 100):
+                writer.add(rows[start:start + 100])
+        seconds = time.perf_counter() - started
+        return {'rows_per_sec': writer.count / seconds}
+    return run
+
+
+def api_case(path_template, **request_options):
+    def run(url, size, tmpdir):
+        from api_client import APIClient
+
+        latencies = []
+
+        class TimedClient(APIClient):
+            async def request(self, spec):
+                started = time.perf_counter()
+                try:
+                    return await super().request(spec)
+                finally:
+                    latencies.append(time.perf_counter() - started)
+
+        async def main():
+            ok = 0
+            async with TimedClient(url, concurrency=10) as client:
+                specs = ({'url': path_template.format(n), **request_options}
+                         for n in range(size['requests']))
+                async for _, result in client.gather_many(specs):
+                    ok += result is not None
+            return ok
+
+        started = time.perf_counter()
+        ok = asyncio.run(main())
+        seconds = time.perf_counter() - started
+        return {
+            'requests_per_sec': len(latencies) / seconds,
+            'success_rate': ok / len(latencies),
+            **latency_metrics(latencies),
+        }
+    return run
+
+
+def case_api_paginate(url, size, tmpdir):
+    from api_client import APIClient
+
+    async def main():
+        count = 0
+        async with APIClient(url) as client:
+            async for _ in client.paginate('/api/items'):
+                count += 1
+        return count
+
+    started = time.perf_counter()
+    items = asyncio.run(main())
+    seconds = time.perf_counter() - started
+    return {
+        'pages_per_sec': size['api_pages'] / seconds,
+        'items_per_sec': items / seconds,
+    }
+
+
+CASES = {
+    'scrape_sync': case_scrape_sync,
+    'scrape_async': case_scrape_async,
+    'extract_data': case_extract_data,
+    'storage_jsonl': storage_case('jsonl'),
+    'storage_csv': storage_case('csv'),
+    'storage_sqlite': storage_case('sqlite'),
+    'storage_parquet': storage_case('parquet'),
+    'api_get': api_case('/api/items/{}'),
+    'api_slow': api_case('/api/slow/{}'),
+    'api_flaky': api_case('/api/flaky/{}', backoff_factor=0.01),
+    'api_paginate': case_api_paginate,
+}
+
+
+def median_of(runs):
+    """Median of each metric across runs, and its spread relative to the median.
+
+    The spread is the median absolute deviation, so one outlying run
+    doesn't widen it.
+    """
+    metrics, noise = {}, {}
+    for metric in runs[0]:
+        values = [run[metric] for run in runs]
+        middle = statistics.median(values)
+        deviation = statistics.median(abs(value - middle) for value in values)
+        metrics[metric] = middle
+        noise[metric] = deviation / middle if middle else 0.0
+    return metrics, noise
+
+
+def run_case(name, url, scale):
+    """Run one case in this process and return its metrics.
+
+    A warm-up run goes first, since it also pays for imports, compiled
+    selectors and new pools.
+    """
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        CASES[name](url, sizes(scale), tmpdir)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        metrics = CASES[name](url, sizes(scale), tmpdir)
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    metrics['peak_rss_mb'] = usage.ru_maxrss / divisor
+    return metrics
+
+
+def allowed_change(metric, threshold, *noises):
+    """Relative change a metric may show before it counts as regressed"""
+    spread = max((noise.get(metric, 0.0) for noise in noises), default=0.0)
+    return max(threshold, NOISE_FACTOR * spread)
+
+
+def is_regression(metric, value, baseline, threshold):
+    if metric == 'success_rate':
+        return value < baseline - 0.01
+    if metric == 'p99_ms':
+        return False  # reported only: a few hundred samples make it close to the max
+    if metric.endswith('_per_sec'):
+        return value < baseline * (1 - threshold)
+    if metric.endswith('_ms') and value - baseline < 1.0:
+        return False  # sub-millisecond jitter
+    return value > baseline * (1 + threshold)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmark suite')
+    parser.add_argument('--case', action='append', choices=sorted(CASES),
+                        help='Case to run (repeatable; default: all)')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Multiply workload sizes')
+    parser.add_argument('--repeats', type=int, default=REPEATS,
+                        help='Processes per case; the median is reported')
+    parser.add_argument('--baselines', default=BASELINES_PATH, help='Baseline file')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="Write results as this machine's baseline at this scale")
+    parser.add_argument('--check', action='store_true',
+                        help='Exit 1 if any metric regressed')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Allowed relative change before a metric counts as '
+                             'regressed (widened for noisy metrics)')
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    parser.add_argument('--url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case(args.run_case, args.url, args.scale)))
+        return
+
+    all_baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as f:
+            all_baselines = json.load(f)
+    machine, scale = machine_id(), f"{args.scale:g}"
+    baselines = all_baselines.get(machine, {}).get(scale, {})
+    if not baselines:
+        print(f"No baseline for {machine} at scale {scale}; nothing is compared "
+              f"(record one with --save-baseline)")
+
+    names = args.case or list(CASES)
+    if 'storage_parquet' in names:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("storage_parquet: pyarrow not installed, skipped")
+            names = [name for name in names if name != 'storage_parquet']
+
+    runs = {name: [] for name in names}
+    size = sizes(args.scale)
+    with FixtureServer(pages=size['pages'], api_pages=size['api_pages']) as server:
+        for _ in range(max(1, args.repeats)):
+            for name in names:
+                output = subprocess.run(
+                    [sys.executable, __file__, '--run-case', name,
+                     '--url', server.url, '--scale', str(args.scale)],
+                    capture_output=True, text=True, check=True
+                ).stdout
+                runs[name].append(json.loads(output.strip().splitlines()[-1]))
+
+    results = {}
+    regressions = []
+    for name in names:
+        metrics, noise = median_of(runs[name])
+        results[name] = {
+            'metrics': {key: round(value, 2) for key, value in metrics.items()},
+            'noise': {key: round(value, 4) for key, value in noise.items()},
+        }
+
+        print(f"\n{name}")
+        saved = baselines.get(name, {})
+        for metric, value in results[name]['metrics'].items():
+            baseline = saved.get('metrics', {}).get(metric)
+            line = f"  {metric:<18} {value:>12.2f}  ±{noise[metric]:>5.1%}"
+            if baseline:
+                change = (value - baseline) / baseline * 100
+                line += f"  baseline {baseline:>10.2f}  {change:+6.1f}%"
+                allowed = allowed_change(
+                    metric, args.threshold, noise, saved.get('noise', {})
+                )
+                if is_regression(metric, value, baseline, allowed):
+                    line += f"  REGRESSION (> {allowed:.0%})"
+                    regressions.append(f"{name}.{metric}")
+            print(line)
+
+    if args.save_baseline:
+        all_baselines.setdefault(machine, {}).setdefault(scale, {}).update(results)
+        with open(args.baselines, 'w') as f:
+            json.dump(all_baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\nSaved baselines for {machine} at scale {scale} to {args.baselines}")
+    if regressions:
+        print(f"\nRegressed: {', '.join(regressions)}")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""
+HEX Control Nexus - Benchmark Fixture Server
+Local HTTP stand-in for benchmarks: generated listing pages, robots.txt,
+paginated JSON and slow or erroring API endpoints.
+
+Usage: python benchmarks/fixture_server.py [--port 8765] [--latency-ms 0]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_extraction import listing_page  # noqa: E402
+
+PAGE_RE = re.compile(r'^/page/(\d+)/$')
+API_RE = re.compile(r'^/api/(items|slow|flaky)/(\d+)$')
+
+
+def api_item(item_id: int) -> dict:
+    return {'id': item_id, 'title': f'Item {item_id}', 'body': 'x' * 200,
+            'tags': [f't{item_id % 11}', f'u{item_id % 7}']}
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Routes requests for a FixtureServer (its settings live on ``server``)."""
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without this, Nagle's
+    # algorithm and delayed ACKs add ~40ms to every kept-alive response
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        fixture = self.server.fixture
+        if fixture.latency:
+            time.sleep(fixture.latency)
+        parsed = urlparse(self.path)
+        path = parsed.path
+
+        if path == '/robots.txt':
+            return self.reply(200, b'User-agent: *\nAllow: /\n', 'text/plain')
+
+        match = PAGE_RE.match(path)
+        if match:
+            page = int(match.group(1))
+            if not 1 <= page <= fixture.pages:
+                return self.reply(404, b'')
+            return self.reply(200, fixture.page_body(page), 'text/html; charset=utf-8')
+
+        if path == '/api/items':
+            # Top-level JSON array pages, chained with Link: rel="next"
+            page = int(parse_qs(parsed.query).get('page', ['1'])[0])
+            if not 1 <= page <= fixture.api_pages:
+                return self.reply(200, b'[]', 'application/json')
+            first = (page - 1) * fixture.per_page
+            body = json.dumps(
+                [api_item(first + n) for n in range(fixture.per_page)]
+            ).encode('utf-8')
+            headers = {}
+            if page < fixture.api_pages:
+                headers['Link'] = f'</api/items?page={page + 1}>; rel="next"'
+            return self.reply(200, body, 'application/json', headers)
+
+        match = API_RE.match(path)
+        if match:
+            kind, item_id = match.group(1), int(match.group(2))
+            if kind == 'slow':
+                time.sleep(fixture.slow)
+            elif kind == 'flaky' and fixture.next_flaky():
+                return self.reply(503, b'{"error": "unavailable"}', 'application/json',
+                                  {'Retry-After': '0'})
+            return self.reply(200, json.dumps(api_item(item_id)).encode('utf-8'),
+                              'application/json')
+
+        self.reply(404, b'')
+
+    def reply(self, status: int, body: bytes, content_type: str = 'text/plain',
+              headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connection bursts, and each dropped SYN
+    # costs the client a one second retransmit
+    request_queue_size = 128
+
+
+class FixtureServer:
+    """Serves the fixtures from a background thread.
+
+    - ``/page/<n>/``: listing pages 1..``pages`` of ``items`` quotes each,
+      linked by a ``.next a`` pager
+    - ``/api/items?page=<n>``: ``api_pages`` JSON arrays of ``per_page`` items
+    - ``/api/items/<id>``: one JSON item
+    - ``/api/slow/<id>``: the same, after ``slow`` seconds
+    - ``/api/flaky/<id>``: every ``flaky_every``-th request gets a 503
+
+    Every response is delayed by ``latency`` seconds.
+    """
+
+    def __init__(self, pages: int = 50, items: int = 20, api_pages: int = 20,
+                 per_page: int = 100, latency: float = 0.0, slow: float = 0.05,
+                 flaky_every: int = 5, host: str = '127.0.0.1', port: int = 0):
+        self.pages = pages
+        self.items = items
+        self.api_pages = api_pages
+        self.per_page = per_page
+        self.latency = latency
+        self.slow = slow
+        self.flaky_every = max(1, flaky_every)
+        self.flaky_count = 0
+        self.lock = threading.Lock()
+        self.bodies = {}
+        self.httpd = FixtureHTTPServer((host, port), FixtureHandler)
+        self.httpd.fixture = self
+        self.url = f'http://{host}:{self.httpd.server_address[1]}'
+        self.thread = None
+
+    def page_body(self, page: int) -> bytes:
+        if page not in self.bodies:
+            self.bodies[page] = listing_page(
+                self.items, page, page < self.pages
+            ).encode('utf-8')
+        return self.bodies[page]
+
+    def next_flaky(self) -> bool:
+        with self.lock:
+            self.flaky_count += 1
+            return self.flaky_count % self.flaky_every == 0
+
+    def start(self) -> 'FixtureServer':
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> 'FixtureServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark fixture HTTP server')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--pages', type=int, default=50, help='Listing pages')
+    parser.add_argument('--items', type=int, default=20, help='Items per listing page')
+    parser.add_argument('--latency-ms', type=float, default=0,
+                        help='Delay added to every response')
+    args = parser.parse_args()
+
+    server = FixtureServer(args.pages, args.items, latency=args.latency_ms / 1000,
+                           port=args.port)
+    print(f"Serving fixtures on {server.url} (Ctrl+C to stop)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
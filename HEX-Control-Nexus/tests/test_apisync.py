@@ -0,0 +1,193 @@
+import json
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the python_core directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'python_core'))
+
+from apisync import APISync, expand_each
+
+
+def post(post_id):
+    return {'id': post_id, 'title': f'Post {post_id}', 'user': {'name': f'user{post_id % 3}'},
+            'tags': ['a', 'b']}
+
+
+class APIHandler(BaseHTTPRequestHandler):
+    """A small JSON API: slow single posts, posts that fail once, and a
+    three-page listing chained with Link headers."""
+    protocol_version = 'HTTP/1.1'
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+    failed = set()
+
+    def do_GET(self):
+        match = re.match(r'^/posts/(\d+)$', self.path)
+        if match:
+            with APIHandler.lock:
+                APIHandler.active += 1
+                APIHandler.peak = max(APIHandler.peak, APIHandler.active)
+            time.sleep(0.05)
+            with APIHandler.lock:
+                APIHandler.active -= 1
+            return self.reply(200, post(int(match.group(1))))
+
+        match = re.match(r'^/flaky/(\d+)$', self.path)
+        if match:
+            with APIHandler.lock:
+                first = self.path not in APIHandler.failed
+                APIHandler.failed.add(self.path)
+            if first:
+                return self.reply(503, {'error': 'unavailable'})
+            return self.reply(200, post(int(match.group(1))))
+
+        match = re.match(r'^/posts\?page=(\d+)$', self.path)
+        if match:
+            page = int(match.group(1))
+            headers = {'Link': f'</posts?page={page + 1}>; rel="next"'} if page < 3 else {}
+            return self.reply(200, [post(page * 10 + n) for n in range(2)], headers)
+
+        self.reply(404, {})
+
+    def reply(self, status, data, headers=None):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestAPISync(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), APIHandler)
+        cls.server.daemon_threads = True
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        APIHandler.peak = 0
+        APIHandler.failed = set()
+        self.endpoints_path = self.write_endpoints({'max_attempts': 2, 'backoff_factor': 0})
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_endpoints(self, retry_policy):
+        path = os.path.join(self.tmpdir.name, 'endpoints.yaml')
+        with open(path, 'w') as f:
+            f.write(f"endpoints:\n"
+                    f"  - name: local\n"
+                    f"    url: {self.base_url}\n"
+                    f"    concurrency: 4\n"
+                    f"scheduling:\n"
+                    f"  retry_policy: {json.dumps(retry_policy)}\n")
+        return path
+
+    def stored_jsonl(self, target):
+        with open(target['storage']['path'], encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_each_expands_lists_and_ranges(self):
+        self.assertEqual(list(expand_each({'a': [1, 2], 'b': {'start': 0, 'stop': 2}})),
+                         [{'a': 1, 'b': 0}, {'a': 1, 'b': 1}, {'a': 2, 'b': 0}, {'a': 2, 'b': 1}])
+        self.assertEqual(list(expand_each(None)), [{}])
+
+    def test_fan_out_streams_normalized_records(self):
+        """Requests run at the endpoint's concurrency and land in SQLite as flat rows."""
+        db_path = os.path.join(self.tmpdir.name, 'api.db')
+        target = {
+            'name': 'posts', 'mode': 'api', 'endpoint': 'local',
+            'path': '/posts/{id}', 'each': {'id': {'start': 1, 'stop': 21}},
+            'fields': {'id': 'id', 'author': 'user.name', 'tags': 'tags'},
+            'storage': {'type': 'sqlite', 'path': db_path, 'unique_key': 'id'},
+        }
+        self.assertEqual(APISync(target, {}, endpoints_path=self.endpoints_path).run(), 20)
+        self.assertEqual(APIHandler.peak, 4)
+
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute('SELECT id, author, tags FROM posts').fetchall()
+        conn.close()
+        self.assertEqual(len(rows), 20)
+        self.assertIn(('1', 'user1', '["a", "b"]'), rows)
+
+    def test_retry_policy_applies(self):
+        target = {
+            'name': 'flaky', 'mode': 'api', 'endpoint': 'local',
+            'path': '/flaky/{id}', 'each': {'id': [1, 2, 3]},
+            'storage': {'type': 'jsonl', 'path': os.path.join(self.tmpdir.name, 'flaky.jsonl')},
+        }
+        sync = APISync(target, {}, endpoints_path=self.endpoints_path)
+        self.assertEqual(sync.run(), 3)
+        self.assertEqual(sync.failed, 0)
+
+        # Without retries, every first attempt's 503 is final
+        APIHandler.failed = set()
+        target['retry_policy'] = {'max_attempts': 1}
+        sync = APISync(target, {}, endpoints_path=self.endpoints_path)
+        self.assertEqual(sync.run(), 0)
+        self.assertEqual(sync.failed, 3)
+
+    def test_paginated_listing(self):
+        target = {
+            'name': 'listing', 'mode': 'api', 'base_url': self.base_url,
+            'path': '/posts', 'params': {'page': 1}, 'pagination': {'type': 'link'},
+            'storage': {'type': 'jsonl', 'path': os.path.join(self.tmpdir.name, 'listing.jsonl')},
+        }
+        self.assertEqual(APISync(target, {}, endpoints_path=self.endpoints_path).run(), 6)
+        records = self.stored_jsonl(target)
+        self.assertEqual([r['id'] for r in records], [10, 11, 20, 21, 30, 31])
+        # JSONL keeps nested values as they are
+        self.assertEqual(records[0]['user'], {'name': 'user1'})
+
+    def test_engine_runs_enabled_api_targets(self):
+        """A full run syncs API targets and skips disabled ones."""
+        os.makedirs(os.path.join(self.tmpdir.name, 'logs'))
+        enabled = os.path.join(self.tmpdir.name, 'enabled.jsonl')
+        disabled = os.path.join(self.tmpdir.name, 'disabled.jsonl')
+        config = {
+            'targets': [
+                {'name': 'enabled', 'mode': 'api', 'endpoint': 'local', 'path': '/posts/{id}',
+                 'each': {'id': [1, 2]}, 'storage': {'type': 'jsonl', 'path': enabled}},
+                {'name': 'disabled', 'mode': 'api', 'endpoint': 'local', 'path': '/posts/{id}',
+                 'each': {'id': [1, 2]}, 'enabled': False, 'storage': {'type': 'jsonl', 'path': disabled}},
+            ]
+        }
+        config_path = os.path.join(self.tmpdir.name, 'config.json')
+        with open(config_path, 'w') as f:
+            json.dump(config, f)
+
+        automation = os.path.join(os.path.dirname(__file__), '..', 'backend', 'python_core', 'automation.py')
+        subprocess.run([sys.executable, automation, '--config', config_path],
+                       cwd=self.tmpdir.name, check=True, timeout=60,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        with open(enabled, encoding='utf-8') as f:
+            self.assertEqual(sorted(json.loads(line)['id'] for line in f), [1, 2])
+        self.assertFalse(os.path.exists(disabled))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+# Add the python_core directory to the path
+CORE = os.path.join(os.path.dirname(__file__), '..', 'backend', 'python_core')
+sys.path.insert(0, CORE)
+
+from automation import AutomationEngine
+from scheduler import Job, Scheduler
+
+
+class TestAutomationEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.config_path = os.path.join(self.tmpdir.name, 'config.json')
+        self.write_config(['a', 'b'])
+        # The engine installs its own shutdown handlers
+        self.handlers = {sig: signal.getsignal(sig) for sig in (signal.SIGINT, signal.SIGTERM)}
+        self.engine = AutomationEngine(self.config_path)
+
+    def tearDown(self):
+        for sig, handler in self.handlers.items():
+            signal.signal(sig, handler)
+        self.tmpdir.cleanup()
+
+    def write_config(self, names, **settings):
+        targets = [{'name': name, 'mode': 'static', **settings} for name in names]
+        with open(self.config_path, 'w') as f:
+            json.dump({'targets': targets, 'daemon_interval': 60}, f)
+
+    def test_targets_are_indexed_by_name(self):
+        self.write_config(['a', 'b', 'a'])
+        self.engine.reload_config()
+        self.assertEqual(list(self.engine.targets), ['a', 'b'])
+        self.assertIs(self.engine.find_target('b'), self.engine.config['targets'][1])
+        self.assertIs(self.engine.find_target('a'), self.engine.config['targets'][0])
+        self.assertIsNone(self.engine.find_target('missing'))
+
+    def test_reload_updates_the_scheduler(self):
+        async def runner(job):
+            pass
+
+        jobs, _ = self.engine.load_jobs()
+        scheduler = Scheduler(jobs, runner)
+        self.write_config(['b', 'c'])
+        self.engine.reload(scheduler)
+        self.assertEqual(set(scheduler.jobs), {'b', 'c'})
+
+        # A config that doesn't parse leaves everything as it was
+        with open(self.config_path, 'w') as f:
+            f.write('{"targets": [')
+        self.engine.reload(scheduler)
+        self.assertEqual(set(scheduler.jobs), {'b', 'c'})
+        self.assertEqual(list(self.engine.targets), ['b', 'c'])
+
+    def test_jobs_run_in_process(self):
+        runs = []
+
+        def run_target(name, dry_run=False, stop_event=None):
+            runs.append((name, threading.current_thread(), stop_event.is_set()))
+
+        self.engine.run_target = run_target
+        asyncio.run(self.engine.run_job(Job('a', 'a', interval=60)))
+        self.assertEqual(len(runs), 1)
+        name, thread, stopped = runs[0]
+        self.assertEqual(name, 'a')
+        self.assertIsNot(thread, threading.main_thread())
+        self.assertFalse(stopped)
+        self.assertEqual(self.engine.run_stops, set())
+
+    def test_max_runtime_stops_the_run(self):
+        """A run past max_runtime is told to stop and waited for, not abandoned."""
+        finished = []
+
+        def run_target(name, dry_run=False, stop_event=None):
+            finished.append(stop_event.wait(10))
+
+        self.engine.run_target = run_target
+        job = Job('a', 'a', interval=60)
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(asyncio.wait_for(self.engine.run_job(job), 0.2))
+        self.assertEqual(finished, [True])
+
+    def test_isolated_targets_run_in_a_child(self):
+        self.write_config(['a'], isolate=True)
+        self.engine.reload_config()
+        children = []
+
+        async def run_job_process(job):
+            children.append(job.target)
+
+        self.engine.run_job_process = run_job_process
+        self.engine.run_target = lambda *args, **kwargs: self.fail("ran in process")
+        asyncio.run(self.engine.run_job(Job('a', 'a', interval=60)))
+        self.assertEqual(children, ['a'])
+
+    def test_async_runs_are_sampled(self):
+        """cProfile only sees the job thread, so async work gets the sampler."""
+        with open(self.config_path, 'w') as f:
+            json.dump({'targets': [
+                {'name': 'sync', 'mode': 'static'},
+                {'name': 'async', 'mode': 'static', 'engine': 'async'},
+                {'name': 'api', 'mode': 'api'},
+            ]}, f)
+        self.engine.reload_config()
+        self.engine.profile = 'auto'
+        self.assertEqual([self.engine.profile_mode(name)
+                          for name in ('sync', 'async', 'api')],
+                         ['cprofile', 'sample', 'sample'])
+        self.engine.profile = 'cprofile'
+        with self.assertLogs('automation', 'WARNING'):
+            self.assertEqual(self.engine.profile_mode('async'), 'cprofile')
+
+    def test_startup_skips_heavy_imports(self):
+        """Importing the engine loads no HTTP client, parser or Parquet library."""
+        heavy = ['aiohttp', 'requests', 'bs4', 'lxml', 'selectolax', 'pyarrow', 'yaml']
+        code = (f"import sys; sys.path.insert(0, {CORE!r}); import automation; "
+                f"print([m for m in {heavy!r} if m in sys.modules])")
+        output = subprocess.run([sys.executable, '-c', code], cwd=self.tmpdir.name,
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), '[]')
+
+
+if __name__ == '__main__':
+    unittest.main()
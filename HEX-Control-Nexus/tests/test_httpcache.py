@@ -0,0 +1,144 @@
+import os
+import sys
+import tempfile
+import unittest
+
+# Add the python_core directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'python_core'))
+
+from httpcache import HTTPCache, ItemTracker, PageTracker, get_http_cache
+
+
+class TestHTTPCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = HTTPCache(os.path.join(self.tmpdir.name, 'cache'))
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmpdir.cleanup()
+
+    def test_first_fetch_is_recorded_on_commit(self):
+        """A new URL is a miss; its validators are recorded once committed."""
+        result = self.cache.resolve('http://a/1', 200, b'<p>1</p>', {'ETag': '"v1"'}, None)
+        self.assertFalse(result.unchanged)
+        self.assertEqual(self.cache.misses, 1)
+        tracker = PageTracker(self.cache, 'quotes')
+        tracker.add(result.entry, [])
+        # Nothing is recorded until the page's items have been flushed
+        self.assertIsNone(tracker.lookup('http://a/1'))
+        tracker.commit()
+        entry = tracker.lookup('http://a/1')
+        self.assertEqual(entry.etag, '"v1"')
+        self.assertEqual(self.cache.conditional_headers(entry), {'If-None-Match': '"v1"'})
+
+    def test_entries_are_scoped_by_target(self):
+        """Another target fetching the same URL doesn't see it as cached."""
+        result = self.cache.resolve('http://a/1', 200, b'<p>1</p>', {'ETag': '"v1"'}, None)
+        tracker = PageTracker(self.cache, 'quotes')
+        tracker.add(result.entry, [])
+        tracker.commit()
+        self.assertIsNotNone(self.cache.lookup('quotes', 'http://a/1'))
+        self.assertIsNone(self.cache.lookup('other', 'http://a/1'))
+
+    def test_not_modified_serves_cached_body(self):
+        """A 304 returns the stored body and the recorded next links."""
+        tracker = PageTracker(self.cache, 'quotes')
+        first = self.cache.resolve(
+            'http://a/1', 200, b'<p>1</p>', {'Last-Modified': 'yesterday'}, None
+        )
+        tracker.add(first.entry, ['http://a/2'])
+        tracker.commit()
+        entry = tracker.lookup('http://a/1')
+        self.assertEqual(self.cache.conditional_headers(entry), {'If-Modified-Since': 'yesterday'})
+
+        result = self.cache.resolve('http://a/1', 304, b'', {}, entry)
+        self.assertTrue(result.unchanged)
+        self.assertEqual(result.content, b'<p>1</p>')
+        self.assertEqual(result.entry.next_urls, ['http://a/2'])
+
+    def test_identical_body_counts_as_unchanged(self):
+        """Servers without validators are compared by content hash."""
+        tracker = PageTracker(self.cache, 'quotes')
+        first = self.cache.resolve('http://a/1', 200, b'same', {}, None)
+        tracker.add(first.entry, ['http://a/2'])
+        tracker.commit()
+        again = self.cache.resolve('http://a/1', 200, b'same', {}, tracker.lookup('http://a/1'))
+        self.assertTrue(again.unchanged)
+        self.assertEqual(again.entry.next_urls, ['http://a/2'])
+
+        changed = self.cache.resolve('http://a/1', 200, b'new', {}, again.entry)
+        self.assertFalse(changed.unchanged)
+        self.assertEqual(changed.entry.next_urls, [])
+
+    def test_not_modified_body_is_read_lazily(self):
+        """A 304 doesn't touch the stored body unless its content is used."""
+        first = self.cache.resolve('http://a/1', 200, b'gone', {'ETag': '"x"'}, None)
+        os.remove(self.cache.body_path(first.entry.content_hash))
+        result = self.cache.resolve('http://a/1', 304, b'', {}, first.entry)
+        self.assertTrue(result.unchanged)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertIsNone(result.content)
+
+    def test_garbage_collection_keeps_referenced_bodies(self):
+        """Bodies no entry refers to are deleted once past the grace period."""
+        tracker = PageTracker(self.cache, 'quotes')
+        old = self.cache.resolve('http://a/1', 200, b'old', {}, None)
+        tracker.add(old.entry, [])
+        tracker.commit()
+        new = self.cache.resolve('http://a/1', 200, b'new', {}, old.entry)
+        tracker.add(new.entry, [])
+        tracker.commit()
+        pending = self.cache.resolve('http://a/2', 200, b'pending', {}, None)
+
+        # Recent bodies are left alone, whether referenced or not
+        self.assertEqual(self.cache.collect_garbage(), 0)
+        self.assertEqual(self.cache.collect_garbage(grace=-1), 2)
+        self.assertFalse(os.path.exists(self.cache.body_path(old.entry.content_hash)))
+        self.assertFalse(
+            os.path.exists(self.cache.body_path(pending.entry.content_hash))
+        )
+        self.assertEqual(self.cache.read_body(tracker.lookup('http://a/1')), b'new')
+
+    def test_expired_entries_are_dropped(self):
+        """With max_age, old entries go and their bodies with them."""
+        cache = HTTPCache(os.path.join(self.tmpdir.name, 'aged'), max_age=60)
+        self.addCleanup(cache.close)
+        result = cache.resolve('http://a/1', 200, b'page', {}, None)
+        result.entry.stored_at -= 120
+        cache.record('quotes', [result.entry])
+        self.assertEqual(cache.collect_garbage(grace=-1), 1)
+        self.assertIsNone(cache.lookup('quotes', 'http://a/1'))
+
+    def test_item_tracker_passes_new_and_changed_items(self):
+        """Only new or edited items get through, once their fingerprints are committed."""
+        tracker = ItemTracker(self.cache, 'quotes', 'text')
+        items = [{'text': 'a', 'author': 'x'}, {'text': 'b', 'author': 'y'}]
+        self.assertEqual(tracker.filter('http://a/1', items), items)
+        # Repeats within a run are dropped even before the commit
+        self.assertEqual(tracker.filter('http://a/2', items[:1]), [])
+        tracker.commit()
+
+        tracker = ItemTracker(self.cache, 'quotes', 'text')
+        edited = {'text': 'b', 'author': 'z'}
+        added = {'text': 'c', 'author': 'x'}
+        self.assertEqual(tracker.filter('http://a/1', [items[0], edited, added]), [edited, added])
+        self.assertEqual((tracker.new, tracker.changed, tracker.unchanged), (1, 1, 1))
+
+        # Another scope keeps its own fingerprints
+        self.assertEqual(ItemTracker(self.cache, 'other', 'text').filter('http://a/1', items), items)
+
+    def test_config_toggles(self):
+        """http_cache is off by default and can be disabled per target."""
+        path = os.path.join(self.tmpdir.name, 'shared')
+        config = {'http_cache': {'enabled': True, 'path': path}}
+        self.assertIsNone(get_http_cache({}))
+        self.assertIsNone(get_http_cache(config, {'http_cache': False}))
+        cache = get_http_cache(config, {})
+        self.assertIs(cache, get_http_cache(config))
+        cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.request import urlopen
+
+# Add the python_core directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'python_core'))
+
+from metrics import REGISTRY, MetricsRegistry, MetricsServer, SnapshotPublisher, profiled
+from scraper import Scraper
+
+
+class QuotesHandler(BaseHTTPRequestHandler):
+    """Serves two linked pages of two quotes each."""
+
+    def do_GET(self):
+        if self.path == '/robots.txt':
+            body = ''
+        else:
+            n = int(self.path.strip('/').split('/')[-1])
+            next_link = '<a class="next" href="/page/2/">Next</a>' if n == 1 else ''
+            body = ''.join(f'<div class="quote"><span class="text">Quote {n}.{i}</span></div>'
+                           for i in range(2)) + next_link
+        body = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.requests = self.registry.counter('requests_total', 'Requests', ['host'])
+        self.latency = self.registry.histogram('latency_seconds', 'Latency', ['host'], buckets=(0.1, 1.0))
+        self.active = self.registry.gauge('active', 'Active requests')
+
+    def test_prometheus_text(self):
+        self.requests.inc(host='a')
+        self.requests.inc(2, host='a')
+        self.latency.observe(0.05, host='a')
+        self.latency.observe(0.5, host='a')
+        self.latency.observe(5, host='a')
+        self.active.set(3)
+        text = self.registry.render_prometheus()
+        self.assertIn('# TYPE requests_total counter', text)
+        self.assertIn('requests_total{host="a"} 3', text)
+        self.assertIn('latency_seconds_bucket{host="a",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{host="a",le="1.0"} 2', text)
+        self.assertIn('latency_seconds_bucket{host="a",le="+Inf"} 3', text)
+        self.assertIn('latency_seconds_count{host="a"} 3', text)
+        self.assertIn('active 3', text)
+
+    def test_gauge_tracks_blocks_in_progress(self):
+        with self.active.track():
+            self.assertEqual(self.active.samples(), [({}, 1)])
+        self.assertEqual(self.active.samples(), [({}, 0)])
+
+    def test_snapshots_from_other_processes_are_added(self):
+        """Counters and histograms add up; gauges stay this process's own."""
+        other = MetricsRegistry()
+        other.counter('requests_total', 'Requests', ['host']).inc(5, host='a')
+        other.histogram('latency_seconds', 'Latency', ['host'], buckets=(0.1, 1.0)).observe(0.5, host='a')
+        other.gauge('active', 'Active requests').set(7)
+        self.requests.inc(host='a')
+        self.latency.observe(0.05, host='a')
+
+        self.registry.merge(json.loads(json.dumps(other.snapshot())))
+        snapshot = self.registry.snapshot()
+        self.assertEqual(snapshot['requests_total']['samples'], [{'labels': {'host': 'a'}, 'value': 6}])
+        latency = snapshot['latency_seconds']['samples'][0]
+        self.assertEqual(latency['count'], 2)
+        self.assertEqual(latency['buckets'], {'0.1': 1, '1.0': 2, '+Inf': 2})
+        self.assertEqual(snapshot['active']['samples'], [])
+
+    def test_running_children_are_shown_live(self):
+        """Watched snapshot files add their gauges until the child is absorbed."""
+        child = MetricsRegistry()
+        child.counter('requests_total', 'Requests', ['host']).inc(5, host='a')
+        child.gauge('active', 'Active requests').set(2)
+        self.requests.inc(host='a')
+        self.active.set(1)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'child.json')
+            publisher = SnapshotPublisher(child, path, interval=0.01).start()
+            self.registry.watch(path)
+            publisher.stop()
+            live = self.registry.live().snapshot()
+            self.assertEqual(live['requests_total']['samples'][0]['value'], 6)
+            self.assertEqual(live['active']['samples'], [{'labels': {}, 'value': 3}])
+
+            # Once the child exits its counters stay, its gauges go
+            self.registry.absorb(path)
+            self.assertIs(self.registry.live(), self.registry)
+            snapshot = self.registry.snapshot()
+            self.assertEqual(snapshot['requests_total']['samples'][0]['value'], 6)
+            self.assertEqual(snapshot['active']['samples'], [{'labels': {}, 'value': 1}])
+
+    def test_http_endpoints(self):
+        self.requests.inc(host='a')
+        server = MetricsServer(self.registry, port=0).start()
+        try:
+            with urlopen(f'{server.url}/metrics') as response:
+                self.assertIn('requests_total{host="a"} 1', response.read().decode('utf-8'))
+            with urlopen(f'{server.url}/metrics.json') as response:
+                self.assertEqual(response.headers['Access-Control-Allow-Origin'], '*')
+                data = json.load(response)
+            self.assertEqual(data['metrics']['requests_total']['samples'][0]['value'], 1)
+        finally:
+            server.stop()
+
+
+class TestScrapeMetrics(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), QuotesHandler)
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def stage_counts(self, target):
+        samples = REGISTRY.snapshot()['hex_stage_seconds']['samples']
+        return {s['labels']['stage']: s['count'] for s in samples if s['labels']['target'] == target}
+
+    def test_each_engine_records_every_stage(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for engine in ('sync', 'async'):
+                with self.subTest(engine=engine):
+                    name = f'metrics_{engine}'
+                    target = {
+                        "name": name,
+                        "mode": "static",
+                        "engine": engine,
+                        "base_url": self.base_url,
+                        "start_paths": ["/page/1/"],
+                        "selectors": {"item": ".quote", "fields": {"text": ".text"}},
+                        "pagination": {"next_selector": "a.next"},
+                        "storage": {"type": "jsonl", "path": os.path.join(tmpdir, f"{engine}.jsonl")}
+                    }
+                    config = {"rate_limit": {"delay_seconds": 0, "jitter": False},
+                              "user_agents": ["Test Agent"]}
+                    self.assertEqual(Scraper(target, config).scrape(), 4)
+
+                    counts = self.stage_counts(name)
+                    for stage in ('robots', 'rate_limit', 'fetch', 'parse', 'extract'):
+                        self.assertEqual(counts[stage], 2, stage)
+                    self.assertEqual(counts['store'], 2)
+                    snapshot = REGISTRY.snapshot()
+                    pages = {s['labels']['outcome']: s['value'] for s in snapshot['hex_pages_total']['samples']
+                             if s['labels']['target'] == name}
+                    self.assertEqual(pages, {'fetched': 2})
+                    items = [s['value'] for s in snapshot['hex_items_stored_total']['samples']
+                             if s['labels']['target'] == name]
+                    self.assertEqual(items, [4])
+                    downloaded = [s['value'] for s in snapshot['hex_bytes_downloaded_total']['samples']
+                                  if s['labels']['target'] == name]
+                    self.assertGreater(downloaded[0], 0)
+
+    def test_profiled_run_writes_a_profile(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for mode, suffix in (('cprofile', '.prof'), ('sample', '.folded')):
+                with self.subTest(mode=mode):
+                    with profiled('work', mode, tmpdir):
+                        sum(i * i for i in range(200000))
+                    files = [f for f in os.listdir(tmpdir) if f.endswith(suffix)]
+                    self.assertEqual(len(files), 1)
+                    self.assertGreater(os.path.getsize(os.path.join(tmpdir, files[0])), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
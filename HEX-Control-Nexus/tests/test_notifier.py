@@ -0,0 +1,172 @@
+import json
+import os
+import smtplib
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the python_core directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'python_core'))
+
+import notifier as notifier_module
+from notifier import Notification, Notifier, SMTPConnection, digest, split_message
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """Records the JSON bodies posted to it, after ``throttled`` 429s."""
+    received = []
+    throttled = 0
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length))
+        if WebhookHandler.throttled:
+            WebhookHandler.throttled -= 1
+            self.send_response(429)
+            self.send_header('Retry-After', '0.2')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        WebhookHandler.received.append(body)
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeSMTP:
+    """Stands in for smtplib.SMTP, counting connections and messages."""
+    connections = 0
+    sent = []
+
+    def __init__(self, host, port, timeout=None):
+        FakeSMTP.connections += 1
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        pass
+
+    def send_message(self, message):
+        FakeSMTP.sent.append(message)
+
+    def noop(self):
+        return (250, b'OK')
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class TestNotifier(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), WebhookHandler)
+        cls.webhook = f'http://127.0.0.1:{cls.server.server_address[1]}/hook'
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        WebhookHandler.received = []
+        WebhookHandler.throttled = 0
+        self.original_smtp = smtplib.SMTP
+        smtplib.SMTP = FakeSMTP
+        FakeSMTP.connections = 0
+        FakeSMTP.sent = []
+
+    def tearDown(self):
+        smtplib.SMTP = self.original_smtp
+
+    def test_bursts_are_digested(self):
+        """A burst of notifications reaches the webhook as a few digests."""
+        notifier = Notifier({'notifications': {'intervals': {'slack': 0.2}}})
+        started = time.perf_counter()
+        for n in range(20):
+            self.assertTrue(notifier.notify('slack', f'event {n % 5}', destination=self.webhook))
+        enqueue_seconds = time.perf_counter() - started
+        notifier.close()
+
+        self.assertLess(enqueue_seconds, 0.5)
+        self.assertLessEqual(len(WebhookHandler.received), 3)
+        text = '\n'.join(body['text'] for body in WebhookHandler.received)
+        for n in range(5):
+            self.assertIn(f'event {n}', text)
+        self.assertEqual(notifier.dispatcher.stats()['failed'], 0)
+
+    def test_digest_counts_repeats(self):
+        merged = digest([Notification('slack', 'u', 'down'), Notification('slack', 'u', 'down'),
+                         Notification('slack', 'u', 'up')])
+        self.assertEqual(merged.text, '3 notifications:\n- down (x2)\n- up')
+        email = digest([Notification('email', 'a@x', 'b1', 'First'),
+                        Notification('email', 'a@x', 'b2', 'Second')])
+        self.assertEqual(email.subject, 'First (+1 more)')
+
+    def test_long_digests_are_split(self):
+        """Digests longer than a channel accepts go out in parts, lines kept whole."""
+        lines = [f'line {n} ' + 'x' * 30 for n in range(100)]
+        parts = split_message(Notification('discord', 'u', '\n'.join(lines)), 2000)
+        self.assertGreater(len(parts), 1)
+        self.assertTrue(all(len(part.text) <= 2000 for part in parts))
+        self.assertEqual('\n'.join(part.text for part in parts), '\n'.join(lines))
+        cut = split_message(Notification('telegram', 'u', 'y' * 5000), 4096)
+        self.assertEqual([len(part.text) for part in cut], [4096, 904])
+
+    def test_throttled_sends_are_retried(self):
+        """A 429 puts the message back in the queue until Retry-After has passed."""
+        WebhookHandler.throttled = 1
+        notifier = Notifier({'notifications': {'intervals': {'discord': 0.01}}})
+        started = time.monotonic()
+        self.assertTrue(notifier.notify('discord', 'x' * 2500, destination=self.webhook))
+        notifier.close()
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+        self.assertEqual(''.join(body['content'] for body in WebhookHandler.received), 'x' * 2500)
+        stats = notifier.dispatcher.stats()
+        self.assertEqual((stats['sent'], stats['retried'], stats['failed']), (2, 2, 0))
+
+    def test_smtp_connection_is_reused(self):
+        """Emails share one logged-in connection."""
+        connection = SMTPConnection('smtp.example.com', 587, 'user', 'secret')
+        for n in range(3):
+            connection.send(f'message {n}')
+        connection.close()
+        self.assertEqual(FakeSMTP.connections, 1)
+        self.assertEqual(len(FakeSMTP.sent), 3)
+
+    def test_closed_dispatchers_are_not_kept_for_exit(self):
+        """Only dispatchers still running are closed at exit."""
+        notifier = Notifier({'notifications': {'intervals': {'slack': 0.01}}})
+        notifier.notify('slack', 'hi', destination=self.webhook)
+        self.assertIn(notifier.dispatcher, notifier_module._dispatchers)
+        notifier.close()
+        self.assertNotIn(notifier.dispatcher, notifier_module._dispatchers)
+
+        notifier = Notifier({'notifications': {'intervals': {'slack': 0.01}}})
+        notifier.notify('slack', 'bye', destination=self.webhook)
+        notifier_module.close_dispatchers()
+        self.assertTrue(notifier.dispatcher.closed)
+        self.assertEqual([body['text'] for body in WebhookHandler.received],
+                         ['hi', 'bye'])
+
+    def test_unconfigured_channels_are_refused(self):
+        notifier = Notifier()
+        notifier.telegram_token = None
+        self.assertFalse(notifier.notify('telegram', 'hi'))
+        self.assertFalse(notifier.notify('slack', 'hi'))
+        self.assertIsNone(notifier.dispatcher)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import sys
+import os
+
+# Add the python_core directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'python_core'))
+
+from ratelimit import HostRateLimiter, parse_retry_after
+
+
+class TestHostRateLimiter(unittest.TestCase):
+
+    def test_slots_are_scheduled_per_host(self):
+        """Requests to one host queue up without delaying other hosts."""
+        limiter = HostRateLimiter(delay_seconds=10)
+        self.assertEqual(limiter.reserve("a.com"), 0)
+        self.assertAlmostEqual(limiter.reserve("a.com"), 10, delta=0.1)
+        self.assertEqual(limiter.reserve("b.com"), 0)
+
+    def test_burst_allows_back_to_back_requests(self):
+        """A burst of N lets the first N requests through immediately."""
+        limiter = HostRateLimiter(delay_seconds=10, burst=3)
+        delays = [limiter.reserve("a.com") for _ in range(4)]
+        self.assertEqual(delays[:3], [0, 0, 0])
+        self.assertGreater(delays[3], 0)
+
+    def test_crawl_delay_raises_interval(self):
+        """A robots Crawl-delay larger than the configured delay wins."""
+        limiter = HostRateLimiter(delay_seconds=1)
+        limiter.set_crawl_delay("a.com", 5)
+        self.assertEqual(limiter.interval("a.com"), 5)
+
+    def test_adapts_to_throttling(self):
+        """429s back off and honour Retry-After; fast successes recover."""
+        limiter = HostRateLimiter(delay_seconds=1)
+        limiter.record_response("a.com", 429, 0.1, retry_after=30)
+        self.assertEqual(limiter.interval("a.com"), 2)
+        self.assertGreaterEqual(limiter.reserve("a.com"), 29)
+
+        for _ in range(20):
+            limiter.record_response("a.com", 200, 0.1)
+        self.assertEqual(limiter.interval("a.com"), 1)
+
+    def test_parse_retry_after(self):
+        """Retry-After accepts seconds and HTTP dates."""
+        self.assertEqual(parse_retry_after("120"), 120)
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0)
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertIsNone(parse_retry_after(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
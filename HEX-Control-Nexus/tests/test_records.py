@@ -0,0 +1,93 @@
+import csv
+import json
+import os
+import pickle
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+# Add the python_core directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'python_core'))
+
+from records import json_default, record_type, rows
+from storage import StreamingWriter, close_sqlite_writers, pq
+
+
+class TestRecord(unittest.TestCase):
+
+    def setUp(self):
+        self.Quote = record_type(('text', 'author', 'first-tag'))
+        self.record = self.Quote(['Quote 1', 'Author 1', '/tag/a'])
+
+    def test_reads_like_a_dict(self):
+        as_dict = {'text': 'Quote 1', 'author': 'Author 1', 'first-tag': '/tag/a'}
+        self.assertEqual(self.record['first-tag'], '/tag/a')
+        self.assertEqual(self.record.get('missing', ''), '')
+        self.assertIn('author', self.record)
+        self.assertEqual(list(self.record.keys()), ['text', 'author', 'first-tag'])
+        self.assertEqual(dict(self.record), as_dict)
+        self.assertEqual(self.record, as_dict)
+        self.assertEqual(json.loads(json.dumps(self.record, default=json_default)), as_dict)
+        with self.assertRaises(KeyError):
+            self.record['missing']
+
+    def test_fixed_fields(self):
+        self.assertIs(record_type(('text', 'author', 'first-tag')), self.Quote)
+        self.assertFalse(hasattr(self.record, '__dict__'))
+        self.record['author'] = 'Author 2'
+        self.assertEqual(self.record['author'], 'Author 2')
+        with self.assertRaises(KeyError):
+            self.record['added'] = 'x'
+
+    def test_pickles_by_fields(self):
+        copy = pickle.loads(pickle.dumps(self.record))
+        self.assertIs(type(copy), self.Quote)
+        self.assertEqual(copy, self.record)
+
+    def test_rows_by_column(self):
+        items = [self.record, {'author': 'Author 3'}]
+        self.assertEqual([list(row) for row in rows(items, ['author', 'text', 'other'])],
+                         [['Author 1', 'Quote 1', ''], ['Author 3', '', '']])
+
+
+class TestRecordStorage(unittest.TestCase):
+    """Records land in every sink exactly as the equivalent dicts would."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        Quote = record_type(('text', 'author'))
+        self.records = [Quote([f'Quote {n}', f'Author {n}']) for n in range(3)]
+
+    def tearDown(self):
+        close_sqlite_writers()
+        self.tmpdir.cleanup()
+
+    def store(self, storage_type, path):
+        target = {'name': 'quotes', 'storage': {'type': storage_type, 'path': path}}
+        with StreamingWriter.for_target(target) as writer:
+            writer.add(self.records)
+        return path
+
+    def test_csv_and_jsonl(self):
+        expected = [dict(record) for record in self.records]
+        with open(self.store('csv', os.path.join(self.tmpdir.name, 'q.csv')), newline='') as f:
+            self.assertEqual(list(csv.DictReader(f)), expected)
+        with open(self.store('jsonl', os.path.join(self.tmpdir.name, 'q.jsonl'))) as f:
+            self.assertEqual([json.loads(line) for line in f], expected)
+
+    def test_sqlite(self):
+        conn = sqlite3.connect(self.store('sqlite', os.path.join(self.tmpdir.name, 'q.db')))
+        stored = conn.execute('SELECT text, author FROM quotes').fetchall()
+        conn.close()
+        self.assertEqual(stored, [record.values() for record in self.records])
+
+    @unittest.skipIf(pq is None, "pyarrow not installed")
+    def test_parquet(self):
+        root = self.store('parquet', os.path.join(self.tmpdir.name, 'parquet'))
+        table = pq.read_table(os.path.join(root, 'target=quotes'))
+        self.assertEqual(table.column('author').to_pylist(), [r['author'] for r in self.records])
+
+
+if __name__ == '__main__':
+    unittest.main()
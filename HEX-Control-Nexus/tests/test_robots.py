@@ -0,0 +1,86 @@
+import unittest
+import sys
+import os
+import tempfile
+import time
+
+# Add the python_core directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'python_core'))
+
+from robots import RobotsCache, RobotsRules
+
+ROBOTS_TXT = """
+# Comment line
+User-agent: *
+Disallow: /private
+Allow: /private/public
+Disallow: /*.pdf$
+Crawl-delay: 2
+
+User-agent: HEX
+User-agent: OtherBot
+Disallow: /hex-only
+Crawl-delay: 0.5
+"""
+
+
+class TestRobotsRules(unittest.TestCase):
+
+    def setUp(self):
+        self.rules = RobotsRules.parse(ROBOTS_TXT)
+        self.agent = "Mozilla/5.0 (compatible; Generic/1.0)"
+
+    def test_longest_match_wins(self):
+        """The most specific rule decides, so Allow can override Disallow."""
+        self.assertFalse(self.rules.can_fetch(self.agent, "http://example.com/private/data"))
+        self.assertTrue(self.rules.can_fetch(self.agent, "http://example.com/private/public/x"))
+        self.assertTrue(self.rules.can_fetch(self.agent, "http://example.com/"))
+
+    def test_wildcards_and_end_anchor(self):
+        """``*`` matches any run of characters and ``$`` anchors the end."""
+        self.assertFalse(self.rules.can_fetch(self.agent, "http://example.com/docs/a.pdf"))
+        self.assertTrue(self.rules.can_fetch(self.agent, "http://example.com/docs/a.pdf?x=1"))
+
+    def test_user_agent_groups(self):
+        """A named group replaces the ``*`` group for matching agents."""
+        hex_agent = "Mozilla/5.0 (compatible; HEX/1.0)"
+        self.assertFalse(self.rules.can_fetch(hex_agent, "http://example.com/hex-only"))
+        self.assertTrue(self.rules.can_fetch(hex_agent, "http://example.com/private"))
+        self.assertEqual(self.rules.crawl_delay(hex_agent), 0.5)
+        self.assertEqual(self.rules.crawl_delay(self.agent), 2.0)
+
+
+class TestRobotsCache(unittest.TestCase):
+
+    def test_ttl_and_eviction(self):
+        """Entries expire after the TTL and the least recently used host is evicted."""
+        cache = RobotsCache(ttl=60, max_hosts=2)
+        cache.store("http://a.com", ROBOTS_TXT, 200)
+        cache.store("http://b.com", None, 404)
+        self.assertIsNotNone(cache.get("http://a.com"))
+        cache.store("http://c.com", ROBOTS_TXT, 200)
+
+        self.assertIsNone(cache.get("http://b.com"))
+        self.assertIsNotNone(cache.get("http://a.com"))
+
+        cache.entries["http://a.com"].expires_at = time.time() - 1
+        self.assertIsNone(cache.get("http://a.com"))
+
+    def test_missing_robots_allows_everything(self):
+        """A 404 robots.txt allows every path."""
+        rules = RobotsCache().store("http://a.com", "Not found", 404)
+        self.assertTrue(rules.can_fetch("HEX", "http://a.com/private"))
+
+    def test_persistence(self):
+        """A persisted cache is reloaded by a new instance."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "robots.json")
+            RobotsCache(persist_path=path).store("http://a.com", ROBOTS_TXT, 200)
+
+            rules = RobotsCache(persist_path=path).get("http://a.com")
+            self.assertIsNotNone(rules)
+            self.assertFalse(rules.can_fetch("Generic", "http://a.com/private"))
+
+
+if __name__ == '__main__':
+    unittest.main()
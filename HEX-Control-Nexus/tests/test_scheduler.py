@@ -0,0 +1,220 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import unittest
+from datetime import datetime, timezone
+
+# Add the python_core directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'python_core'))
+
+from scheduler import CronExpression, FileWatcher, Job, Scheduler, get_timezone
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+class TestCronExpression(unittest.TestCase):
+
+    def test_field_syntax(self):
+        """Lists, ranges, steps and names expand to the right values."""
+        cron = CronExpression('*/15 9-17 * jan,jul mon-fri')
+        self.assertEqual(sorted(cron.minutes), [0, 15, 30, 45])
+        self.assertEqual(sorted(cron.hours), list(range(9, 18)))
+        self.assertEqual(sorted(cron.months), [1, 7])
+        self.assertEqual(sorted(cron.weekdays), [1, 2, 3, 4, 5])
+
+    def test_next_after(self):
+        """next_after returns the first matching minute after a moment."""
+        cases = [
+            ('0 0 * * *', utc(2024, 3, 10, 12, 30), utc(2024, 3, 11, 0, 0)),
+            ('0 * * * *', utc(2024, 3, 10, 12, 0), utc(2024, 3, 10, 13, 0)),
+            ('30 8 * * 1', utc(2024, 3, 10, 12, 0), utc(2024, 3, 11, 8, 30)),  # Monday
+            ('@monthly', utc(2024, 12, 15), utc(2025, 1, 1)),
+            ('0 0 29 2 *', utc(2024, 3, 1), utc(2028, 2, 29)),
+            # Day of month OR day of week when both are restricted
+            ('0 0 13 * 5', utc(2024, 3, 10), utc(2024, 3, 13)),
+        ]
+        for expression, start, expected in cases:
+            with self.subTest(expression=expression):
+                self.assertEqual(CronExpression(expression).next_after(start), expected)
+
+    def test_timezone(self):
+        """Cron times are wall-clock times in the job's timezone."""
+        tz = get_timezone('America/New_York')
+        start = datetime(2024, 7, 1, 12, 0, tzinfo=tz)
+        self.assertEqual(CronExpression('0 0 * * *').next_after(start).hour, 0)
+
+    def test_invalid_expressions(self):
+        for expression in ('* * * *', '61 * * * *', '* * * * * *', '5-1 * * * *'):
+            with self.subTest(expression=expression):
+                with self.assertRaises(ValueError):
+                    CronExpression(expression)
+
+
+class TestScheduler(unittest.TestCase):
+
+    def run_scheduler(self, jobs, runner, duration, max_workers=2):
+        scheduler = Scheduler(jobs, runner, max_workers)
+
+        async def main():
+            asyncio.get_running_loop().call_later(duration, scheduler.stop)
+            await scheduler.run()
+
+        asyncio.run(main())
+        return scheduler
+
+    def job(self, name, interval, **settings):
+        return Job.from_config(dict(name=name, target=name, interval=interval, **settings))
+
+    def test_due_jobs_run_repeatedly(self):
+        """Interval jobs keep running until the scheduler stops."""
+        runs = []
+
+        async def runner(job):
+            runs.append(job.name)
+
+        jobs = [self.job('fast', 0.05), self.job('slow', 0.5, run_at_start=False)]
+        scheduler = self.run_scheduler(jobs, runner, 0.3)
+        self.assertGreaterEqual(runs.count('fast'), 3)
+        self.assertNotIn('slow', runs)
+        self.assertTrue(all(r.status == 'success' for r in scheduler.jobs['fast'].history))
+
+    def test_interval_jobs_run_at_start(self):
+        """Interval jobs run as soon as the scheduler starts; cron jobs wait."""
+        runs = []
+
+        async def runner(job):
+            runs.append(job.name)
+
+        jobs = [self.job('hourly', 3600),
+                Job.from_config({'name': 'nightly', 'target': 't', 'cron': '0 0 * * *'})]
+        scheduler = self.run_scheduler(jobs, runner, 0.1)
+        self.assertEqual(runs, ['hourly'])
+        self.assertGreater(scheduler.jobs['hourly'].next_run, time.time() + 3000)
+
+    def test_max_runtime_is_enforced(self):
+        """A run longer than max_runtime is cancelled and recorded as a timeout."""
+        async def runner(job):
+            await asyncio.sleep(10)
+
+        scheduler = self.run_scheduler([self.job('stuck', 0.05, max_runtime=0.1)], runner, 0.2)
+        statuses = [r.status for r in scheduler.jobs['stuck'].history]
+        self.assertIn('timeout', statuses)
+        self.assertNotIn('success', statuses)
+
+    def test_overlapping_runs_are_skipped(self):
+        """By default a run that comes due while the last is going is skipped."""
+        async def runner(job):
+            await asyncio.sleep(0.25)
+
+        scheduler = self.run_scheduler([self.job('long', 0.05)], runner, 0.2)
+        statuses = [r.status for r in scheduler.jobs['long'].history]
+        self.assertIn('skipped', statuses)
+        self.assertEqual(statuses.count('success'), 1)
+
+    def test_worker_limit(self):
+        """No more than max_workers jobs run at once."""
+        active = []
+        peak = []
+
+        async def runner(job):
+            active.append(job.name)
+            peak.append(len(active))
+            await asyncio.sleep(0.05)
+            active.remove(job.name)
+
+        jobs = [self.job(f'job{n}', 0.05) for n in range(4)]
+        self.run_scheduler(jobs, runner, 0.3, max_workers=2)
+        self.assertEqual(max(peak), 2)
+
+    def test_failures_are_recorded(self):
+        async def runner(job):
+            raise RuntimeError('boom')
+
+        scheduler = self.run_scheduler([self.job('broken', 0.05)], runner, 0.1)
+        record = scheduler.jobs['broken'].last_run
+        self.assertEqual(record.status, 'failed')
+        self.assertEqual(record.error, 'boom')
+
+    def test_update_while_running(self):
+        """Changed jobs keep their run in progress, removed jobs stop and new ones start."""
+        runs = []
+
+        async def runner(job):
+            runs.append(job.name)
+            if job.name == 'long':
+                await asyncio.sleep(0.2)
+
+        scheduler = Scheduler([self.job('long', 0.05), self.job('gone', 0.05)], runner)
+
+        async def main():
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.1, scheduler.update,
+                            [self.job('long', 0.05, max_runtime=5), self.job('new', 0.05)])
+            loop.call_later(0.1, lambda: runs.append('update'))
+            loop.call_later(0.4, scheduler.stop)
+            await scheduler.run()
+
+        asyncio.run(main())
+        after = runs[runs.index('update'):]
+        self.assertNotIn('gone', after)
+        self.assertIn('new', after)
+        self.assertEqual(set(scheduler.jobs), {'long', 'new'})
+        long_job = scheduler.jobs['long']
+        self.assertEqual(long_job.max_runtime, 5)
+        # The run in progress at the update finished, and overlap still applied to it
+        statuses = [r.status for r in long_job.history]
+        self.assertIn('success', statuses)
+        self.assertIn('skipped', statuses)
+
+    def test_update_wakes_an_idle_scheduler(self):
+        runs = []
+
+        async def runner(job):
+            runs.append(job.name)
+
+        scheduler = Scheduler([], runner)
+
+        async def main():
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.05, scheduler.update, [self.job('added', 0.05)])
+            loop.call_later(0.3, scheduler.stop)
+            await scheduler.run()
+
+        asyncio.run(main())
+        self.assertIn('added', runs)
+
+    def test_job_config(self):
+        """Entries inherit schedule.yaml defaults and need a cron or interval."""
+        job = Job.from_config({'name': 'a', 'target': 't', 'cron': '@hourly'},
+                              {'max_runtime': 60, 'overlap': 'queue'})
+        self.assertEqual(job.max_runtime, 60)
+        self.assertEqual(job.overlap, 'queue')
+        with self.assertRaises(ValueError):
+            Job.from_config({'name': 'b', 'target': 't'})
+
+
+class TestFileWatcher(unittest.TestCase):
+
+    def test_reports_changed_files_once(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'schedule.yaml')
+            missing = os.path.join(tmpdir, 'endpoints.yaml')
+            with open(path, 'w') as f:
+                f.write('schedules: []\n')
+            watcher = FileWatcher([path, missing])
+            self.assertEqual(watcher.changed(), [])
+
+            with open(path, 'a') as f:
+                f.write('# edited\n')
+            with open(missing, 'w') as f:
+                f.write('endpoints: []\n')
+            self.assertEqual(watcher.changed(), [path, missing])
+            self.assertEqual(watcher.changed(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
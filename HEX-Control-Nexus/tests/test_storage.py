@@ -0,0 +1,195 @@
+import unittest
+import sys
+import os
+import json
+import sqlite3
+import tempfile
+from unittest import mock
+
+# Add the python_core directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'python_core'))
+
+from storage import CSVSink, SQLiteWriter, StreamingWriter, export_target, pq
+
+
+class TestSQLiteWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "nested", "data.db")
+        self.writer = SQLiteWriter(self.db_path, batch_size=2)
+
+    def tearDown(self):
+        self.writer.close()
+        self.tmpdir.cleanup()
+
+    def rows(self, sql):
+        return self.writer.conn.execute(sql).fetchall()
+
+    def test_upsert_skips_duplicates(self):
+        """Rows with an existing unique key are skipped across batches and calls."""
+        data = [{"text": f"Quote {n % 3}", "author": f"Author {n}"} for n in range(5)]
+        self.assertEqual(self.writer.write("quotes", data, "text"), 3)
+        self.assertEqual(self.writer.write("quotes", data, "text"), 0)
+        self.assertEqual(self.rows("SELECT COUNT(*) FROM quotes"), [(3,)])
+
+        index = self.rows("SELECT sql FROM sqlite_master WHERE type = 'index'")
+        self.assertIn("UNIQUE", index[0][0])
+        self.assertEqual(self.rows("PRAGMA journal_mode"), [("wal",)])
+
+    def test_on_conflict_update(self):
+        """on_conflict='update' overwrites the stored row."""
+        self.writer.write("quotes", [{"text": "Q", "author": "Old"}], "text")
+        self.writer.write("quotes", [{"text": "Q", "author": "New"}], "text", "update")
+        self.assertEqual(self.rows("SELECT author FROM quotes"), [("New",)])
+
+    def test_existing_duplicates_and_new_columns(self):
+        """Legacy tables with duplicates are left alone unless dedupe is set."""
+        self.writer.close()
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE quotes (text TEXT)")
+        conn.executemany("INSERT INTO quotes VALUES (?)",
+                         [("A",), ("A",), ("B",), (None,), (None,)])
+        conn.commit()
+        conn.close()
+
+        self.writer = SQLiteWriter(self.db_path)
+        with self.assertRaisesRegex(ValueError, "1 duplicate text"):
+            self.writer.write("quotes", [{"text": "C", "author": "X"}], "text")
+        self.assertEqual(self.rows("SELECT COUNT(*) FROM quotes"), [(5,)])
+
+        self.writer.write("quotes", [{"text": "C", "author": "X"}], "text",
+                          dedupe=True)
+        self.assertEqual(self.rows("SELECT text, author FROM quotes ORDER BY text"),
+                         [(None, None), (None, None), ("A", None), ("B", None),
+                          ("C", "X")])
+
+
+class RecordingSink:
+    """Sink that records each batch it receives."""
+
+    def __init__(self):
+        self.batches = []
+        self.closed = False
+
+    def write(self, items):
+        self.batches.append(list(items))
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class TestStreamingWriter(unittest.TestCase):
+
+    def test_flushes_in_batches(self):
+        """Items reach the sink in batch_size chunks plus a final partial batch."""
+        sink = RecordingSink()
+        with StreamingWriter(sink, batch_size=3, flush_interval=3600) as writer:
+            for n in range(7):
+                writer.add([{"n": n}])
+            self.assertEqual([len(batch) for batch in sink.batches], [3, 3])
+
+        self.assertEqual([len(batch) for batch in sink.batches], [3, 3, 1])
+        self.assertEqual(writer.count, 7)
+        self.assertTrue(sink.closed)
+
+    def test_csv_sink_appends_with_existing_header(self):
+        """A reopened CSV keeps its header and column order."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "out.csv")
+            for row in ({"a": "1", "b": "2"}, {"b": "4", "a": "3"}):
+                sink = CSVSink(path)
+                sink.write([row])
+                sink.close()
+
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(f.read().splitlines(), ["a,b", "1,2", "3,4"])
+
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.target = {
+            "name": "quotes",
+            "storage": {
+                "type": "jsonl",
+                "path": os.path.join(self.tmpdir.name, "quotes.jsonl")
+            }
+        }
+        with StreamingWriter.for_target(self.target) as writer:
+            writer.add([{"text": f"Quote {n}", "rank": n} for n in range(5)])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_export_jsonl_to_csv(self):
+        """Exports read the stored output back and replace earlier exports."""
+        path = os.path.join(self.tmpdir.name, "out.csv")
+        self.assertEqual(export_target(self.target, "csv", path, batch_size=2), 5)
+        self.assertEqual(export_target(self.target, "csv", path), 5)
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(len(f.read().splitlines()), 6)
+
+    def test_export_never_replaces_its_source(self):
+        """Exporting onto the target's own storage is refused."""
+        source = self.target["storage"]["path"]
+        with self.assertRaises(ValueError):
+            export_target(self.target, "jsonl", source)
+        with open(source, encoding="utf-8") as f:
+            self.assertEqual(len(f.read().splitlines()), 5)
+
+    def test_failed_export_keeps_the_previous_one(self):
+        """An export only replaces the last one once it has completed."""
+        path = os.path.join(self.tmpdir.name, "out.jsonl")
+        export_target(self.target, "jsonl", path)
+
+        def failing(target, batch_size):
+            yield [{"text": "partial"}]
+            raise OSError("disk gone")
+
+        with mock.patch("storage.iter_stored_items", failing):
+            with self.assertRaises(OSError):
+                export_target(self.target, "jsonl", path)
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(len(f.read().splitlines()), 5)
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)),
+                         ["out.jsonl", "quotes.jsonl"])
+
+    @unittest.skipIf(pq is None, "pyarrow not installed")
+    def test_export_to_partitioned_parquet(self):
+        """Parquet exports are typed and partitioned by target and date."""
+        root = os.path.join(self.tmpdir.name, "parquet")
+        export_target(self.target, "parquet", root, batch_size=2)
+
+        [date_dir] = os.listdir(os.path.join(root, "target=quotes"))
+        self.assertTrue(date_dir.startswith("date="))
+        [filename] = os.listdir(os.path.join(root, "target=quotes", date_dir))
+
+        parquet_file = pq.ParquetFile(os.path.join(root, "target=quotes", date_dir, filename))
+        self.assertEqual(parquet_file.metadata.num_rows, 5)
+        self.assertEqual(parquet_file.metadata.num_row_groups, 3)
+        self.assertEqual(str(parquet_file.schema_arrow.field("rank").type), "int64")
+
+    @unittest.skipIf(pq is None, "pyarrow not installed")
+    def test_export_from_parquet(self):
+        """Parquet output from several runs reads back with its columns merged."""
+        root = os.path.join(self.tmpdir.name, "parquet")
+        parquet_target = {"name": "quotes", "storage": {"type": "parquet", "path": root}}
+        export_target(self.target, "parquet", root)
+        with StreamingWriter.for_target(parquet_target) as writer:
+            writer.add([{"text": "Quote 5", "rank": 5, "author": "Author 5"}])
+
+        path = os.path.join(self.tmpdir.name, "out.jsonl")
+        self.assertEqual(export_target(parquet_target, "jsonl", path, batch_size=2), 6)
+        with open(path, encoding="utf-8") as f:
+            items = sorted((json.loads(line) for line in f), key=lambda item: item["rank"])
+        self.assertEqual(items[0], {"text": "Quote 0", "rank": 0, "author": None})
+        self.assertEqual(items[5]["author"], "Author 5")
+
+
+if __name__ == '__main__':
+    unittest.main()
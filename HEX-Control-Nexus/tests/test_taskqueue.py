@@ -0,0 +1,336 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the python_core directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'python_core'))
+
+from scraper import Scraper
+from taskqueue import DomainSlots, DurableFrontier, TaskQueue
+
+
+class PagesHandler(BaseHTTPRequestHandler):
+    """Serves five linked pages with one quote each, counting requests.
+
+    ``errors`` maps a path to how many times it answers 500 first.
+    """
+    requests = []
+    errors = {}
+
+    def do_GET(self):
+        if self.path == '/robots.txt':
+            body = ''
+        elif self.path.startswith('/page/'):
+            n = int(self.path.strip('/').split('/')[-1])
+            next_link = f'<a class="next" href="/page/{n + 1}/">Next</a>' if n < 5 else ''
+            body = f'<div class="quote"><span class="text">Quote {n}</span></div>{next_link}'
+            PagesHandler.requests.append(self.path)
+            if PagesHandler.errors.get(self.path):
+                PagesHandler.errors[self.path] -= 1
+                self.send_response(500)
+                self.end_headers()
+                return
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.end_headers()
+        self.wfile.write(body.encode('utf-8'))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    """Serves slow pages, tracking how many requests are in progress at once."""
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+
+    def do_GET(self):
+        if self.path == '/robots.txt':
+            body = ''
+        else:
+            with SlowHandler.lock:
+                SlowHandler.active += 1
+                SlowHandler.peak = max(SlowHandler.peak, SlowHandler.active)
+            time.sleep(0.15)
+            with SlowHandler.lock:
+                SlowHandler.active -= 1
+            body = f'<div class="quote"><span class="text">Quote {self.path}</span></div>'
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.end_headers()
+        self.wfile.write(body.encode('utf-8'))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestTaskQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.queue = TaskQueue(os.path.join(self.tmpdir.name, 'tasks.db'),
+                               max_attempts=2, retry_delay=0)
+
+    def tearDown(self):
+        self.queue.close()
+        self.tmpdir.cleanup()
+
+    def test_keys_are_unique_per_queue(self):
+        self.assertIsNotNone(self.queue.put('a', 'http://x/1', {}))
+        self.assertIsNone(self.queue.put('a', 'http://x/1', {}))
+        self.assertIsNotNone(self.queue.put('b', 'http://x/1', {}))
+        self.assertEqual(self.queue.counts('a'), {'pending': 1})
+
+    def test_leased_tasks_are_hidden_until_the_lease_expires(self):
+        for n in range(3):
+            self.queue.put('q', str(n), {'n': n})
+        first = self.queue.lease('q', 'w1', limit=2, lease_seconds=0.2)
+        second = self.queue.lease('q', 'w2', limit=5)
+        self.assertEqual([t.payload['n'] for t in first], [0, 1])
+        self.assertEqual([t.payload['n'] for t in second], [2])
+
+        time.sleep(0.3)
+        reclaimed = self.queue.lease('q', 'w2', limit=5)
+        self.assertEqual([t.payload['n'] for t in reclaimed], [0, 1])
+
+    def test_extended_leases_stay_hidden(self):
+        self.queue.put('q', 'k', {})
+        task = self.queue.lease('q', 'w1', lease_seconds=0.2)[0]
+        time.sleep(0.1)
+        self.assertEqual(self.queue.extend_lease([task.id], 'w1', 0.5), [])
+        time.sleep(0.2)
+        self.assertEqual(self.queue.lease('q', 'w2'), [])
+        # Another owner can't extend a lease it doesn't hold
+        self.assertEqual(self.queue.extend_lease([task.id], 'w2'), [task.id])
+
+    def test_frontier_renews_leases_of_held_pages(self):
+        """A page held longer than the lease isn't handed to another worker."""
+        frontier = DurableFrontier(self.queue, 'q', owner='w1', lease_seconds=0.3)
+        frontier.add('http://x/1')
+        entry = frontier.pop()
+        frontier.complete(entry)
+        time.sleep(0.5)
+        self.assertEqual(self.queue.lease('q', 'w2'), [])
+        frontier.commit()
+        frontier.release()
+        self.assertEqual(self.queue.counts('q'), {'done': 1})
+
+    def test_failed_tasks_are_retried_then_given_up(self):
+        self.queue.put('q', 'k', {})
+        task = self.queue.lease('q', 'w')[0]
+        self.queue.fail(task.id, 'boom')
+        task = self.queue.lease('q', 'w')[0]
+        self.assertEqual(task.attempts, 1)
+        self.queue.fail(task.id, 'boom')
+        self.assertEqual(self.queue.lease('q', 'w'), [])
+        self.assertEqual(self.queue.counts('q'), {'failed': 1})
+        self.assertIsNone(self.queue.next_available('q'))
+
+    def test_domain_slots_are_capped(self):
+        slots = [self.queue.acquire_slot('example.com', 'w', 2, ttl=0.2) for _ in range(3)]
+        self.assertIsNone(slots[2])
+        self.assertIsNotNone(self.queue.acquire_slot('other.com', 'w', 2, ttl=60))
+        self.queue.release_slot(slots[0])
+        self.assertIsNotNone(self.queue.acquire_slot('example.com', 'w', 2, ttl=60))
+        self.assertIsNone(self.queue.acquire_slot('example.com', 'w', 2, ttl=60))
+        # Slots of a crashed worker lapse
+        time.sleep(0.3)
+        self.assertIsNotNone(self.queue.acquire_slot('example.com', 'w', 2, ttl=60))
+
+    def test_domain_turns_are_paced_across_workers(self):
+        """Workers sharing the queue take turns at the domain's interval."""
+        self.assertEqual(self.queue.reserve_turn('example.com', 0.5), 0)
+        self.assertAlmostEqual(self.queue.reserve_turn('example.com', 0.5), 0.5, delta=0.05)
+        self.assertEqual(self.queue.reserve_turn('other.com', 0.5), 0)
+
+        workers = [DomainSlots(self.queue, 2, owner=f'w{n}') for n in range(2)]
+        started = time.monotonic()
+        for _ in range(2):
+            for slots in workers:
+                slots.release(slots.acquire('paced.com', 0.1))
+        # Four requests from two workers, 0.1s apart
+        self.assertGreaterEqual(time.monotonic() - started, 0.3)
+
+    def test_max_tasks_bounds_the_queue(self):
+        for n in range(5):
+            self.queue.put('q', str(n), {}, max_tasks=3)
+        self.assertEqual(self.queue.counts('q'), {'pending': 3})
+
+    def test_checkpoints(self):
+        self.queue.set_checkpoint('q', 'cursor', {'page': 3})
+        self.assertEqual(self.queue.get_checkpoint('q', 'cursor'), {'page': 3})
+        self.queue.clear('q')
+        self.assertIsNone(self.queue.get_checkpoint('q', 'cursor'))
+
+
+class TestResumableCrawl(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), PagesHandler)
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        PagesHandler.requests = []
+        PagesHandler.errors = {}
+        self.global_config = {
+            "rate_limit": {"delay_seconds": 0, "jitter": False},
+            "user_agents": ["Test Agent"],
+            "task_queue": {"enabled": True, "path": os.path.join(self.tmpdir.name, 'tasks.db')},
+        }
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def make_target(self, engine):
+        return {
+            "name": f"resume_{engine}",
+            "mode": "static",
+            "engine": engine,
+            "base_url": self.base_url,
+            "start_paths": ["/page/1/"],
+            "selectors": {"item": ".quote", "fields": {"text": ".text"}},
+            "pagination": {"next_selector": "a.next"},
+            "storage": {
+                "type": "jsonl", "batch_size": 1,
+                "path": os.path.join(self.tmpdir.name, f"{engine}.jsonl")
+            }
+        }
+
+    def stored(self, target):
+        with open(target['storage']['path'], encoding='utf-8') as f:
+            return [json.loads(line)['text'] for line in f]
+
+    def test_interrupted_crawl_resumes(self):
+        """A crawl stopped after two pages picks up at page three."""
+        for engine in ('sync', 'async'):
+            with self.subTest(engine=engine):
+                PagesHandler.requests = []
+                target = self.make_target(engine)
+                scraper = Scraper(target, self.global_config)
+
+                # Stop once two pages have been requested
+                def watch():
+                    while len(PagesHandler.requests) < 2:
+                        time.sleep(0.005)
+                    scraper.stop_event.set()
+                watcher = threading.Thread(target=watch)
+                watcher.start()
+                first = scraper.scrape()
+                watcher.join()
+                self.assertLess(first, 5)
+
+                second = Scraper(target, self.global_config).scrape()
+                self.assertEqual(sorted(set(self.stored(target))),
+                                 [f'Quote {n}' for n in range(1, 6)])
+                self.assertEqual(first + second, len(self.stored(target)))
+                # Pages finished before the stop were not fetched again
+                self.assertEqual(PagesHandler.requests.count('/page/1/'), 1)
+
+                # The finished crawl was cleared, so the next run starts over
+                PagesHandler.requests = []
+                self.assertEqual(Scraper(target, self.global_config).scrape(), 5)
+                self.assertEqual(len(PagesHandler.requests), 5)
+
+    def test_failing_page_is_retried(self):
+        """A page whose extraction raises is retried instead of aborting the crawl."""
+        self.global_config['task_queue'].update({"retry_delay": 0, "max_attempts": 3})
+        target = self.make_target('sync')
+        scraper = Scraper(target, self.global_config)
+        extract = scraper.extract_data
+        calls = []
+
+        def flaky_extract(doc, selectors):
+            calls.append(1)
+            if len(calls) in (3, 4):
+                raise RuntimeError('transient')
+            return extract(doc, selectors)
+        scraper.extract_data = flaky_extract
+
+        self.assertEqual(scraper.scrape(), 5)
+        self.assertEqual(PagesHandler.requests.count('/page/3/'), 3)
+
+    def test_failed_fetch_is_retried(self):
+        """A page that keeps answering 500 is retried later, not marked done."""
+        self.global_config['task_queue'].update({"retry_delay": 0, "max_attempts": 3})
+        self.global_config['rate_limit']['max_retries'] = 0
+        for engine in ('sync', 'async'):
+            with self.subTest(engine=engine):
+                PagesHandler.requests = []
+                PagesHandler.errors = {'/page/3/': 1}
+                target = self.make_target(engine)
+                self.assertEqual(Scraper(target, self.global_config).scrape(), 5)
+                self.assertEqual(PagesHandler.requests.count('/page/3/'), 2)
+
+
+class TestDistributedWorkers(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), SlowHandler)
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_workers_share_the_per_domain_limit(self):
+        """Three workers crawl every page once, never more than per_domain at a time."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.makedirs(os.path.join(tmpdir, 'logs'))
+            output = os.path.join(tmpdir, 'out.jsonl')
+            config = {
+                "targets": [{
+                    "name": "distributed",
+                    "mode": "static",
+                    "base_url": self.base_url,
+                    "start_paths": [f"/slow/{n}" for n in range(12)],
+                    "selectors": {"item": ".quote", "fields": {"text": ".text"}},
+                    "storage": {"type": "jsonl", "path": output, "batch_size": 1}
+                }],
+                "concurrency": {"global": 5, "per_domain": 2},
+                "rate_limit": {"delay_seconds": 0, "jitter": False},
+                "user_agents": ["Test Agent"],
+                "task_queue": {"enabled": True, "path": os.path.join(tmpdir, 'tasks.db')},
+            }
+            config_path = os.path.join(tmpdir, 'config.json')
+            with open(config_path, 'w') as f:
+                json.dump(config, f)
+
+            automation = os.path.join(os.path.dirname(__file__), '..', 'backend',
+                                      'python_core', 'automation.py')
+            subprocess.run([sys.executable, automation, '--config', config_path,
+                            '--coordinator', '--workers', '3'],
+                           cwd=tmpdir, check=True, timeout=120,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+            with open(output, encoding='utf-8') as f:
+                texts = sorted(json.loads(line)['text'] for line in f)
+        self.assertEqual(texts, sorted(f'Quote /slow/{n}' for n in range(12)))
+        self.assertEqual(SlowHandler.peak, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the python_core directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'python_core'))
+
+from api_client import APIClient
+from transport import (acquire_async_session, get_session, pool_settings,
+                       release_async_session, run_async, transport_stats)
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    """Answers every GET with the request's User-Agent, keeping connections open."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = f'{{"agent": "{self.headers.get("User-Agent")}"}}'.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestTransport(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), EchoHandler)
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_sync_session_reuses_connections(self):
+        """Requests through the shared session reuse one kept-alive connection."""
+        session = get_session()
+        self.assertIs(session, get_session())
+        for agent in ('a', 'b', 'c'):
+            response = session.get(f'{self.base_url}/', headers={'User-Agent': agent})
+            self.assertEqual(response.json()['agent'], agent)
+
+        pool = transport_stats()['requests'][f'http://127.0.0.1:{self.server.server_address[1]}']
+        self.assertEqual(pool['connections_opened'], 1)
+        self.assertGreaterEqual(pool['requests'], 3)
+
+    def test_async_session_is_shared_per_loop(self):
+        """API clients in one loop share a session, closed after the last one."""
+        async def main():
+            async with APIClient(self.base_url, {'User-Agent': 'first'}) as first:
+                async with APIClient(self.base_url, {'User-Agent': 'second'}) as second:
+                    self.assertIs(first.session, second.session)
+                    session = first.session
+                    results = await asyncio.gather(first.get('/'), second.get('/'))
+                self.assertFalse(session.closed)
+                stats = transport_stats()['aiohttp']
+            return results, session, stats
+
+        results, session, stats = asyncio.run(main())
+        self.assertEqual([r['agent'] for r in results], ['first', 'second'])
+        self.assertTrue(session.closed)
+        self.assertEqual(stats[0]['limit_per_host'], pool_settings()['limit_per_host'])
+
+    def test_io_loop_keeps_its_pool_between_runs(self):
+        """Runs on the shared I/O loop reuse one session and its connections."""
+        async def fetch(agent):
+            async with APIClient(self.base_url, {'User-Agent': agent}) as client:
+                return client.session, await client.get('/')
+
+        first, result = run_async(fetch('first'))
+        second, _ = run_async(fetch('second'))
+        self.assertIs(first, second)
+        self.assertFalse(first.closed)
+        self.assertEqual(result['agent'], 'first')
+        stats = [s for s in transport_stats()['aiohttp'] if s['connections_reused']]
+        self.assertTrue(stats)
+
+    def test_release_closes_after_the_last_user(self):
+        async def main():
+            session = await acquire_async_session()
+            self.assertIs(await acquire_async_session(), session)
+            await release_async_session()
+            still_open = not session.closed
+            await release_async_session()
+            return still_open, session.closed
+
+        self.assertEqual(asyncio.run(main()), (True, True))
+
+    def test_pool_settings_override(self):
+        settings = pool_settings({'http_pool': {'limit_per_host': 2}})
+        self.assertEqual(settings['limit_per_host'], 2)
+        self.assertEqual(settings['limit'], 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,21 @@
 import unittest
 import sys
 import os
+import hashlib
+import json
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from bs4 import BeautifulSoup
 
 # Add the python_core directory to the path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'python_core'))
 
+from crawler import AsyncCrawler
+from extraction import BACKENDS, backend_available
 from scraper import Scraper
+from storage import close_sqlite_writers
+from transport import run_async
 
 class TestWebScraper(unittest.TestCase):
     
@@ -87,6 +96,38 @@ class TestWebScraper(unittest.TestCase):
         self.assertIn('tag1', data[0]['tags'])
         self.assertIn('tag2', data[0]['tags'])
         
+    def test_parser_backends_agree(self):
+        """Every installed parser backend extracts the same items as bs4."""
+        selectors = {
+            "item": ".quote",
+            "fields": {
+                "text": ".text::text",
+                "author": ".author",
+                "first_tag": ".tags .tag::attr(href)",
+                "missing": ".nope"
+            }
+        }
+        expected = Scraper(self.target_config, self.global_config).extract_data(
+            BeautifulSoup(self.sample_html, 'html.parser'), selectors
+        )
+        self.assertEqual(expected[0]['text'], 'Test quote 1')
+        self.assertEqual(expected[0]['first_tag'], '/tag/tag1')
+        self.assertEqual(expected[0]['missing'], '')
+
+        # bs4 stays the default; the others are opt-in
+        self.assertEqual(
+            Scraper(self.target_config, self.global_config).backend.name, 'bs4'
+        )
+        for name in BACKENDS:
+            if not backend_available(name):
+                continue
+            with self.subTest(backend=name):
+                config = dict(self.global_config, parser=name)
+                scraper = Scraper(self.target_config, config)
+                self.assertEqual(scraper.backend.name, name)
+                doc = scraper.parse_page(self.sample_html.encode('utf-8'))
+                self.assertEqual(scraper.extract_data(doc, selectors), expected)
+
     def test_save_to_csv(self):
         """Test saving data to CSV."""
         scraper = Scraper(self.target_config, self.global_config)
@@ -138,8 +179,236 @@ class TestWebScraper(unittest.TestCase):
         self.assertTrue(os.path.exists(test_db))
         
         # Clean up
-        if os.path.exists(test_db):
-            os.remove(test_db)
+        close_sqlite_writers()
+        for path in (test_db, test_db + '-wal', test_db + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serves canned pages from the class-level ``pages`` mapping."""
+    pages = {}
+    not_modified = 0
+
+    def do_GET(self):
+        body = self.pages.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        etag = f'"{hashlib.sha1(body.encode("utf-8")).hexdigest()}"'
+        if self.headers.get('If-None-Match') == etag:
+            FixtureHandler.not_modified += 1
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body.encode('utf-8'))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FailingSinkScraper(Scraper):
+    """A scraper whose storage raises, as a full disk would."""
+
+    def store(self, writer, data):
+        raise OSError("No space left on device")
+
+
+class TestAsyncCrawler(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        FixtureHandler.pages = {
+            '/robots.txt': 'User-agent: *\nDisallow: /private\n',
+        }
+        for n in range(1, 4):
+            next_link = f'<li class="next"><a href="/page/{n + 1}/">Next</a></li>' if n < 3 else ''
+            FixtureHandler.pages[f'/page/{n}/'] = (
+                f'<div class="quote"><span class="text">Quote {n}</span>'
+                f'<span class="author">Author {n}</span></div>{next_link}'
+            )
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.global_config = {
+            "concurrency": {"global": 2, "per_domain": 2},
+            "rate_limit": {"delay_seconds": 0, "jitter": False},
+            "user_agents": ["Test Agent"]
+        }
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def make_target(self, engine, pagination=None):
+        return {
+            "name": f"fixture_{engine}",
+            "mode": "static",
+            "engine": engine,
+            "base_url": self.base_url,
+            "start_paths": ["/page/1/"],
+            "selectors": {
+                "item": ".quote",
+                "fields": {"text": ".text", "author": ".author"}
+            },
+            "pagination": pagination or {"next_selector": ".next a"},
+            "storage": {
+                "type": "jsonl",
+                "path": os.path.join(self.tmpdir.name, f"{engine}.jsonl")
+            }
+        }
+
+    def crawl(self, target):
+        """Run a target and return the stored texts, sorted"""
+        self.last_count = Scraper(target, self.global_config).scrape()
+        with open(target['storage']['path'], encoding='utf-8') as f:
+            items = [json.loads(line) for line in f]
+        return sorted(item['text'] for item in items)
+
+    def test_async_engine_matches_sync_output(self):
+        """The async engine stores the same items as the sync one."""
+        outputs = {engine: self.crawl(self.make_target(engine)) for engine in ('sync', 'async')}
+        self.assertEqual(outputs['async'], ['Quote 1', 'Quote 2', 'Quote 3'])
+        self.assertEqual(outputs['sync'], outputs['async'])
+
+    def test_crawls_share_per_domain_limits(self):
+        """Async crawls on the I/O loop, e.g. overlapping daemon jobs, share per_domain."""
+        async def semaphores():
+            crawlers = [AsyncCrawler(Scraper(self.make_target('async'), self.global_config))
+                        for _ in range(2)]
+            return [crawler.domain_semaphore(f'{self.base_url}/page/{n}/')
+                    for n, crawler in enumerate(crawlers)]
+
+        first, second = run_async(semaphores())
+        self.assertIs(first, second)
+
+    def test_process_pool_parse_stage(self):
+        """Parsing in a process pool yields the same items as in-process."""
+        target = self.make_target('async')
+        target['parse_workers'] = 2
+        self.assertEqual(self.crawl(target), ['Quote 1', 'Quote 2', 'Quote 3'])
+
+    def test_template_pagination(self):
+        """next_url_template is expanded until a page stops yielding items."""
+        for engine in ('sync', 'async'):
+            target = self.make_target(engine, {"next_url_template": "/page/{page}/"})
+            self.assertEqual(self.crawl(target), ['Quote 1', 'Quote 2', 'Quote 3'])
+
+    def test_max_pages_bounds_the_frontier(self):
+        """max_pages caps how many pages a crawl visits."""
+        for engine in ('sync', 'async'):
+            target = self.make_target(engine, {"next_selector": ".next a", "max_pages": 2})
+            self.assertEqual(len(self.crawl(target)), 2)
+
+    def test_async_engine_respects_robots(self):
+        """Disallowed paths are skipped by the async engine."""
+        target = self.make_target('async')
+        target['start_paths'] = ['/private', '/page/1/']
+        target['pagination'] = {}
+        self.assertEqual(self.crawl(target), ['Quote 1'])
+
+    def test_output_is_appended_across_runs(self):
+        """Streaming sinks append instead of overwriting earlier runs."""
+        target = self.make_target('sync')
+        target['storage']['batch_size'] = 1
+        self.crawl(target)
+        self.assertEqual(len(self.crawl(target)), 6)
+        self.assertEqual(self.last_count, 3)
+
+    def test_unchanged_pages_are_revalidated_not_reparsed(self):
+        """With http_cache on, a second crawl gets 304s and stores nothing new."""
+        for engine in ('sync', 'async'):
+            target = self.make_target(engine)
+            target['http_cache'] = {
+                "enabled": True, "path": os.path.join(self.tmpdir.name, f'http_cache_{engine}')
+            }
+            self.assertEqual(len(self.crawl(target)), 3)
+            FixtureHandler.not_modified = 0
+            self.assertEqual(len(self.crawl(target)), 3)
+            self.assertEqual(self.last_count, 0)
+            # All three pages were still visited through the cached next links
+            self.assertEqual(FixtureHandler.not_modified, 3)
+
+    def test_pages_are_cached_only_once_stored(self):
+        """Pages from a crawl whose sink failed are fetched and stored again."""
+        for engine in ('sync', 'async'):
+            target = self.make_target(engine)
+            target['http_cache'] = {
+                "enabled": True, "path": os.path.join(self.tmpdir.name, f'cache_{engine}')
+            }
+            with self.assertRaises(OSError):
+                FailingSinkScraper(target, self.global_config).scrape()
+            self.assertEqual(len(self.crawl(target)), 3)
+
+    def test_sink_errors_end_the_crawl(self):
+        """A sink that raises fails the crawl instead of hanging it."""
+        # Room for one page, so the fetchers fill the queue behind the sink
+        config = dict(self.global_config, concurrency={"global": 2, "queue_size": 1})
+        for engine in ('sync', 'async'):
+            target = self.make_target(engine)
+            errors = []
+
+            def run():
+                try:
+                    FailingSinkScraper(target, config).scrape()
+                except Exception as e:
+                    errors.append(e)
+
+            thread = threading.Thread(target=run, daemon=True)
+            thread.start()
+            thread.join(30)
+            self.assertFalse(thread.is_alive(), f"{engine} crawl hung")
+            self.assertIsInstance(errors[0], OSError)
+
+    def test_http_cache_is_kept_per_target(self):
+        """A second target sharing the cache still stores pages the first one crawled."""
+        cache = {"enabled": True, "path": os.path.join(self.tmpdir.name, 'shared_cache')}
+        for engine in ('sync', 'async'):
+            target = self.make_target(engine)
+            target['http_cache'] = cache
+            self.assertEqual(len(self.crawl(target)), 3)
+            other = self.make_target(engine)
+            other['name'] = f'other_{engine}'
+            other['storage']['path'] = os.path.join(self.tmpdir.name, f'other_{engine}.jsonl')
+            other['http_cache'] = cache
+            self.assertEqual(len(self.crawl(other)), 3)
+
+    def test_incremental_crawl_stores_only_changed_items(self):
+        """With incremental on, a page that changed bytes but not items adds nothing."""
+        original = dict(FixtureHandler.pages)
+        try:
+            for engine in ('sync', 'async'):
+                FixtureHandler.pages.update(original)
+                target = self.make_target(engine)
+                target['incremental'] = True
+                target['storage']['unique_key'] = 'text'
+                target['http_cache'] = {
+                    "enabled": True, "path": os.path.join(self.tmpdir.name, f'incremental_{engine}')
+                }
+                self.assertEqual(len(self.crawl(target)), 3)
+
+                FixtureHandler.pages['/page/1/'] += '<!-- rendered at 12:00 -->'
+                FixtureHandler.pages['/page/3/'] = FixtureHandler.pages['/page/3/'].replace(
+                    'Author 3', 'Author Three')
+                self.crawl(target)
+                self.assertEqual(self.last_count, 1)
+        finally:
+            FixtureHandler.pages.update(original)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -3,6 +3,8 @@
 class DashboardAPI {
     constructor() {
         this.baseURL = 'http://localhost:3000'; // Node.js webhook service
+        this.metricsURL = 'http://localhost:9108/metrics.json'; // Python core metrics
+        this.metricsAvailable = null;
         this.ws = null;
         this.reconnectInterval = 5000; // 5 seconds
     }
@@ -221,6 +223,67 @@ class DashboardAPI {
         }
     }
     
+    // Sum a metric's samples, optionally only those matching a filter
+    sumSamples(metric, filter = () => true) {
+        if (!metric) return 0;
+        return metric.samples.filter(s => filter(s.labels)).reduce((total, s) => total + s.value, 0);
+    }
+    
+    // Format a byte count for display
+    formatBytes(bytes) {
+        const units = ['B', 'KB', 'MB', 'GB', 'TB'];
+        let i = 0;
+        while (bytes >= 1024 && i < units.length - 1) {
+            bytes /= 1024;
+            i++;
+        }
+        return `${bytes.toFixed(i ? 1 : 0)} ${units[i]}`;
+    }
+    
+    // Fetch scraper metrics from the Python core
+    async fetchScraperMetrics() {
+        try {
+            const response = await fetch(this.metricsURL);
+            const snapshot = await response.json();
+            const metrics = snapshot.metrics;
+            
+            if (this.metricsAvailable !== true) {
+                this.addLog('Connected to scraper metrics', 'info');
+            }
+            this.metricsAvailable = true;
+            
+            const setText = (id, text) => {
+                const element = document.getElementById(id);
+                if (element) element.textContent = text;
+            };
+            setText('itemsStored', this.sumSamples(metrics.hex_items_stored_total));
+            setText('bytesDownloaded', this.formatBytes(this.sumSamples(metrics.hex_bytes_downloaded_total)));
+            setText('requestsInFlight', this.sumSamples(metrics.hex_requests_in_flight));
+            const breakers = metrics.hex_circuit_breaker_state;
+            setText('openBreakers', breakers ? breakers.samples.filter(s => s.value === 2).length : 0);
+            
+            const stageTableBody = document.getElementById('stageTableBody');
+            const stages = metrics.hex_stage_seconds ? metrics.hex_stage_seconds.samples : [];
+            if (stageTableBody && stages.length) {
+                stageTableBody.innerHTML = stages.map(s => `
+                    <tr>
+                        <td>${s.labels.target}</td>
+                        <td>${s.labels.stage}</td>
+                        <td>${s.count}</td>
+                        <td>${(s.sum / s.count * 1000).toFixed(1)}</td>
+                        <td>${s.sum.toFixed(2)}</td>
+                    </tr>
+                `).join('');
+            }
+        } catch (error) {
+            // The metrics endpoint is optional; only log when it goes away
+            if (this.metricsAvailable !== false) {
+                this.addLog('Scraper metrics unavailable (enable "metrics" in config.json)', 'warn');
+            }
+            this.metricsAvailable = false;
+        }
+    }
+    
     // Fetch jobs from backend
     async fetchJobs() {
         try {
@@ -302,6 +365,12 @@ document.addEventListener('DOMContentLoaded', () => {
         api.fetchJobs();
     }, 10000); // Every 10 seconds
     
+    // Poll scraper metrics
+    setInterval(() => {
+        api.fetchScraperMetrics();
+    }, 5000); // Every 5 seconds
+    api.fetchScraperMetrics();
+    
     // Initial fetch
     setTimeout(() => {
         api.fetchJobs();